@@ -0,0 +1,70 @@
+"""
+Catalogue search build and query latency.
+
+    python -m benchmarks.catalogue_search                  # 2602 catalogue + 20-release synthetic
+    python -m benchmarks.catalogue_search --releases 40
+
+The synthetic catalogue repeats every item once per release with a
+release-specific id and description, so the item count grows linearly while
+the vocabulary grows the way a real multi-release catalogue would.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run import _percentile  # noqa: E402
+from catalogue_search import CatalogueIndex  # noqa: E402
+from scope_items import SCOPE_ITEMS  # noqa: E402
+
+QUERIES = [
+    "accounts payable", "invioce", "procurem", "bank reconcilation", "fixed asset depreciation",
+    "gl", "j45", "sales order", "warehouse", "intercompany", "subcontracting", "payroll",
+]
+
+
+def _multi_release(releases: int) -> list:
+    return [
+        {**item, "id": f"{item['id']}-{r}", "description": f"{item['description']} Release {2402 + r * 6}."}
+        for r in range(releases)
+        for item in SCOPE_ITEMS
+    ]
+
+
+def measure(items: list, rounds: int) -> dict:
+    start = time.perf_counter()
+    index = CatalogueIndex(items)
+    build_ms = (time.perf_counter() - start) * 1000
+    latencies = []
+    for _ in range(rounds):
+        for q in QUERIES:
+            start = time.perf_counter()
+            index.search(q)
+            latencies.append(time.perf_counter() - start)
+    return {
+        "items": len(items),
+        "vocabulary": len(index.vocabulary),
+        "build_ms": round(build_ms, 1),
+        "query_p50_ms": round(_percentile(latencies, 0.5) * 1000, 3),
+        "query_p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure catalogue search latency")
+    parser.add_argument("--releases", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args(argv)
+    report = {
+        "current": measure(SCOPE_ITEMS, args.rounds),
+        "multi_release": measure(_multi_release(args.releases), args.rounds),
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,72 @@
+"""
+Storage and payload size of full vs compact gap-result matches.
+
+    python -m benchmarks.compact_matches               # 1000 results x 5 matches
+    python -m benchmarks.compact_matches --rows 10000
+
+Seeds FakeSupabase with the same results stored both ways and reports the
+stored matches JSON per row plus the /results response size: the legacy
+full rows, compact rows expanded at read time (default response, identical
+shape) and compact rows with ?compact=true.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run import ENGAGEMENT, offline_app  # noqa: E402
+from scope_items import compact_matches, expand_matches  # noqa: E402
+
+
+def _rows(llm, n: int, compact: bool) -> list:
+    recorded = [e for e in llm.recordings["gap_analysis"] if e.get("match")]
+    rows = []
+    for i in range(n):
+        entry = recorded[i % len(recorded)]
+        raw = entry.get("tool_input", {}).get("matches") or json.loads(entry["content"])
+        full = expand_matches([{k: m[k] for k in ("id", "confidence", "rationale")} for m in raw[:5]])
+        rows.append({
+            "engagement_id": ENGAGEMENT,
+            "req_id": f"REQ-{i + 1:03d}",
+            "process_description": entry["match"],
+            "matches": compact_matches(full) if compact else full,
+            "tokens_used": 3000,
+            "timestamp": f"2026-01-02T00:{i // 60 % 60:02d}:{i % 60:02d}",
+        })
+    return rows
+
+
+def measure(n: int) -> dict:
+    report = {"rows": n}
+    for label, compact in (("full", False), ("compact", True)):
+        with offline_app() as (client, db, llm):
+            rows = _rows(llm, n, compact)
+            db.seed("gap_results", rows)
+            report[f"stored_bytes_per_row_{label}"] = round(
+                sum(len(json.dumps(r["matches"])) for r in rows) / n, 1
+            )
+            report[f"results_payload_bytes_{label}"] = len(client.get(f"/results?engagement_id={ENGAGEMENT}").content)
+            if compact:
+                report["results_payload_bytes_compact_param"] = len(
+                    client.get(f"/results?engagement_id={ENGAGEMENT}&compact=true").content
+                )
+    full, compact = report["stored_bytes_per_row_full"], report["stored_bytes_per_row_compact"]
+    report["storage_reduction_pct"] = round((1 - compact / full) * 100, 1)
+    report["payload_reduction_pct"] = round(
+        (1 - report["results_payload_bytes_compact_param"] / report["results_payload_bytes_full"]) * 100, 1
+    )
+    return report
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure compact gap-result match storage")
+    parser.add_argument("--rows", type=int, default=1000)
+    args = parser.parse_args(argv)
+    print(json.dumps(measure(args.rows), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,181 @@
+"""
+Gap-analysis accuracy-vs-cost evaluation.
+
+Runs the golden dataset (benchmarks/data/golden_gap.json: requirement text →
+expected scope item ids) through every matching mode of _run_gap_analysis
+using recorded provider outputs, and reports recall@k, MRR, tokens per
+requirement and latency side by side. Fully offline.
+
+    python -m benchmarks.evaluate
+    python -m benchmarks.evaluate --modes full_catalogue lob_filter --k 5
+    python -m benchmarks.evaluate --baseline benchmarks/results/eval-baseline.json
+
+Exits non-zero if any mode's recall@k falls below --min-recall, or drops by
+more than --max-recall-drop against --baseline.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from benchmarks.run import RESULTS_DIR, _percentile  # sets offline env vars before main is imported
+from benchmarks.fakes import FakeProvider
+
+import main
+import prompts
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "data", "golden_gap.json")
+
+
+def load_golden(path: str = GOLDEN_PATH) -> List[dict]:
+    with open(path) as f:
+        return json.load(f)["cases"]
+
+
+# ── Matching modes ───────────────────────────────────────────────────────────
+# mode(provider, case, k) -> (ranked list of scope item ids, tokens_used)
+
+def _mode_full_catalogue(provider, case: dict, k: int):
+    matches, tokens = main._run_gap_analysis(provider, case["text"], top_n=k, use_rules=False)
+    return [m.id for m in matches], tokens or 0
+
+
+def _mode_lob_filter(provider, case: dict, k: int):
+    matches, tokens = main._run_gap_analysis(
+        provider, case["text"], top_n=k, lob_filter=case.get("lob"), use_rules=False
+    )
+    return [m.id for m in matches], tokens or 0
+
+
+def _mode_keyword_rules(provider, case: dict, k: int):
+    """Keyword rules first; the full-catalogue LLM call only for ambiguous cases."""
+    matches, tokens = main._run_gap_analysis(provider, case["text"], top_n=k, use_rules=True)
+    return [m.id for m in matches], tokens or 0
+
+
+MODES: Dict[str, Callable] = {
+    "full_catalogue": _mode_full_catalogue,
+    "lob_filter": _mode_lob_filter,
+    "keyword_rules": _mode_keyword_rules,
+}
+
+
+# ── Scoring ──────────────────────────────────────────────────────────────────
+
+def recall_at(ranked: List[str], expected: List[str], k: int) -> float:
+    if not expected:
+        return 1.0
+    return len(set(ranked[:k]) & set(expected)) / len(expected)
+
+
+def reciprocal_rank(ranked: List[str], expected: List[str]) -> float:
+    for i, item_id in enumerate(ranked, 1):
+        if item_id in expected:
+            return 1.0 / i
+    return 0.0
+
+
+def evaluate_mode(name: str, cases: List[dict], k: int, provider=None) -> dict:
+    provider = provider or FakeProvider()
+    fn = MODES[name]
+    recalls = {1: [], 3: [], k: []}
+    rrs, tokens, latencies, failures = [], [], [], []
+    calls_before = getattr(provider, "call_count", 0)
+    input_before = getattr(provider, "total_input_tokens", 0)
+    cached_before = getattr(provider, "cache_read_tokens", 0)
+    for case in cases:
+        start = time.perf_counter()
+        try:
+            ranked, used = fn(provider, case, k)
+        except Exception as e:
+            failures.append({"case_id": case["case_id"], "error": str(e)})
+            ranked, used = [], 0
+        latencies.append(time.perf_counter() - start)
+        tokens.append(used)
+        for cutoff in recalls:
+            recalls[cutoff].append(recall_at(ranked, case["expected_ids"], cutoff))
+        rrs.append(reciprocal_rank(ranked, case["expected_ids"]))
+
+    n = len(cases) or 1
+    return {
+        "mode": name,
+        "cases": len(cases),
+        "k": k,
+        "recall": {f"@{cutoff}": round(sum(v) / n, 4) for cutoff, v in sorted(recalls.items())},
+        "mrr": round(sum(rrs) / n, 4),
+        "tokens_per_requirement": round(sum(tokens) / n, 1),
+        "llm_call_rate": round((getattr(provider, "call_count", 0) - calls_before) / n, 4),
+        "prompt_cache_token_hit_ratio": round(
+            (getattr(provider, "cache_read_tokens", 0) - cached_before)
+            / max(1, getattr(provider, "total_input_tokens", 0) - input_before),
+            4,
+        ),
+        "latency_ms": {
+            "mean": round(sum(latencies) / n * 1000, 3),
+            "p95": round(_percentile(latencies, 0.95) * 1000, 3),
+        },
+        "failures": failures,
+    }
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Gap-analysis accuracy-vs-cost evaluation")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--golden", default=GOLDEN_PATH)
+    parser.add_argument("--output", help="JSON report path (default benchmarks/results/eval-<ts>.json)")
+    parser.add_argument("--baseline", help="previous eval report to guard against recall regressions")
+    parser.add_argument("--min-recall", type=float, default=0.0, help="fail if recall@k is below this")
+    parser.add_argument("--max-recall-drop", type=float, default=0.02)
+    args = parser.parse_args(argv)
+
+    cases = load_golden(args.golden)
+    reports = [evaluate_mode(mode, cases, args.k) for mode in args.modes]
+
+    at_k = f"@{args.k}"
+    print(
+        f"{'mode':<18} {'recall@1':>9} {'recall@3':>9} {'recall' + at_k:>9} {'MRR':>7} {'tok/req':>9} "
+        f"{'llm%':>6} {'cache%':>7} {'ms/req':>8}"
+    )
+    for r in reports:
+        print(
+            f"{r['mode']:<18} {r['recall']['@1']:>9.3f} {r['recall']['@3']:>9.3f} {r['recall'][at_k]:>9.3f} "
+            f"{r['mrr']:>7.3f} {r['tokens_per_requirement']:>9.0f} {r['llm_call_rate'] * 100:>6.0f} "
+            f"{r['prompt_cache_token_hit_ratio'] * 100:>7.0f} "
+            f"{r['latency_ms']['mean']:>8.2f}"
+        )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "golden": os.path.basename(args.golden),
+            # Results are only comparable across runs with the same prompt versions
+            "prompt_versions": prompts.versions(),
+        },
+        "modes": reports,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"eval-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"report written to {output}")
+
+    failed = [r["mode"] for r in reports if r["recall"][at_k] < args.min_recall]
+    if args.baseline:
+        with open(args.baseline) as f:
+            previous = {r["mode"]: r for r in json.load(f)["modes"]}
+        for r in reports:
+            old = previous.get(r["mode"])
+            if old and old["recall"].get(at_k, 0) - r["recall"][at_k] > args.max_recall_drop:
+                print(f"recall regression in {r['mode']}: {old['recall'][at_k]} → {r['recall'][at_k]}")
+                failed.append(r["mode"])
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,326 @@
+"""
+Deterministic stand-ins for the two external dependencies RAPID talks to.
+
+FakeProvider     — replays recorded Haiku responses (benchmarks/recordings/)
+                   with configurable latency and simulated prompt caching;
+                   same complete() contract as providers.AnthropicProvider.
+FakeSupabase     — in-memory implementation of the supabase-py query chain
+                   database.py uses (table/select/eq/gt/in_/order/limit/insert
+                   /update/execute) and counts every round trip.
+"""
+import copy
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from prompts import flatten
+
+RECORDINGS_PATH = os.path.join(os.path.dirname(__file__), "recordings", "haiku_responses.json")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough Claude token estimate (~4 chars/token) used when replaying."""
+    return max(1, len(text) // 4)
+
+
+# ── Fake LLM provider ────────────────────────────────────────────────────────
+
+def _prompt_kind(system_prompt) -> str:
+    text = system_prompt if isinstance(system_prompt, str) else json.dumps(system_prompt)
+    if "process archaeologist" in text:
+        return "archaeologist"
+    if "conversation transcripts" in text:
+        return "transcript_extraction"
+    return "gap_analysis"
+
+
+class FakeProvider:
+    """Replays recorded responses; picks the first entry whose `match` text
+    appears in the user prompt (entries with an empty match act as default)."""
+
+    def __init__(
+        self,
+        recordings: Optional[Dict[str, List[dict]]] = None,
+        latency_s: float = 0.0,
+        jitter_s: float = 0.0,
+        seed: int = 0,
+        restrict_to_prompt_ids: bool = True,
+        supports_tools: bool = True,
+        min_cacheable_tokens: int = 4096,
+    ):
+        if recordings is None:
+            with open(RECORDINGS_PATH) as f:
+                recordings = json.load(f)
+        self.recordings = recordings
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.restrict_to_prompt_ids = restrict_to_prompt_ids
+        self.supports_tools = supports_tools
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.call_count = 0
+        self.total_input_tokens = 0
+        self.total_output_tokens = 0
+        self.calls_by_kind: Dict[str, int] = {}
+        # Prompt-cache emulation: prefixes up to a cache_control breakpoint
+        self.min_cacheable_tokens = min_cacheable_tokens
+        self._cached_prefixes: set = set()
+        self.cache_read_tokens = 0
+        self.cache_creation_tokens = 0
+
+    def _lookup(self, kind: str, user_prompt: str) -> dict:
+        lowered = user_prompt.lower()
+        for entry in self.recordings.get(kind, []):
+            if entry["match"].lower() in lowered:
+                return entry
+        raise KeyError(f"No recorded {kind} response matches prompt")
+
+    @staticmethod
+    def _tool_input(kind: str, entry: dict):
+        """Recorded tool-use input, or one derived from the recorded text reply."""
+        if "tool_input" in entry:
+            return copy.deepcopy(entry["tool_input"])
+        text = entry["content"]
+        start = min((i for i in (text.find("["), text.find("{")) if i != -1), default=0)
+        value, _ = json.JSONDecoder().raw_decode(text[start:])
+        if kind == "gap_analysis":
+            return {"matches": value}
+        if kind == "transcript_extraction":
+            return {"requirements": value}
+        return value
+
+    @staticmethod
+    def _seen(match: dict, user_prompt: str) -> bool:
+        # A real model can only pick scope items it was shown in the prompt
+        return bool(re.search(rf"\b{re.escape(match.get('id', ''))}\b", user_prompt))
+
+    def _drop_unseen_ids(self, content: str, user_prompt: str) -> str:
+        try:
+            matches = json.loads(content)
+        except ValueError:
+            return content
+        return json.dumps([m for m in matches if self._seen(m, user_prompt)], indent=2)
+
+    def _cache_usage(self, system_prompt, user_prompt, tool) -> tuple:
+        """(read, created) tokens, caching every prefix that ends at a breakpoint."""
+        prefix = json.dumps(tool) if tool else ""
+        breakpoints = []
+        for content in (system_prompt, user_prompt):
+            for block in content if isinstance(content, list) else [{"text": content}]:
+                prefix += block.get("text", "")
+                if block.get("cache_control") and estimate_tokens(prefix) >= self.min_cacheable_tokens:
+                    breakpoints.append(prefix)
+        if not breakpoints:
+            return 0, 0
+        with self._lock:
+            hit = next((p for p in reversed(breakpoints) if p in self._cached_prefixes), "")
+            self._cached_prefixes.update(breakpoints)
+        read = estimate_tokens(hit) if hit else 0
+        return read, estimate_tokens(breakpoints[-1]) - read
+
+    def complete(self, system_prompt, user_prompt, max_tokens=1024, tool=None, **kwargs):
+        kind = _prompt_kind(system_prompt)
+        entry = self._lookup(kind, flatten(user_prompt))
+        # The model sees the whole prompt, wherever the catalogue sits
+        prompt_text = f"{flatten(system_prompt)}\n{flatten(user_prompt)}"
+        data = None
+        if tool and self.supports_tools:
+            data = self._tool_input(kind, entry)
+            if kind == "gap_analysis" and self.restrict_to_prompt_ids:
+                data["matches"] = [m for m in data["matches"] if self._seen(m, prompt_text)]
+            content = json.dumps(data)
+        else:
+            content = entry["content"]
+            if kind == "gap_analysis" and self.restrict_to_prompt_ids:
+                content = self._drop_unseen_ids(content, prompt_text)
+        with self._lock:
+            delay = self.latency_s + (self._rng.uniform(0, self.jitter_s) if self.jitter_s else 0.0)
+        if delay:
+            time.sleep(delay)
+        input_tokens = estimate_tokens(flatten(system_prompt)) + estimate_tokens(flatten(user_prompt))
+        if tool and self.supports_tools:
+            input_tokens += estimate_tokens(json.dumps(tool))
+        cache_read, cache_creation = self._cache_usage(system_prompt, user_prompt, tool if self.supports_tools else None)
+        output_tokens = estimate_tokens(content)
+        with self._lock:
+            self.call_count += 1
+            self.total_input_tokens += input_tokens
+            self.total_output_tokens += output_tokens
+            self.cache_read_tokens += cache_read
+            self.cache_creation_tokens += cache_creation
+            self.calls_by_kind[kind] = self.calls_by_kind.get(kind, 0) + 1
+        result = {
+            "content": content,
+            "tokens_used": input_tokens + output_tokens,
+            "input_tokens": max(0, input_tokens - cache_read - cache_creation),
+            "cache_read_tokens": cache_read,
+            "cache_creation_tokens": cache_creation,
+        }
+        if data is not None:
+            result["data"] = data
+        return result
+
+
+# ── Fake supabase client ─────────────────────────────────────────────────────
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    def __init__(self, client: "FakeSupabase", table: str):
+        self._client = client
+        self._table = table
+        self._op = "select"
+        self._payload = None
+        self._columns = "*"
+        self._filters = []
+        self._order = []
+        self._limit = None
+
+    # chain builders ---------------------------------------------------------
+    def select(self, columns: str = "*"):
+        self._op, self._columns = "select", columns
+        return self
+
+    def insert(self, payload, default_to_null: bool = True):
+        if isinstance(payload, list) and default_to_null:
+            # Like PostgREST: a bulk insert sends every key of any row, null where absent
+            columns = set().union(*payload)
+            payload = [{c: row.get(c) for c in columns} for row in payload]
+        self._op, self._payload = "insert", payload
+        return self
+
+    def update(self, payload: dict):
+        self._op, self._payload = "update", payload
+        return self
+
+    def eq(self, column: str, value):
+        self._filters.append((column, "eq", value))
+        return self
+
+    def gt(self, column: str, value):
+        self._filters.append((column, "gt", value))
+        return self
+
+    def like(self, column: str, pattern: str):
+        regex = "".join(".*" if c == "%" else "." if c == "_" else re.escape(c) for c in pattern)
+        self._filters.append((column, "like", re.compile(regex, re.DOTALL)))
+        return self
+
+    def in_(self, column: str, values):
+        self._filters.append((column, "in", set(values)))
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, n: int):
+        self._limit = n
+        return self
+
+    # execution --------------------------------------------------------------
+    @staticmethod
+    def _test(row, column, op, value) -> bool:
+        if op == "in":
+            return row.get(column) in value
+        if op == "like":
+            return isinstance(row.get(column), str) and value.fullmatch(row[column]) is not None
+        if op == "gt":
+            return row.get(column) is not None and row.get(column) > value
+        return row.get(column) == value
+
+    def _matching(self, rows):
+        # Emulate the (engagement_id, req_id) index so lookups stay O(1)
+        index = self._client._by_req_id.get(self._table, {})
+        for column, op, value in self._filters:
+            if column == "req_id" and op == "eq":
+                rows = index.get(value, [])
+                break
+            if column == "req_id" and op == "in":
+                rows = [r for v in value for r in index.get(v, [])]
+                break
+        return [r for r in rows if all(self._test(r, c, op, v) for c, op, v in self._filters)]
+
+    def execute(self) -> _Response:
+        client = self._client
+        if client.latency_s:
+            time.sleep(client.latency_s)
+        with client._lock:
+            client.round_trips += 1
+            client.calls_by_op[self._op] = client.calls_by_op.get(self._op, 0) + 1
+            rows = client.tables.setdefault(self._table, [])
+            if self._op == "insert":
+                records = self._payload if isinstance(self._payload, list) else [self._payload]
+                inserted = []
+                for record in records:
+                    row = copy.deepcopy(record)
+                    row.setdefault("id", client._next_id())
+                    rows.append(row)
+                    if "req_id" in row:
+                        client._by_req_id.setdefault(self._table, {}).setdefault(row["req_id"], []).append(row)
+                    inserted.append(copy.deepcopy(row))
+                return _Response(inserted)
+            if self._op == "update":
+                updated = []
+                for row in self._matching(rows):
+                    row.update(copy.deepcopy(self._payload))
+                    updated.append(copy.deepcopy(row))
+                return _Response(updated)
+            result = self._matching(rows)
+            for column, desc in reversed(self._order):
+                result = sorted(result, key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+            if self._limit is not None:
+                result = result[: self._limit]
+            if client.max_rows is not None:
+                # PostgREST's db-max-rows silently truncates any larger result
+                result = result[: client.max_rows]
+            if self._columns != "*":
+                wanted = [c.strip() for c in self._columns.split(",")]
+                return _Response([{c: r.get(c) for c in wanted} for r in result])
+            return _Response(copy.deepcopy(result))
+
+
+class FakeSupabase:
+    """In-memory supabase client; `round_trips` counts execute() calls.
+
+    `latency_s` simulates the network round trip paid on every execute();
+    `max_rows` caps every select the way PostgREST's db-max-rows does.
+    """
+
+    def __init__(self, latency_s: float = 0.0, max_rows: Optional[int] = None):
+        self.latency_s = latency_s
+        self.max_rows = max_rows
+        self.tables: Dict[str, List[dict]] = {}
+        self._by_req_id: Dict[str, Dict[str, List[dict]]] = {}
+        self.round_trips = 0
+        self.calls_by_op: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._id = 0
+
+    def _next_id(self) -> int:
+        self._id += 1
+        return self._id
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def seed(self, name: str, rows: List[dict]):
+        """Load rows directly, without counting round trips."""
+        with self._lock:
+            for row in rows:
+                row = dict(row)
+                row.setdefault("id", self._next_id())
+                self.tables.setdefault(name, []).append(row)
+                if "req_id" in row:
+                    self._by_req_id.setdefault(name, {}).setdefault(row["req_id"], []).append(row)
+
+    def reset_counters(self):
+        self.round_trips = 0
+        self.calls_by_op = {}
@@ -0,0 +1,92 @@
+"""
+CPU cost of large listings with and without the orjson fast path.
+
+    python -m benchmarks.fast_json                       # 10000 requirements, 20 requests
+    python -m benchmarks.fast_json --rows 2000 --requests 50
+
+Serves `rows` requirements and as many gap results from memory (the read
+helpers are patched, so FakeSupabase's per-call copying does not drown out
+the serialisation cost) and times GET /requirements and GET /results with
+RAPID_FAST_JSON off and on. CPU time per request is time.process_time(),
+which covers every thread in the process (TestClient runs the app on a
+worker thread). ETags are turned off so every request does the full work.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fast_json  # noqa: E402
+import main  # noqa: E402
+from benchmarks.run import ENGAGEMENT, make_requirements, offline_app  # noqa: E402
+from scope_items import SCOPE_ITEMS, compact_matches  # noqa: E402
+
+ENDPOINTS = {
+    "requirements": f"/requirements?engagement_id={ENGAGEMENT}",
+    "results": f"/results?engagement_id={ENGAGEMENT}",
+}
+
+
+def _results(n: int) -> list:
+    return [
+        {
+            "id": i + 1,
+            "engagement_id": ENGAGEMENT,
+            "req_id": f"REQ-{i + 1:03d}",
+            "process_description": f"Process {i}",
+            "matches": compact_matches([
+                {"id": SCOPE_ITEMS[(i + k) % len(SCOPE_ITEMS)]["id"], "confidence": "MEDIUM", "rationale": "r"}
+                for k in range(5)
+            ]),
+            "tokens_used": 3000,
+            "timestamp": f"2026-01-02T00:{i // 60 % 60:02d}:{i % 60:02d}",
+        }
+        for i in range(n)
+    ]
+
+
+def measure(rows: int, requests: int) -> dict:
+    report = {"rows": rows, "requests": requests, "orjson_available": fast_json.orjson is not None}
+    requirements = [{"id": i + 1, **r} for i, r in enumerate(make_requirements(rows))]
+    results = _results(rows)
+    with (
+        offline_app() as (client, db, llm),
+        patch.object(main, "ETAGS_ENABLED", False),
+        patch.object(main, "get_requirements_by_engagement", lambda engagement_id: requirements),
+        patch.object(main, "get_results_by_engagement", lambda engagement_id: results),
+    ):
+        for name, path in ENDPOINTS.items():
+            bodies = {}
+            for label, enabled in (("default", False), ("fast", True)):
+                if enabled and fast_json.orjson is None:
+                    continue
+                with patch.object(fast_json, "ENABLED", enabled):
+                    bodies[label] = client.get(path, headers={"Accept-Encoding": "identity"}).json()
+                    cpu_start, wall_start = time.process_time(), time.perf_counter()
+                    for _ in range(requests):
+                        client.get(path, headers={"Accept-Encoding": "identity"})
+                    report[f"{name}_cpu_ms_{label}"] = round((time.process_time() - cpu_start) / requests * 1000, 1)
+                    report[f"{name}_wall_ms_{label}"] = round((time.perf_counter() - wall_start) / requests * 1000, 1)
+            if "fast" in bodies:
+                report[f"{name}_identical"] = bodies["fast"] == bodies["default"]
+                report[f"{name}_cpu_speedup"] = round(
+                    report[f"{name}_cpu_ms_default"] / report[f"{name}_cpu_ms_fast"], 2
+                )
+    return report
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure listing CPU time with and without RAPID_FAST_JSON")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args(argv)
+    print(json.dumps(measure(args.rows, args.requests), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,56 @@
+"""
+Keyword-rule fast path: hit rate, matcher latency and LLM tokens saved.
+
+    python -m benchmarks.keyword_rules
+
+Runs every requirement in benchmarks/data/workload.json and the golden
+dataset through the keyword rules and reports how many would skip the LLM,
+the matcher's per-requirement latency and the estimated prompt tokens those
+skipped calls would have cost. Accuracy of the hybrid mode is covered by
+python -m benchmarks.evaluate --modes keyword_rules full_catalogue.
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.evaluate import load_golden  # noqa: E402
+from benchmarks.run import _percentile, load_workload  # noqa: E402
+import keyword_rules  # noqa: E402
+import main  # noqa: E402
+
+
+def measure() -> dict:
+    start = time.perf_counter()
+    rules = keyword_rules.KeywordRules(keyword_rules.SCOPE_ITEMS)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    texts = [r["description"] for r in load_workload()["requirements"]] + [c["text"] for c in load_golden()]
+    latencies, hits = [], []
+    for text in texts:
+        start = time.perf_counter()
+        picks = rules.match(text)
+        latencies.append(time.perf_counter() - start)
+        if picks is not None:
+            hits.append({"text": text[:80], "ids": [p["id"] for p in picks]})
+
+    per_call = main._prompt_tokens_estimate(None)
+    return {
+        "requirements": len(texts),
+        "keywords": len(rules.keyword_items),
+        "automaton_states": len(rules.automaton.goto),
+        "build_ms": round(build_ms, 1),
+        "match_p50_us": round(_percentile(latencies, 0.5) * 1e6, 1),
+        "match_p99_us": round(_percentile(latencies, 0.99) * 1e6, 1),
+        "decisive": len(hits),
+        "hit_rate": round(len(hits) / len(texts), 3),
+        "prompt_tokens_per_llm_call": per_call,
+        "tokens_saved": per_call * len(hits),
+        "hits": hits,
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(measure(), indent=2))
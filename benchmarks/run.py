@@ -0,0 +1,324 @@
+"""
+Offline RAPID benchmark suite.
+
+Drives the FastAPI app in-process with the recorded-LLM FakeProvider and the
+in-memory FakeSupabase, so no API key, network or database is needed.
+
+    python -m benchmarks.run                                  # every scenario at 10/100/1k/10k
+    python -m benchmarks.run --scenarios gap_analysis --sizes 100 --latency-ms 400
+    python -m benchmarks.run --output benchmarks/results/baseline.json
+    python -m benchmarks.run --compare benchmarks/results/baseline.json
+
+Each (scenario, size) reports throughput, latency p50/p95/p99, DB round trips,
+LLM calls/tokens and peak RSS. Results are written as JSON so a later run can
+be compared against them with --compare.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# database.py builds its client lazily; placeholder credentials keep any real use offline
+os.environ.setdefault("SUPABASE_URL", "https://offline.invalid")
+os.environ.setdefault("SUPABASE_KEY", "offline-benchmark-key")
+os.environ.setdefault("ANTHROPIC_API_KEY", "sk-ant-offline")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import database  # noqa: E402
+import main  # noqa: E402
+import metrics  # noqa: E402
+from benchmarks.fakes import FakeProvider, FakeSupabase  # noqa: E402
+from storage import SupabaseBackend  # noqa: E402
+from write_behind import WriteBehindBuffer  # noqa: E402
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "data", "workload.json")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+ENGAGEMENT = "bench-eng"
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+def load_workload() -> dict:
+    with open(DATA_PATH) as f:
+        return json.load(f)
+
+
+def make_requirements(n: int, engagement_id: str = ENGAGEMENT, status: str = "open") -> List[dict]:
+    """Synthesise n requirement rows by cycling the recorded base requirements."""
+    base = load_workload()["requirements"]
+    rows = []
+    for i in range(n):
+        template = base[i % len(base)]
+        rows.append({
+            "req_id": f"REQ-{i + 1:03d}",
+            "engagement_id": engagement_id,
+            "title": template["title"],
+            "description": f"{template['description']} (site {i // len(base) + 1})",
+            "source_type": "Document",
+            "tags": ["manual_step", "pain_point"] if i % 3 else ["workaround"],
+            "stakeholder": "Benchmark",
+            "status": status,
+            "created_at": "2026-01-01T00:00:00+00:00",
+            "business_process": "Record-to-Report",
+            "priority": "Must-Have",
+            "category": "Automation",
+            "kpi_impact": {"metric": "cycle time", "target": "-50%", "unit": "days"} if i % 4 == 0 else None,
+            "sign_off_status": "draft",
+        })
+    return rows
+
+
+@contextmanager
+def offline_app(
+    latency_s: float = 0.0,
+    jitter_s: float = 0.0,
+    seed: int = 0,
+    tools: bool = True,
+    db_latency_s: float = 0.0,
+    write_behind: bool = False,
+):
+    """Yield (TestClient, FakeSupabase, FakeProvider) with both dependencies swapped in."""
+    db = FakeSupabase(latency_s=db_latency_s)
+    llm = FakeProvider(latency_s=latency_s, jitter_s=jitter_s, seed=seed, supports_tools=tools)
+    buffer = WriteBehindBuffer(database.save_gap_analyses, database.update_requirements, spool_path=None)
+    with (
+        patch.object(database, "_backend", SupabaseBackend(db)),
+        patch.object(main, "get_provider", lambda: llm),
+        patch.object(main, "WRITE_BEHIND", write_behind),
+        patch.object(main, "_write_behind", buffer),
+    ):
+        yield TestClient(main.app), db, llm
+        buffer.close()
+
+
+# ── Scenarios ────────────────────────────────────────────────────────────────
+# Each scenario seeds the fakes for `size` requirements and returns the list
+# of per-request latencies (seconds) plus the number of units of work done.
+
+def scenario_gap_analysis(client, db, llm, size: int, args) -> dict:
+    db.seed("requirements", make_requirements(size))
+    db.reset_counters()
+    n = min(size, args.max_requests)
+    latencies = []
+    for i in range(n):
+        start = time.perf_counter()
+        resp = client.post("/gap-analysis", json={"engagement_id": ENGAGEMENT, "req_id": f"REQ-{i + 1:03d}"})
+        latencies.append(time.perf_counter() - start)
+    return {"latencies": latencies, "units": n}
+
+
+def scenario_analyse_all(client, db, llm, size: int, args) -> dict:
+    db.seed("requirements", make_requirements(size))
+    db.reset_counters()
+    start = time.perf_counter()
+    resp = client.post(f"/engagement/{ENGAGEMENT}/analyse-all")
+    elapsed = time.perf_counter() - start
+    resp.raise_for_status()
+    return {"latencies": [elapsed], "units": resp.json()["processed"] + len(resp.json().get("failed", []))}
+
+
+def scenario_transcript_extraction(client, db, llm, size: int, args) -> dict:
+    db.seed("requirements", make_requirements(size))
+    db.reset_counters()
+    transcript = load_workload()["transcript"]
+    n = min(size, args.max_requests, 50)
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        resp = client.post("/requirements/extract-from-transcript", json={
+            "engagement_id": ENGAGEMENT,
+            "stakeholder": "Benchmark",
+            "transcript_text": transcript,
+        })
+        latencies.append(time.perf_counter() - start)
+    return {"latencies": latencies, "units": n}
+
+
+_DASHBOARD_PATHS = [
+    "/engagement/{e}/summary",
+    "/engagement/{e}/process-mirror",
+    "/engagement/{e}/sign-off-status",
+    "/engagement/{e}/kpi-summary",
+    "/requirements?engagement_id={e}",
+    "/results?engagement_id={e}",
+]
+
+
+def scenario_dashboards(client, db, llm, size: int, args) -> dict:
+    rows = make_requirements(size, status="analysed")
+    db.seed("requirements", rows)
+    recorded = json.loads(llm.recordings["gap_analysis"][0]["content"])
+    db.seed("gap_results", [{
+        "engagement_id": ENGAGEMENT,
+        "req_id": r["req_id"],
+        "process_description": r["description"],
+        "matches": recorded,
+        "tokens_used": 0,
+        "timestamp": f"2026-01-02T00:00:{i % 60:02d}",
+    } for i, r in enumerate(rows)])
+    db.reset_counters()
+    latencies = []
+    for _ in range(args.repeat):
+        for path in _DASHBOARD_PATHS:
+            start = time.perf_counter()
+            resp = client.get(path.format(e=ENGAGEMENT))
+            latencies.append(time.perf_counter() - start)
+            resp.raise_for_status()
+    return {"latencies": latencies, "units": len(latencies)}
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "gap_analysis": scenario_gap_analysis,
+    "analyse_all": scenario_analyse_all,
+    "transcript_extraction": scenario_transcript_extraction,
+    "dashboards": scenario_dashboards,
+}
+
+
+# ── Runner ───────────────────────────────────────────────────────────────────
+
+def run_one(name: str, size: int, args) -> dict:
+    metrics.reset()
+    with offline_app(
+        args.latency_ms / 1000, args.jitter_ms / 1000, args.seed, not args.no_tools,
+        db_latency_s=args.db_latency_ms / 1000, write_behind=args.write_behind,
+    ) as (client, db, llm):
+        started = time.perf_counter()
+        outcome = SCENARIOS[name](client, db, llm, size, args)
+        wall = time.perf_counter() - started
+        # Count deferred writes too, so round trips compare like for like
+        main._write_behind.flush()
+        latencies = outcome["latencies"]
+        units = outcome["units"]
+        return {
+            "scenario": name,
+            "size": size,
+            "requests": len(latencies),
+            "units": units,
+            "wall_s": round(wall, 4),
+            "throughput_per_s": round(units / wall, 2) if wall else None,
+            "latency_ms": {
+                "p50": round(_percentile(latencies, 0.5) * 1000, 3),
+                "p95": round(_percentile(latencies, 0.95) * 1000, 3),
+                "p99": round(_percentile(latencies, 0.99) * 1000, 3),
+                "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+            },
+            "db_round_trips": db.round_trips,
+            "db_round_trips_per_unit": round(db.round_trips / units, 3) if units else None,
+            "db_calls_by_op": dict(db.calls_by_op),
+            "http_errors": int(metrics.counter_total("rapid_http_request_errors_total")),
+            "parse_failures": int(metrics.counter_total("rapid_dependency_errors_total", dependency="parse")),
+            "llm_calls": llm.call_count,
+            "llm_tokens": llm.total_input_tokens + llm.total_output_tokens,
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+        }
+
+
+def compare(current: dict, baseline_path: str, threshold_pct: float) -> List[str]:
+    """Return human-readable regressions of p95 latency / throughput vs a baseline file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r["scenario"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        old = previous.get((r["scenario"], r["size"]))
+        if not old:
+            continue
+        p95_old, p95_new = old["latency_ms"]["p95"], r["latency_ms"]["p95"]
+        tp_old, tp_new = old["throughput_per_s"] or 0, r["throughput_per_s"] or 0
+        p95_delta = (p95_new - p95_old) / p95_old * 100 if p95_old else 0.0
+        tp_delta = (tp_new - tp_old) / tp_old * 100 if tp_old else 0.0
+        line = (
+            f"{r['scenario']:<22} {r['size']:>6}  p95 {p95_old:>9.2f} → {p95_new:>9.2f} ms ({p95_delta:+.1f}%)"
+            f"  throughput {tp_old:>9.1f} → {tp_new:>9.1f}/s ({tp_delta:+.1f}%)"
+            f"  db {old['db_round_trips']} → {r['db_round_trips']}"
+            f"  parse failures {old.get('parse_failures', 0)} → {r.get('parse_failures', 0)}"
+        )
+        print(line)
+        if p95_delta > threshold_pct or tp_delta < -threshold_pct:
+            regressions.append(line)
+    return regressions
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline RAPID benchmark suite")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated LLM latency per call")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="uniform extra LLM latency")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-tools", action="store_true", help="replay plain-text replies instead of tool use")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="simulated Supabase round trip")
+    parser.add_argument("--write-behind", action="store_true", help="batch result writes (RAPID_WRITE_BEHIND=1)")
+    parser.add_argument("--max-requests", type=int, default=200, help="cap on per-request scenarios")
+    parser.add_argument("--repeat", type=int, default=3, help="dashboard sweeps per size")
+    parser.add_argument("--output", help="JSON results path (default benchmarks/results/bench-<ts>.json)")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--regression-pct", type=float, default=20.0)
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.scenarios:
+        for size in args.sizes:
+            r = run_one(name, size, args)
+            results.append(r)
+            print(
+                f"{name:<22} {size:>6}  {r['throughput_per_s']:>10}/s  "
+                f"p50 {r['latency_ms']['p50']:>9.2f}  p95 {r['latency_ms']['p95']:>9.2f}  "
+                f"p99 {r['latency_ms']['p99']:>9.2f} ms  db {r['db_round_trips']:>6}  "
+                f"llm {r['llm_calls']:>6}  parse-fail {r['parse_failures']:>4}  rss {r['peak_rss_mb']} MB"
+            )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "seed": args.seed,
+            "tool_use": not args.no_tools,
+            "db_latency_ms": args.db_latency_ms,
+            "write_behind": args.write_behind,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"bench-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {output}")
+
+    if args.compare:
+        regressions = compare(report, args.compare, args.regression_pct)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.regression_pct}%")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,128 @@
+"""
+Storage backend comparison: the same workload against each StorageBackend.
+
+    python -m benchmarks.storage_compare                       # 1k requirements, 2 ms simulated Supabase RTT
+    python -m benchmarks.storage_compare --size 10000 --rtt-ms 20
+    python -m benchmarks.storage_compare --output benchmarks/results/storage.json
+
+Backends:
+    sqlite-file    SQLiteBackend on a temporary file (WAL)
+    sqlite-memory  SQLiteBackend(":memory:")
+    supabase-fake  SupabaseBackend over FakeSupabase with --rtt-ms per round trip
+
+Each operation reports ops/s and p50/p95 latency. The Supabase figures are a
+model (in-memory scan + fixed RTT), useful for relative comparison only.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeSupabase  # noqa: E402
+from benchmarks.run import _percentile  # noqa: E402
+from storage import SQLiteBackend, StorageBackend, SupabaseBackend  # noqa: E402
+
+ENGAGEMENT = "bench-storage"
+
+
+def _backends(rtt_s: float, tmpdir: str) -> Dict[str, Callable[[], StorageBackend]]:
+    return {
+        "sqlite-file": lambda: SQLiteBackend(os.path.join(tmpdir, "rapid-bench.db")),
+        "sqlite-memory": lambda: SQLiteBackend(":memory:"),
+        "supabase-fake": lambda: SupabaseBackend(FakeSupabase(latency_s=rtt_s)),
+    }
+
+
+def _timed_ops(fn: Callable[[int], None], n: int) -> dict:
+    latencies: List[float] = []
+    start = time.perf_counter()
+    for i in range(n):
+        t0 = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    return {
+        "ops": n,
+        "ops_per_s": round(n / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(_percentile(latencies, 0.5) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 3),
+    }
+
+
+def run_backend(backend: StorageBackend, size: int, reads: int) -> dict:
+    def create(i):
+        backend.create_requirement({
+            "engagement_id": ENGAGEMENT,
+            "title": f"Requirement {i}",
+            "description": f"Benchmark requirement {i}",
+            "status": "open",
+            "created_at": "2026-03-01T10:00:00+00:00",
+            "tags": ["PAIN_POINT"],
+        })
+
+    def save_gap(i):
+        backend.save_gap_result({
+            "engagement_id": ENGAGEMENT,
+            "req_id": f"REQ-{i + 1:03d}",
+            "process_description": f"Benchmark requirement {i}",
+            "matches": [{"id": "J45", "confidence": "HIGH", "rationale": "AP"}],
+            "tokens_used": 1200,
+            "timestamp": f"2026-03-01T10:{i // 60 % 60:02d}:{i % 60:02d}+00:00",
+        })
+
+    step = max(1, size // reads)
+    return {
+        "create_requirement": _timed_ops(create, size),
+        "save_gap_result": _timed_ops(save_gap, size),
+        "get_requirement_by_id": _timed_ops(
+            lambda i: backend.get_requirement_by_id(f"REQ-{(i * step) % size + 1:03d}", ENGAGEMENT), reads
+        ),
+        "get_gap_results_by_req_id": _timed_ops(
+            lambda i: backend.get_gap_results_by_req_id(f"REQ-{(i * step) % size + 1:03d}", ENGAGEMENT), reads
+        ),
+        "update_requirement": _timed_ops(
+            lambda i: backend.update_requirement(f"REQ-{(i * step) % size + 1:03d}", ENGAGEMENT, {"status": "analysed"}),
+            reads,
+        ),
+        "get_requirements_by_engagement": _timed_ops(lambda i: backend.get_requirements_by_engagement(ENGAGEMENT), 5),
+        "get_results_by_engagement": _timed_ops(lambda i: backend.get_results_by_engagement(ENGAGEMENT), 5),
+    }
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare RAPID storage backends")
+    parser.add_argument("--size", type=int, default=1000, help="requirements (and gap results) to insert")
+    parser.add_argument("--reads", type=int, default=200, help="point reads/updates per operation")
+    parser.add_argument("--rtt-ms", type=float, default=2.0, help="simulated Supabase round trip")
+    parser.add_argument("--backends", nargs="+", default=None)
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    report = {"meta": {"size": args.size, "reads": args.reads, "rtt_ms": args.rtt_ms}, "results": {}}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        factories = _backends(args.rtt_ms / 1000, tmpdir)
+        for name in args.backends or list(factories):
+            backend = factories[name]()
+            report["results"][name] = run_backend(backend, args.size, args.reads)
+            if isinstance(backend, SQLiteBackend):
+                backend.close()
+
+    for name, ops in report["results"].items():
+        print(name)
+        for op, r in ops.items():
+            print(f"  {op:<32} {r['ops_per_s']:>10}/s  p50 {r['p50_ms']:>8.3f}  p95 {r['p95_ms']:>8.3f} ms")
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
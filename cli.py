@@ -0,0 +1,207 @@
+"""
+RAPID command-line tools.
+
+    python cli.py profile-startup                  # import-time breakdown of `import main`
+    python cli.py profile-startup --warm-up --json
+    python cli.py profile-startup --budget-ms 800  # exit 1 if cold import exceeds the budget
+    python cli.py migrate-compact-matches --dry-run # report how much compacting gap_results saves
+    python cli.py migrate-compact-matches           # rewrite legacy full matches in place
+    python cli.py precompute-templates              # gap matches for the domain templates
+    python cli.py precompute-templates --force      # recompute every template, not just missing ones
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# First-party modules reported individually (cumulative time incl. their imports)
+FIRST_PARTY = ("main", "database", "storage", "providers", "metrics", "scope_items")
+
+_PROFILE_SNIPPET = """
+import time, json, sys
+t0 = time.perf_counter()
+import {module}
+imported = time.perf_counter() - t0
+warm, error = None, None
+if {warm_up}:
+    import database
+    try:
+        warm = database.warm_up()
+    except Exception as e:
+        error = str(e)
+print("RAPID_PROFILE " + json.dumps({{"import_s": imported, "warm_up_s": warm, "warm_up_error": error}}))
+"""
+
+
+# ── profile-startup ──────────────────────────────────────────────────────────
+
+def parse_importtime(stderr: str) -> List[dict]:
+    """Parse `python -X importtime` output into {module, self_us, cumulative_us, depth}."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:
+            continue
+        # Nesting is shown as two spaces per level after the single separator space
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append({
+            "module": name.strip(),
+            "self_us": self_us,
+            "cumulative_us": cumulative_us,
+            "depth": depth,
+        })
+    return rows
+
+
+def summarise_imports(rows: List[dict], top: int = 15) -> dict:
+    by_package: Dict[str, int] = {}
+    for row in rows:
+        package = row["module"].split(".")[0]
+        by_package[package] = by_package.get(package, 0) + row["self_us"]
+    first_party = {
+        row["module"]: round(row["cumulative_us"] / 1000, 1)
+        for row in rows
+        if row["module"] in FIRST_PARTY
+    }
+    ranked = sorted(by_package.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return {
+        "modules_imported": len(rows),
+        "first_party_ms": first_party,
+        "top_packages_ms": {name: round(us / 1000, 1) for name, us in ranked},
+    }
+
+
+def profile_startup(module: str = "main", warm_up: bool = False, top: int = 15) -> dict:
+    """Import `module` in a fresh interpreter with -X importtime and summarise."""
+    code = _PROFILE_SNIPPET.format(module=module, warm_up=bool(warm_up))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, env=os.environ.copy(),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+    timings = {}
+    for line in proc.stdout.splitlines():
+        if line.startswith("RAPID_PROFILE "):
+            timings = json.loads(line[len("RAPID_PROFILE "):])
+    report = summarise_imports(parse_importtime(proc.stderr), top=top)
+    report["import_ms"] = round(timings.get("import_s", 0) * 1000, 1)
+    if timings.get("warm_up_s") is not None:
+        report["warm_up_ms"] = round(timings["warm_up_s"] * 1000, 1)
+    if timings.get("warm_up_error"):
+        report["warm_up_error"] = timings["warm_up_error"]
+    return report
+
+
+def _cmd_profile_startup(args) -> int:
+    report = profile_startup(args.module, warm_up=args.warm_up, top=args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"import {args.module}: {report['import_ms']} ms ({report['modules_imported']} modules)")
+        if "warm_up_ms" in report:
+            print(f"storage warm-up: {report['warm_up_ms']} ms")
+        if "warm_up_error" in report:
+            print(f"storage warm-up failed: {report['warm_up_error']}")
+        print("\nfirst-party (cumulative ms)")
+        for name, ms in report["first_party_ms"].items():
+            print(f"  {name:<24} {ms:>8}")
+        print("\ntop packages (self ms)")
+        for name, ms in report["top_packages_ms"].items():
+            print(f"  {name:<24} {ms:>8}")
+    if args.budget_ms and report["import_ms"] > args.budget_ms:
+        print(f"cold import {report['import_ms']} ms exceeds budget {args.budget_ms} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+# ── migrate-compact-matches ──────────────────────────────────────────────────
+
+def _needs_compaction(matches) -> bool:
+    return any(isinstance(m, dict) and "rank" not in m for m in matches or [])
+
+
+def migrate_compact_matches(backend, dry_run: bool = False, batch_size: int = 500) -> dict:
+    """Rewrite gap_results rows whose matches still embed catalogue fields."""
+    from scope_items import compact_matches
+
+    stats = {"scanned": 0, "converted": 0, "bytes_before": 0, "bytes_after": 0}
+    for page in backend.iter_gap_results(batch_size=batch_size):
+        for row in page:
+            stats["scanned"] += 1
+            matches = row.get("matches") or []
+            before = len(json.dumps(matches))
+            if not _needs_compaction(matches):
+                stats["bytes_before"] += before
+                stats["bytes_after"] += before
+                continue
+            compacted = compact_matches(matches)
+            stats["converted"] += 1
+            stats["bytes_before"] += before
+            stats["bytes_after"] += len(json.dumps(compacted))
+            if not dry_run:
+                backend.update_gap_result(row["id"], {"matches": compacted})
+    return stats
+
+
+def _cmd_migrate_compact_matches(args) -> int:
+    import database
+
+    stats = migrate_compact_matches(database.get_backend(), dry_run=args.dry_run, batch_size=args.batch_size)
+    saved = stats["bytes_before"] - stats["bytes_after"]
+    pct = saved / stats["bytes_before"] * 100 if stats["bytes_before"] else 0.0
+    verb = "would convert" if args.dry_run else "converted"
+    print(f"scanned {stats['scanned']} gap_results rows, {verb} {stats['converted']}")
+    print(f"matches JSON: {stats['bytes_before']} → {stats['bytes_after']} bytes ({pct:.1f}% smaller)")
+    return 0
+
+
+# ── precompute-templates ─────────────────────────────────────────────────────
+
+def _cmd_precompute_templates(args) -> int:
+    import main
+
+    stats = main.precompute_template_results(force=args.force, path=args.output)
+    print(
+        f"{stats['templates']} template descriptions: {stats['computed']} computed, "
+        f"{stats['reused']} already current, {len(stats['failed'])} failed ({stats['tokens_used']} tokens)"
+    )
+    return 1 if stats["failed"] else 0
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="cli.py", description="RAPID command-line tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("profile-startup", help="per-module import-time breakdown of a cold start")
+    p.add_argument("--module", default="main")
+    p.add_argument("--warm-up", action="store_true", help="also time database.warm_up()")
+    p.add_argument("--top", type=int, default=15)
+    p.add_argument("--json", action="store_true")
+    p.add_argument("--budget-ms", type=float, default=0, help="fail if the cold import is slower")
+    p.set_defaults(func=_cmd_profile_startup)
+
+    p = sub.add_parser("migrate-compact-matches", help="store gap_results matches without catalogue fields")
+    p.add_argument("--dry-run", action="store_true", help="report savings without writing")
+    p.add_argument("--batch-size", type=int, default=500)
+    p.set_defaults(func=_cmd_migrate_compact_matches)
+
+    p = sub.add_parser("precompute-templates", help="compute and store gap matches for the domain templates")
+    p.add_argument("--force", action="store_true", help="recompute entries that are still current")
+    p.add_argument("--output", default=None, help="results file (default RAPID_TEMPLATE_RESULTS_PATH)")
+    p.set_defaults(func=_cmd_precompute_templates)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,176 @@
+"""
+Response compression middleware.
+
+Compresses JSON/text responses of at least `minimum_size` bytes with Brotli
+when the `brotli` package is installed and the client accepts it, otherwise
+gzip. Responses of unknown length (true streams such as exports) are
+compressed incrementally, flushing after every chunk so they keep streaming.
+
+A strong ETag on a compressed response gets an encoding suffix
+("abc" → "abc-gzip") because the bytes differ; etags.if_none_match() strips
+it again when the client revalidates.
+"""
+import os
+import zlib
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+import metrics
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+MINIMUM_SIZE = int(os.getenv("RAPID_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("RAPID_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("RAPID_BROTLI_QUALITY", "4"))
+
+# Bodies larger than this are compressed off the event loop
+_THREADPOOL_BYTES = 256 * 1024
+
+_COMPRESSIBLE_TYPES = (
+    "application/json", "application/x-ndjson", "text/", "application/javascript", "image/svg+xml",
+)
+
+metrics.describe("rapid_http_compressed_total", "counter", "Responses compressed by encoding")
+metrics.describe("rapid_http_compression_saved_bytes_total", "counter", "Bytes saved by response compression")
+
+
+def _accepted_encodings(header: str) -> dict:
+    accepted = {}
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(accept_encoding: str):
+    """Pick "br", "gzip" or None for an Accept-Encoding header."""
+    accepted = _accepted_encodings(accept_encoding or "")
+    wildcard = accepted.get("*", 0)
+    if brotli is not None and accepted.get("br", wildcard) > 0:
+        return "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+class _Encoder:
+    """Incremental gzip/Brotli encoder; each chunk is flushed so streams keep flowing."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits=31 → gzip container
+            self._c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._c.process(data)
+            return out + (self._c.finish() if final else self._c.flush())
+        out = self._c.compress(data)
+        return out + self._c.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        pending_start = None
+        encoder = None
+        bytes_in = bytes_out = 0
+
+        async def send_wrapper(message):
+            nonlocal pending_start, encoder, bytes_in, bytes_out
+            if message["type"] == "http.response.start":
+                # Hold the headers until the first body chunk
+                pending_start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if pending_start is not None:
+                start, pending_start = pending_start, None
+                headers = MutableHeaders(raw=start["headers"])
+                compressible = headers.get("content-type", "").startswith(_COMPRESSIBLE_TYPES)
+                if compressible:
+                    headers.add_vary_header("Accept-Encoding")
+                # Wrapped responses arrive as chunks but keep their Content-Length;
+                # only a true stream has no known size
+                if "content-length" in headers:
+                    size = int(headers["content-length"])
+                else:
+                    size = None if more_body else len(body)
+                if (
+                    not compressible
+                    or "content-encoding" in headers
+                    or start["status"] in (204, 304)
+                    or (size is not None and size < self.minimum_size)
+                ):
+                    await send(start)
+                    await send(message)
+                    return
+                encoder = _Encoder(encoding)
+                headers["Content-Encoding"] = encoding
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+                etag = headers.get("etag")
+                if etag and etag.endswith('"') and not etag.startswith("W/"):
+                    headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+                if not more_body:
+                    out = await self._encode(encoder, body, True)
+                    headers["Content-Length"] = str(len(out))
+                    self._record(encoding, len(body), len(out))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": out})
+                    return
+                await send(start)
+
+            if encoder is None:
+                await send(message)
+                return
+            out = await self._encode(encoder, body, not more_body)
+            bytes_in += len(body)
+            bytes_out += len(out)
+            if not more_body:
+                self._record(encoding, bytes_in, bytes_out)
+            await send({"type": "http.response.body", "body": out, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    async def _encode(encoder: _Encoder, body: bytes, final: bool) -> bytes:
+        if len(body) > _THREADPOOL_BYTES:
+            return await run_in_threadpool(encoder.chunk, body, final)
+        return encoder.chunk(body, final)
+
+    @staticmethod
+    def _record(encoding: str, size_in: int, size_out: int):
+        metrics.inc("rapid_http_compressed_total", encoding=encoding)
+        metrics.inc("rapid_http_compression_saved_bytes_total", size_in - size_out)
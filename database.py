@@ -1,19 +1,64 @@
 import os
+import threading
+import time
 from datetime import datetime, timezone
+from typing import Optional
 from dotenv import load_dotenv
-from supabase import create_client, Client
+
+import dedup_index
+import etags
+from metrics import timed
+from storage import StorageBackend, create_backend
 
 load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# supabase (default) or sqlite — see storage.py
+STORAGE_BACKEND = os.getenv("RAPID_STORAGE_BACKEND", "supabase").lower()
+SQLITE_PATH = os.getenv("RAPID_SQLITE_PATH", "rapid.db")
+
+# The client and backend are built on first use (or by warm_up() at app
+# startup), so importing this module for /health, tests or the CLI does not
+# pay for importing supabase-py and constructing its client.
+_client = None
+_backend: Optional[StorageBackend] = None
+_init_lock = threading.Lock()
+
+
+def get_client():
+    """Return the shared Supabase client, creating it on first call."""
+    global _client
+    if _client is None:
+        with _init_lock:
+            if _client is None:
+                from supabase import create_client
+                _client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _client
+
+
+def get_backend() -> StorageBackend:
+    """Return the configured storage backend, creating it on first call."""
+    global _backend
+    if _backend is None:
+        client = get_client() if STORAGE_BACKEND == "supabase" else None
+        with _init_lock:
+            if _backend is None:
+                _backend = create_backend(STORAGE_BACKEND, supabase_client=client, sqlite_path=SQLITE_PATH)
+    return _backend
+
+
+def warm_up() -> float:
+    """Build the client/backend ahead of the first request; returns seconds taken."""
+    start = time.perf_counter()
+    get_backend()
+    return time.perf_counter() - start
 
 
 # ── Gap Analysis ─────────────────────────────────────────────────────────────
 
-def save_gap_analysis(
+def gap_result_record(
     engagement_id: str,
     process_description: str,
     matches: list,
@@ -21,6 +66,7 @@ def save_gap_analysis(
     timestamp: str = None,
     req_id: str = None,
 ) -> dict:
+    """Build a gap_results row (shared by the direct and batched write paths)."""
     record = {
         "engagement_id": engagement_id,
         "process_description": process_description,
@@ -31,41 +77,47 @@ def save_gap_analysis(
         record["tokens_used"] = tokens_used
     if req_id is not None:
         record["req_id"] = req_id
-    response = supabase.table("gap_results").insert(record).execute()
-    return response.data[0] if response.data else {}
+    return record
 
 
+@timed("db")
+def save_gap_analysis(
+    engagement_id: str,
+    process_description: str,
+    matches: list,
+    tokens_used: int = None,
+    timestamp: str = None,
+    req_id: str = None,
+) -> dict:
+    record = gap_result_record(engagement_id, process_description, matches, tokens_used, timestamp, req_id)
+    saved = get_backend().save_gap_result(record)
+    etags.bump(engagement_id)
+    return saved
+
+
+@timed("db")
+def save_gap_analyses(records: list) -> list:
+    """Insert pre-built gap_result_record() rows in one round trip."""
+    saved = get_backend().save_gap_results(records)
+    for engagement_id in {r.get("engagement_id") for r in records}:
+        etags.bump(engagement_id)
+    return saved
+
+
+@timed("db")
 def get_results_by_engagement(engagement_id: str) -> list:
-    response = (
-        supabase.table("gap_results")
-        .select("*")
-        .eq("engagement_id", engagement_id)
-        .order("timestamp", desc=True)
-        .execute()
-    )
-    return response.data or []
+    return get_backend().get_results_by_engagement(engagement_id)
 
 
-# ── Requirements ─────────────────────────────────────────────────────────────
+@timed("db")
+def get_results_since(engagement_id: str, after_id: int) -> list:
+    """Gap results for an engagement with id > after_id, oldest first."""
+    return [row for page in get_backend().iter_results_since(engagement_id, after_id) for row in page]
 
-def _next_req_id(engagement_id: str) -> str:
-    """Generate next sequential REQ-XXX id, unique within an engagement."""
-    response = (
-        supabase.table("requirements")
-        .select("req_id")
-        .eq("engagement_id", engagement_id)
-        .execute()
-    )
-    existing = response.data or []
-    nums = []
-    for row in existing:
-        try:
-            nums.append(int(row["req_id"].split("-")[1]))
-        except (IndexError, ValueError):
-            pass
-    return f"REQ-{max(nums, default=0) + 1:03d}"
 
+# ── Requirements ─────────────────────────────────────────────────────────────
 
+@timed("db")
 def create_requirement(
     engagement_id: str,
     title: str,
@@ -90,9 +142,16 @@ def create_requirement(
           ADD COLUMN IF NOT EXISTS sap_mapping_id text,
           ADD COLUMN IF NOT EXISTS fit_assessment text;
     """
-    req_id = _next_req_id(engagement_id)
+    record = _requirement_record(engagement_id, title, description, **kwargs)
+    # The backend allocates the next REQ-XXX id within the engagement
+    created = get_backend().create_requirement(record)
+    etags.bump(engagement_id)
+    dedup_index.get_index().observe(created)
+    return created
+
+
+def _requirement_record(engagement_id: str, title: str, description: str, **kwargs) -> dict:
     record = {
-        "req_id": req_id,
         "engagement_id": engagement_id,
         "title": title,
         "description": description,
@@ -102,52 +161,64 @@ def create_requirement(
     }
     # Merge remaining kwargs; skip None values so Supabase uses column defaults
     record.update({k: v for k, v in kwargs.items() if v is not None})
-    response = supabase.table("requirements").insert(record).execute()
-    return response.data[0] if response.data else {}
+    return record
 
 
+@timed("db")
+def create_requirements(engagement_id: str, requirements: list) -> list:
+    """Create many requirements in one round trip.
+
+    Each item holds create_requirement()'s keyword arguments (title,
+    description, ...) without engagement_id. REQ ids are allocated as one
+    consecutive block, in item order.
+    """
+    records = [_requirement_record(engagement_id, **item) for item in requirements]
+    created = get_backend().create_requirements(records)
+    etags.bump(engagement_id)
+    index = dedup_index.get_index()
+    for row in created:
+        index.observe(row)
+    return created
+
+
+@timed("db")
 def get_requirements_by_engagement(engagement_id: str) -> list:
-    response = (
-        supabase.table("requirements")
-        .select("*")
-        .eq("engagement_id", engagement_id)
-        .order("req_id")
-        .execute()
-    )
-    return response.data or []
+    return get_backend().get_requirements_by_engagement(engagement_id)
+
+
+def iter_requirements(engagement_id: str, batch_size: int = 500):
+    """Yield an engagement's requirements in pages of `batch_size`, oldest first."""
+    return get_backend().iter_requirements(engagement_id, batch_size)
+
+
+@timed("db")
+def get_latest_results(engagement_id: str, req_ids: list) -> dict:
+    """req_id → newest gap result, for the given requirements that have one."""
+    return get_backend().get_latest_results(engagement_id, req_ids)
 
 
+@timed("db")
 def get_requirement_by_id(req_id: str, engagement_id: str) -> dict:
-    response = (
-        supabase.table("requirements")
-        .select("*")
-        .eq("req_id", req_id)
-        .eq("engagement_id", engagement_id)
-        .limit(1)
-        .execute()
-    )
-    data = response.data or []
-    return data[0] if data else None
+    return get_backend().get_requirement_by_id(req_id, engagement_id)
 
 
+@timed("db")
 def get_gap_results_by_req_id(req_id: str, engagement_id: str) -> list:
-    response = (
-        supabase.table("gap_results")
-        .select("*")
-        .eq("req_id", req_id)
-        .eq("engagement_id", engagement_id)
-        .order("timestamp", desc=True)
-        .execute()
-    )
-    return response.data or []
+    return get_backend().get_gap_results_by_req_id(req_id, engagement_id)
 
 
+@timed("db")
 def update_requirement(req_id: str, engagement_id: str, updates: dict) -> dict:
-    response = (
-        supabase.table("requirements")
-        .update(updates)
-        .eq("req_id", req_id)
-        .eq("engagement_id", engagement_id)
-        .execute()
-    )
-    return response.data[0] if response.data else {}
+    updated = get_backend().update_requirement(req_id, engagement_id, updates)
+    etags.bump(engagement_id)
+    if "title" in updates or "description" in updates:
+        dedup_index.get_index().observe(updated)
+    return updated
+
+
+@timed("db")
+def update_requirements(req_ids: list, engagement_id: str, updates: dict) -> list:
+    """Apply the same `updates` to several requirements in one round trip."""
+    updated = get_backend().update_requirements(req_ids, engagement_id, updates)
+    etags.bump(engagement_id)
+    return updated
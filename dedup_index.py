@@ -0,0 +1,228 @@
+"""
+Near-duplicate requirement detection with MinHash and LSH.
+
+Each requirement's title and description are normalised (lowercase,
+punctuation runs → one space) and cut into character shingles of
+SHINGLE_CHARS, which tolerate the small rewordings duplicates usually differ
+by. A NUM_PERM-value MinHash signature estimates the Jaccard similarity of
+two shingle sets. The signature is split
+into BANDS bands; requirements sharing any band are candidates, and only
+candidates are compared. With 16 bands of 4 rows, a pair at Jaccard 0.5 is a
+candidate about 64% of the time, and a pair at 0.7 about 99% of the time.
+Candidates are confirmed on exact Jaccard of their shingle sets against
+THRESHOLD.
+
+The index is per engagement and per process. sync() brings an engagement in
+line with a fresh requirements list and only re-hashes rows whose text
+changed. database.create_requirement and update_requirement call observe(), so
+writes in this process are indexed at once. At most MAX_ENGAGEMENTS
+engagements are kept; the least recently used are dropped and rebuilt on the
+next sync.
+"""
+import hashlib
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from storage import req_number
+
+THRESHOLD = float(os.getenv("RAPID_DUPLICATE_THRESHOLD", "0.7"))
+NUM_PERM = 64
+BANDS = 16
+SHINGLE_CHARS = 5
+MAX_ENGAGEMENTS = 256
+
+_PRIME = (1 << 61) - 1
+_MASK = (1 << 32) - 1
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def _permutations(n: int) -> List[Tuple[int, int]]:
+    """Fixed (a, b) pairs for h(x) = (a*x + b) mod p, so signatures are stable across runs."""
+    perms = []
+    for i in range(n):
+        digest = hashlib.sha256(f"rapid-minhash-{i}".encode()).digest()
+        a = int.from_bytes(digest[:8], "big") % (_PRIME - 1) + 1
+        b = int.from_bytes(digest[8:16], "big") % _PRIME
+        perms.append((a, b))
+    return perms
+
+
+_PERMS = _permutations(NUM_PERM)
+
+
+def requirement_text(req: dict) -> str:
+    return f"{req.get('title') or ''} {req.get('description') or ''}"
+
+
+def shingles(text: str) -> frozenset:
+    text = _NON_WORD.sub(" ", text.lower()).strip()
+    if len(text) <= SHINGLE_CHARS:
+        return frozenset([text]) if text else frozenset()
+    return frozenset(text[i:i + SHINGLE_CHARS] for i in range(len(text) - SHINGLE_CHARS + 1))
+
+
+def signature(shingle_set: frozenset) -> Tuple[int, ...]:
+    hashes = [zlib.crc32(s.encode()) & _MASK for s in shingle_set]
+    if not hashes:
+        return tuple([_MASK] * NUM_PERM)
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS)
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class _EngagementIndex:
+    def __init__(self):
+        self.text: Dict[str, str] = {}
+        self.shingles: Dict[str, frozenset] = {}
+        self.bands: Dict[str, Tuple[tuple, ...]] = {}
+        self.buckets: List[Dict[tuple, set]] = [{} for _ in range(BANDS)]
+
+    def add(self, req_id: str, text: str):
+        if self.text.get(req_id) == text:
+            return
+        self.remove(req_id)
+        shingle_set = shingles(text)
+        sig = signature(shingle_set)
+        rows = NUM_PERM // BANDS
+        bands = tuple(sig[i * rows:(i + 1) * rows] for i in range(BANDS))
+        for bucket, band in zip(self.buckets, bands):
+            bucket.setdefault(band, set()).add(req_id)
+        self.text[req_id] = text
+        self.shingles[req_id] = shingle_set
+        self.bands[req_id] = bands
+
+    def remove(self, req_id: str):
+        bands = self.bands.pop(req_id, None)
+        if bands is None:
+            return
+        for bucket, band in zip(self.buckets, bands):
+            members = bucket.get(band)
+            if members:
+                members.discard(req_id)
+                if not members:
+                    del bucket[band]
+        del self.text[req_id]
+        del self.shingles[req_id]
+
+    def similar(self, req_id: str, threshold: float) -> List[Tuple[str, float]]:
+        bands = self.bands.get(req_id)
+        if bands is None:
+            return []
+        candidates = set()
+        for bucket, band in zip(self.buckets, bands):
+            candidates |= bucket.get(band, set())
+        candidates.discard(req_id)
+        scored = [(other, jaccard(self.shingles[req_id], self.shingles[other])) for other in candidates]
+        return sorted(((o, round(s, 4)) for o, s in scored if s >= threshold), key=lambda x: (-x[1], _req_order(x[0])))
+
+
+def _req_order(req_id: str) -> tuple:
+    """REQ-999 before REQ-1000; ids without a number sort last, by text."""
+    n = req_number(req_id)
+    return (n is None, n or 0, req_id)
+
+
+class DuplicateIndex:
+    def __init__(self, threshold: float = THRESHOLD, max_engagements: int = MAX_ENGAGEMENTS):
+        self.threshold = threshold
+        self.max_engagements = max_engagements
+        self._engagements: "OrderedDict[str, _EngagementIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _index(self, engagement_id: str, create: bool = True) -> Optional[_EngagementIndex]:
+        index = self._engagements.get(engagement_id)
+        if index is None and create:
+            index = self._engagements[engagement_id] = _EngagementIndex()
+            while len(self._engagements) > self.max_engagements:
+                self._engagements.popitem(last=False)
+        if index is not None:
+            self._engagements.move_to_end(engagement_id)
+        return index
+
+    def observe(self, req: dict):
+        """Index a created or edited requirement, if its engagement is indexed here."""
+        if not req or not req.get("req_id"):
+            return
+        with self._lock:
+            index = self._index(req.get("engagement_id"), create=False)
+            if index is not None:
+                index.add(req["req_id"], requirement_text(req))
+
+    def sync(self, engagement_id: str, requirements: list):
+        """Make the engagement's index match `requirements`; unchanged rows are not re-hashed."""
+        with self._lock:
+            index = self._index(engagement_id)
+            current = {r["req_id"]: requirement_text(r) for r in requirements if r.get("req_id")}
+            for req_id in set(index.text) - set(current):
+                index.remove(req_id)
+            for req_id, text in current.items():
+                index.add(req_id, text)
+
+    def duplicates_of(self, engagement_id: str, req_id: str) -> List[Tuple[str, float]]:
+        """(req_id, Jaccard similarity) of every near-duplicate, most similar first."""
+        with self._lock:
+            index = self._index(engagement_id, create=False)
+            return index.similar(req_id, self.threshold) if index else []
+
+    def groups(self, engagement_id: str) -> List[dict]:
+        """Connected groups of near-duplicates, each with its member pairs' lowest similarity."""
+        with self._lock:
+            index = self._index(engagement_id, create=False)
+            if index is None:
+                return []
+            parent = {req_id: req_id for req_id in index.text}
+
+            def find(x):
+                while parent[x] != x:
+                    parent[x] = parent[parent[x]]
+                    x = parent[x]
+                return x
+
+            lowest: Dict[str, float] = {}
+            pairs = []
+            for req_id in index.text:
+                for other, score in index.similar(req_id, self.threshold):
+                    if req_id < other:
+                        pairs.append((req_id, other, score))
+                        parent[find(other)] = find(req_id)
+            for a, _, score in pairs:
+                root = find(a)
+                lowest[root] = min(lowest.get(root, 1.0), score)
+
+        members: Dict[str, List[str]] = {}
+        for req_id in parent:
+            members.setdefault(find(req_id), []).append(req_id)
+        groups = [
+            {"req_ids": sorted(ids, key=_req_order), "min_similarity": lowest[root]}
+            for root, ids in members.items() if len(ids) > 1
+        ]
+        groups.sort(key=lambda g: _req_order(g["req_ids"][0]))
+        return groups
+
+    def reset(self, engagement_id: Optional[str] = None):
+        with self._lock:
+            if engagement_id is None:
+                self._engagements.clear()
+            else:
+                self._engagements.pop(engagement_id, None)
+
+
+_index: Optional[DuplicateIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> DuplicateIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = DuplicateIndex()
+    return _index
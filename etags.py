@@ -0,0 +1,73 @@
+"""
+Strong ETags for read endpoints.
+
+An ETag is a hash of the route, its query string and a version token:
+
+    catalogue routes   → CATALOGUE_VERSION (content hash of SCOPE_ITEMS)
+    engagement routes  → data_version(engagement_id), bumped by every write
+                         helper in database.py
+
+Because the version is known before the endpoint runs, a matching
+If-None-Match is answered with 304 without touching the database.
+
+Data versions are counters in shared_state's ledger, so a write through any
+gunicorn worker changes the tag every worker computes. They are prefixed with
+the shared store's instance id, so a fresh store (a restart of a
+single-process run, or a deleted state file) can never replay an old tag.
+Writes that bypass database.py are not seen. RAPID_ETAGS=0 disables
+conditional GETs.
+
+Engagement tags are only valid for a single host. shared_state lives on
+the host (memory or a local SQLite file), so behind several replicas a write
+handled by one host does not bump the counters of another, and that host
+keeps answering 304 for data that has changed. Run more than one replica
+only with RAPID_ETAGS=0. Catalogue tags depend only on the code, so they are
+safe anywhere.
+"""
+import hashlib
+from typing import Optional
+
+import shared_state
+
+
+def _key(engagement_id: str) -> str:
+    return f"etag:{engagement_id}"
+
+
+def bump(engagement_id: Optional[str]):
+    """Invalidate cached reads for an engagement after a write."""
+    if not engagement_id:
+        return
+    shared_state.get_shared_state().ledger_add(_key(engagement_id), 1)
+
+
+def data_version(engagement_id: str) -> str:
+    state = shared_state.get_shared_state()
+    key = _key(engagement_id)
+    return f"{state.instance_id}.{int(state.ledger_get(key).get(key, 0))}"
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode()).hexdigest()[:24]
+    return f'"{digest}"'
+
+
+def _opaque(tag: str) -> str:
+    """Normalise a tag for weak comparison: drop W/ and any -gzip/-br suffix."""
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for suffix in ('-gzip"', '-br"'):
+        if tag.endswith(suffix):
+            return tag[: -len(suffix)] + '"'
+    return tag
+
+
+def if_none_match(header: Optional[str], etag: str) -> bool:
+    """True when the client's If-None-Match already covers `etag`."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    wanted = _opaque(etag)
+    return any(_opaque(candidate) == wanted for candidate in header.split(","))
@@ -0,0 +1,52 @@
+"""
+Opt-in fast JSON path for large read endpoints (RAPID_FAST_JSON=1).
+
+By default FastAPI validates a listing against its `response_model`, walks
+the result with jsonable_encoder and encodes it with the stdlib json module.
+Requirement rows were already validated by RequirementCreate/RequirementUpdate
+on the way in, so for big engagements that work is pure overhead. With the
+fast path on, listing endpoints return a response encoded by orjson straight
+from the stored rows; project() keeps the response model's field set and
+defaults so the JSON has the same shape.
+
+orjson is an optional dependency; without it the flag is ignored.
+"""
+import json
+import os
+from functools import lru_cache
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+ENABLED = os.getenv("RAPID_FAST_JSON", "0") == "1" and orjson is not None
+
+
+def dumps(content) -> bytes:
+    if orjson is None:
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+@lru_cache(maxsize=None)
+def _fields(model) -> tuple:
+    return tuple(
+        (name, field.get_default(call_default_factory=True))
+        for name, field in model.model_fields.items()
+    )
+
+
+def project(rows: list, model) -> list:
+    """Trim stored rows to `model`'s fields, filling its defaults, without validating."""
+    fields = _fields(model)
+    return [{name: row.get(name, default) for name, default in fields} for row in rows]
@@ -0,0 +1,116 @@
+"""
+Gap-analysis engine: the one pipeline behind /gap-analysis, analyse-all and
+the evaluation harness.
+
+    candidates → prompt → llm → parse → enrich → persist
+
+Each stage is a callable injected at construction, so an optimisation (a
+cache, a prefilter, batching) is made once, in one stage:
+
+    candidates(description, top_n, lob) → picks that settle the request, or None
+    prompt(description, top_n, lob)     → prompts.Prompt
+    llm(provider, prompt)               → provider result dict
+    parse(result)                       → [{"id", "confidence", "rationale"}]
+    enrich(picks, top_n)                → catalogue-backed matches
+    persist(run)                        → store the GapRun
+
+When candidates returns picks the prompt, llm and parse stages are skipped.
+Every stage runs inside metrics.span(<stage>, "gap_analysis"), so it shows in
+the dependency latency summaries and the Server-Timing header; its duration
+is also kept on the GapRun. A persist failure is logged and does not fail the
+analysis.
+"""
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import metrics
+
+STAGES = ("candidates", "prompt", "llm", "parse", "enrich", "persist")
+
+
+class GapRun:
+    """Outcome of one analysis; stage_seconds holds the stages that ran."""
+
+    def __init__(self, process_description: str, engagement_id: Optional[str], req_id: Optional[str]):
+        self.process_description = process_description
+        self.engagement_id = engagement_id
+        self.req_id = req_id
+        self.matches: List = []
+        self.tokens_used: Optional[int] = 0
+        self.matched_by = "llm"
+        self.timestamp: Optional[str] = None
+        self.stage_seconds: Dict[str, float] = {}
+
+
+class GapEngine:
+    def __init__(
+        self,
+        get_provider: Callable,
+        prompt: Callable,
+        llm: Callable,
+        parse: Callable,
+        enrich: Callable,
+        candidates: Optional[Callable] = None,
+        persist: Optional[Callable] = None,
+    ):
+        self.get_provider = get_provider
+        self.candidates = candidates
+        self.prompt = prompt
+        self.llm = llm
+        self.parse = parse
+        self.enrich = enrich
+        self.persist = persist
+
+    @contextmanager
+    def _stage(self, run: GapRun, name: str):
+        start = time.perf_counter()
+        try:
+            with metrics.span(name, "gap_analysis"):
+                yield
+        finally:
+            run.stage_seconds[name] = run.stage_seconds.get(name, 0.0) + time.perf_counter() - start
+
+    def run(
+        self,
+        process_description: str,
+        top_n: int = 5,
+        lob_filter: Optional[str] = None,
+        provider=None,
+        use_rules: bool = True,
+        engagement_id: Optional[str] = None,
+        req_id: Optional[str] = None,
+    ) -> GapRun:
+        """Analyse one description; persisted only when engagement_id is given.
+
+        `provider` defaults to get_provider(), resolved only if the LLM is needed.
+        """
+        run = GapRun(process_description, engagement_id, req_id)
+        picks = None
+        if use_rules and self.candidates is not None:
+            with self._stage(run, "candidates"):
+                picks = self.candidates(process_description, top_n, lob_filter)
+        if picks is not None:
+            run.matched_by = "keyword_rules"
+        else:
+            with self._stage(run, "prompt"):
+                prompt = self.prompt(process_description, top_n, lob_filter)
+            if provider is None:
+                provider = self.get_provider()
+            with self._stage(run, "llm"):
+                result = self.llm(provider, prompt)
+            run.tokens_used = result.get("tokens_used")
+            with self._stage(run, "parse"):
+                picks = self.parse(result)
+        with self._stage(run, "enrich"):
+            run.matches = self.enrich(picks, top_n)
+        run.timestamp = datetime.utcnow().isoformat()
+
+        if engagement_id is not None and self.persist is not None:
+            try:
+                with self._stage(run, "persist"):
+                    self.persist(run)
+            except Exception as e:
+                print(f"DB save failed for {req_id or 'ad-hoc analysis'} (non-fatal): {e}")
+        return run
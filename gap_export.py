@@ -0,0 +1,121 @@
+"""
+Streaming fit-gap matrix export (GET /engagement/{engagement_id}/export).
+
+One row per requirement × top match of its latest gap result, with the
+match's confidence, catalogue fields and migration objects. Requirements
+with no result (or no matches) get a single row with the match columns empty.
+
+Requirements are read in keyset pages (database.iter_requirements); each
+page's latest results are fetched in one query. Rows are encoded page by page
+into chunks, so memory is bounded by the page size, not the engagement:
+
+    csv     UTF-8 with a BOM so Excel opens it as Unicode
+    ndjson  one JSON object per line
+    xlsx    openpyxl write-only workbook. The zip is only complete once
+            saved, so it is built in a spooled temp file and then streamed
+
+Titles, descriptions and LLM rationales are free text. In csv and xlsx a
+cell starting with = + - @ tab or CR would be evaluated as a formula by
+Excel, so such cells get a leading ' and are shown as typed.
+
+openpyxl is an optional dependency; without it xlsx exports are rejected.
+"""
+import csv
+import io
+import json
+import tempfile
+from typing import Callable, Iterable, Iterator
+
+from scope_items import expand_match
+
+try:
+    import openpyxl
+except ImportError:  # optional dependency
+    openpyxl = None
+
+FORMATS = ("csv", "xlsx", "ndjson")
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+COLUMNS = (
+    "req_id", "title", "business_process", "priority", "category", "status",
+    "fit_assessment", "sign_off_status", "rank", "scope_item_id", "scope_item_name",
+    "lob", "confidence", "rationale", "migration_objects", "analysed_at",
+)
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+CHUNK_BYTES = 64 * 1024
+_SPOOL_BYTES = 8 * 1024 * 1024
+
+
+def matrix_rows(pages: Iterable[list], latest_for: Callable[[list], dict], top: int = 3) -> Iterator[list]:
+    """Yield each page's matrix rows as one list, in COLUMNS order."""
+    for page in pages:
+        latest = latest_for([r["req_id"] for r in page])
+        rows = []
+        for req in page:
+            base = [req.get(c) for c in COLUMNS[:8]]
+            result = latest.get(req["req_id"]) or {}
+            matches = (result.get("matches") or [])[:top]
+            if not matches:
+                rows.append(base + [None] * (len(COLUMNS) - 8))
+                continue
+            for rank, match in enumerate(matches, 1):
+                match = expand_match(match)
+                rows.append(base + [
+                    rank,
+                    match.get("id"),
+                    match.get("name"),
+                    match.get("lob"),
+                    match.get("confidence"),
+                    match.get("rationale"),
+                    "; ".join(match.get("migration_objects") or []),
+                    result.get("timestamp"),
+                ])
+        yield rows
+
+
+def _sheet_row(row: list) -> list:
+    """Neutralise cells a spreadsheet would otherwise run as formulas."""
+    return [f"'{v}" if isinstance(v, str) and v.startswith(_FORMULA_PREFIXES) else v for v in row]
+
+
+def csv_chunks(pages: Iterable[list]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    buf.write("\ufeff")
+    writer.writerow(COLUMNS)
+    for rows in pages:
+        writer.writerows(_sheet_row(row) for row in rows)
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+
+def ndjson_chunks(pages: Iterable[list]) -> Iterator[bytes]:
+    for rows in pages:
+        if rows:
+            yield "".join(json.dumps(dict(zip(COLUMNS, row))) + "\n" for row in rows).encode()
+
+
+def xlsx_chunks(pages: Iterable[list]) -> Iterator[bytes]:
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Fit-gap matrix")
+    sheet.append(COLUMNS)
+    for rows in pages:
+        for row in rows:
+            sheet.append(_sheet_row(row))
+    with tempfile.SpooledTemporaryFile(max_size=_SPOOL_BYTES) as out:
+        workbook.save(out)
+        out.seek(0)
+        while True:
+            chunk = out.read(CHUNK_BYTES)
+            if not chunk:
+                return
+            yield chunk
+
+
+ENCODERS = {"csv": csv_chunks, "ndjson": ndjson_chunks, "xlsx": xlsx_chunks}
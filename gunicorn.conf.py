@@ -0,0 +1,38 @@
+"""
+Multi-worker deployment: a gunicorn master with uvicorn workers.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+preload_app imports main once in the master. preload() then builds the
+catalogue search index, keyword automaton and prompt catalogue text, and the
+workers forked afterwards share those pages copy-on-write. gc.freeze() moves
+every object allocated so far out of the collector's generations, so a worker
+running a collection does not write to (and therefore copy) those pages.
+Per-process resources stay lazy and are built in each worker: the storage
+client, the write-behind thread and the hedge pool.
+
+The result cache, token ledger, engagement ETag versions and LLM rate limit
+live in shared_state's SQLite file so they hold across workers on this host,
+not across hosts (run several replicas with RAPID_ETAGS=0). The circuit
+breaker and /metrics counters stay per worker.
+"""
+import gc
+import os
+
+os.environ.setdefault("RAPID_SHARED_STATE_PATH", "rapid_shared.db")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("RAPID_WORKERS", "2"))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+# An LLM call may take up to RAPID_LLM_DEADLINE_S (90 s by default)
+timeout = int(os.getenv("RAPID_WORKER_TIMEOUT_S", "120"))
+# Leaves the lifespan shutdown time to flush the write-behind buffer
+graceful_timeout = 30
+
+
+def when_ready(server):
+    import main
+
+    main.preload()
+    gc.freeze()
@@ -0,0 +1,166 @@
+"""
+Deterministic keyword-rule fast path for gap analysis.
+
+An Aho-Corasick automaton over every scope item's `keywords` finds all
+keyword occurrences in a requirement in one pass over its text (linear in
+the text length plus the number of hits). Text and keywords are normalised
+the same way (lowercase, punctuation and whitespace runs → one space, padded
+with spaces) so "Three-way match" hits the keyword "three-way match" and
+keywords only hit on word boundaries ("ach" does not fire inside "each").
+
+Each matched keyword votes for the scope items that list it, weighted by how
+specific it is: a keyword of w words shared by n items is worth w / n, and
+half that for short acronyms ("AP", "MRP") that also occur as plain words.
+A scope item is decisive when it has at least MIN_DISTINCT_HITS distinct
+keyword hits and MIN_SCORE points, and the result is decisive when the best
+decisive item leads every non-decisive one by MIN_MARGIN. Decisive items
+come back as HIGH-confidence matches with a rationale naming the keywords;
+remaining slots are filled with items scoring SUPPORT_SCORE or more as
+MEDIUM. /gap-analysis then skips the LLM; anything else falls through to the
+provider.
+
+RAPID_KEYWORD_RULES=0 disables the fast path.
+"""
+import os
+import re
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+import metrics
+from scope_items import SCOPE_ITEMS
+
+ENABLED = os.getenv("RAPID_KEYWORD_RULES", "1") == "1"
+MIN_DISTINCT_HITS = int(os.getenv("RAPID_KEYWORD_MIN_HITS", "2"))
+MIN_SCORE = float(os.getenv("RAPID_KEYWORD_MIN_SCORE", "3.0"))
+MIN_MARGIN = float(os.getenv("RAPID_KEYWORD_MIN_MARGIN", "1.5"))
+SUPPORT_SCORE = 1.0
+
+metrics.describe("rapid_keyword_rules_total", "counter", "Gap analyses by keyword-rule outcome (decisive / ambiguous)")
+metrics.describe("rapid_keyword_rules_tokens_saved_total", "counter", "Estimated LLM tokens saved by decisive keyword rules")
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalise(text: str) -> str:
+    return f" {_NON_WORD.sub(' ', text.lower()).strip()} "
+
+
+class AhoCorasick:
+    """Multi-pattern matcher; find() reports every pattern occurrence in one pass."""
+
+    def __init__(self, patterns: List[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[str]] = [[]]
+        for pattern in patterns:
+            state = 0
+            for ch in pattern:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                state = nxt
+            self.out[state].append(pattern)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def find(self, text: str) -> List[str]:
+        hits = []
+        state = 0
+        for ch in text:
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            if self.out[state]:
+                hits.extend(self.out[state])
+        return hits
+
+
+class KeywordRules:
+    def __init__(self, items: List[dict]):
+        self.items = {item["id"]: item for item in items}
+        self.keyword_items: Dict[str, List[str]] = {}
+        self.display: Dict[str, str] = {}
+        for item in items:
+            for keyword in item.get("keywords", []):
+                pattern = normalise(keyword)
+                if pattern.strip():
+                    self.keyword_items.setdefault(pattern, [])
+                    if item["id"] not in self.keyword_items[pattern]:
+                        self.keyword_items[pattern].append(item["id"])
+                    self.display.setdefault(pattern, keyword)
+        self.automaton = AhoCorasick(list(self.keyword_items))
+
+    def score(self, text: str) -> Dict[str, dict]:
+        """scope item id → {"score", "keywords"} for every item with a keyword hit."""
+        scored: Dict[str, dict] = {}
+        for pattern in dict.fromkeys(self.automaton.find(normalise(text))):
+            owners = self.keyword_items[pattern]
+            words = pattern.split()
+            weight = len(words) / len(owners)
+            if len(words) == 1 and len(words[0]) <= 3:
+                weight /= 2
+            for item_id in owners:
+                entry = scored.setdefault(item_id, {"score": 0.0, "keywords": []})
+                entry["score"] += weight
+                entry["keywords"].append(self.display[pattern])
+        return scored
+
+    def match(self, text: str, top_n: int = 5, lob: Optional[str] = None) -> Optional[List[dict]]:
+        """Ranked {id, confidence, rationale} picks when the hits are decisive, else None."""
+        scored = self.score(text)
+        if lob:
+            scored = {i: e for i, e in scored.items() if self.items[i].get("lob", "").lower() == lob.lower()}
+        ranked = sorted(scored, key=lambda item_id: (-scored[item_id]["score"], item_id))
+        decisive = [
+            item_id for item_id in ranked
+            if len(scored[item_id]["keywords"]) >= MIN_DISTINCT_HITS and scored[item_id]["score"] >= MIN_SCORE
+        ]
+        if not decisive:
+            return None
+        runner_up = max((scored[i]["score"] for i in ranked if i not in decisive), default=0.0)
+        if scored[decisive[0]]["score"] < MIN_MARGIN * runner_up:
+            return None
+        supporting = [i for i in ranked if i not in decisive and scored[i]["score"] >= SUPPORT_SCORE]
+        return [
+            {
+                "id": item_id,
+                "confidence": "HIGH" if item_id in decisive else "MEDIUM",
+                "rationale": "Keyword rule: requirement mentions "
+                + ", ".join(f'"{k}"' for k in scored[item_id]["keywords"]),
+            }
+            for item_id in (decisive + supporting)[:top_n]
+        ]
+
+
+def record(decisive: bool, tokens_saved: int = 0):
+    metrics.inc("rapid_keyword_rules_total", outcome="decisive" if decisive else "ambiguous")
+    if tokens_saved:
+        metrics.inc("rapid_keyword_rules_tokens_saved_total", tokens_saved)
+
+
+_rules: Optional[KeywordRules] = None
+_rules_lock = threading.Lock()
+
+
+def get_rules() -> KeywordRules:
+    """Rules over SCOPE_ITEMS, built on first use."""
+    global _rules
+    if _rules is None:
+        with _rules_lock:
+            if _rules is None:
+                _rules = KeywordRules(SCOPE_ITEMS)
+    return _rules
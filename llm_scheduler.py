@@ -0,0 +1,204 @@
+"""
+Admission control in front of provider.complete().
+
+Interactive calls (/gap-analysis, archaeologist turns) and bulk calls
+(analyse-all, transcript extraction) share one Anthropic rate limit. Every
+call first takes a slot from the scheduler:
+
+    priority    strict: a waiting interactive call always goes before bulk
+    fairness    within a priority, engagements are served round-robin, so one
+                large analyse-all cannot starve another engagement's batch
+    concurrency at most RAPID_LLM_CONCURRENCY calls in flight per worker
+    rate        token buckets for requests/min (RAPID_LLM_RPM) and input
+                tokens/min (RAPID_LLM_TPM), held in shared_state so the limits
+                cover every worker; each bucket holds up to one minute's
+                allowance, refilled continuously as the API's limits are
+
+Only the head of the queue asks the buckets, so rate waits never reorder
+calls. Input tokens are estimated from prompt length (~4 chars per token)
+before the call. A call that cannot start within RAPID_LLM_QUEUE_TIMEOUT_S
+raises ProviderUnavailable. Queue wait is exported as
+rapid_llm_queue_wait_seconds{priority}.
+
+    provider = ScheduledProvider(get_provider, BULK, engagement_id)
+    provider.complete(system, user, tool=...)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+import metrics
+import shared_state
+from prompts import flatten
+from providers import ProviderUnavailable
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, BULK)
+
+MAX_CONCURRENCY = int(os.getenv("RAPID_LLM_CONCURRENCY", "8"))
+REQUESTS_PER_MINUTE = float(os.getenv("RAPID_LLM_RPM", "0"))
+TOKENS_PER_MINUTE = float(os.getenv("RAPID_LLM_TPM", "0"))
+QUEUE_TIMEOUT_S = float(os.getenv("RAPID_LLM_QUEUE_TIMEOUT_S", "90"))
+
+metrics.describe("rapid_llm_queue_wait_seconds", "summary", "Time LLM calls waited for a scheduler slot")
+metrics.describe("rapid_llm_queue_depth", "gauge", "LLM calls waiting for a scheduler slot")
+metrics.describe("rapid_llm_scheduler_in_flight", "gauge", "LLM calls holding a scheduler slot")
+metrics.describe("rapid_llm_queue_timeouts_total", "counter", "LLM calls that gave up waiting for a slot")
+
+
+class _Ticket:
+    __slots__ = ("priority", "engagement", "tokens", "request_taken")
+
+    def __init__(self, priority: str, engagement: str, tokens: int):
+        self.priority = priority
+        self.engagement = engagement
+        self.tokens = tokens
+        self.request_taken = False
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        max_concurrency: int = MAX_CONCURRENCY,
+        requests_per_minute: float = REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = TOKENS_PER_MINUTE,
+        queue_timeout_s: float = QUEUE_TIMEOUT_S,
+        state: Optional[shared_state.SharedState] = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.queue_timeout_s = queue_timeout_s
+        self.state = state
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        # priority → engagement → waiting tickets; engagement order is the round-robin
+        self._queues: Dict[str, "OrderedDict[str, deque]"] = {p: OrderedDict() for p in PRIORITIES}
+
+    def depth(self, priority: Optional[str] = None) -> int:
+        with self._cond:
+            return sum(
+                len(tickets)
+                for p, queue in self._queues.items() if priority in (None, p)
+                for tickets in queue.values()
+            )
+
+    def _head(self) -> Optional[_Ticket]:
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            if queue:
+                return next(iter(queue.values()))[0]
+        return None
+
+    def _remove(self, ticket: _Ticket, granted: bool):
+        queue = self._queues[ticket.priority]
+        tickets = queue[ticket.engagement]
+        tickets.remove(ticket)
+        if not tickets:
+            del queue[ticket.engagement]
+        elif granted:
+            queue.move_to_end(ticket.engagement)
+        metrics.gauge_add("rapid_llm_queue_depth", -1, priority=ticket.priority)
+
+    def _rate_wait(self, ticket: _Ticket) -> float:
+        """Seconds until the buckets admit the ticket; 0.0 once both are taken."""
+        state = self.state or shared_state.get_shared_state()
+        if self.requests_per_minute > 0 and not ticket.request_taken:
+            rpm = self.requests_per_minute
+            wait = state.acquire("llm:requests", rpm / 60, burst=rpm)
+            if wait:
+                return wait
+            ticket.request_taken = True
+        if self.tokens_per_minute > 0 and ticket.tokens:
+            tpm = self.tokens_per_minute
+            # A prompt bigger than a minute's allowance waits for a full bucket
+            return state.acquire("llm:tokens", tpm / 60, burst=tpm, cost=min(ticket.tokens, tpm))
+        return 0.0
+
+    @contextmanager
+    def slot(self, priority: str = INTERACTIVE, engagement_id: Optional[str] = None, tokens: int = 0):
+        """Hold a slot for one provider call; yields the seconds spent queueing."""
+        if priority not in self._queues:
+            raise ValueError(f"Unknown LLM priority {priority!r}")
+        ticket = _Ticket(priority, engagement_id or "", tokens)
+        start = time.monotonic()
+        deadline = start + self.queue_timeout_s
+        with self._cond:
+            self._queues[priority].setdefault(ticket.engagement, deque()).append(ticket)
+            metrics.gauge_add("rapid_llm_queue_depth", 1, priority=priority)
+            try:
+                while True:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        metrics.inc("rapid_llm_queue_timeouts_total", priority=priority)
+                        raise ProviderUnavailable(f"No LLM slot within {self.queue_timeout_s:g}s")
+                    if self.in_flight < self.max_concurrency and self._head() is ticket:
+                        wait = self._rate_wait(ticket)
+                        if not wait:
+                            break
+                        timeout = min(timeout, wait)
+                    self._cond.wait(timeout)
+            except BaseException:
+                self._remove(ticket, granted=False)
+                self._cond.notify_all()
+                raise
+            self._remove(ticket, granted=True)
+            self.in_flight += 1
+            metrics.gauge_set("rapid_llm_scheduler_in_flight", self.in_flight)
+            # The next head may be able to start too
+            self._cond.notify_all()
+        waited = time.monotonic() - start
+        metrics.observe("rapid_llm_queue_wait_seconds", waited, priority=priority)
+        try:
+            yield waited
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                metrics.gauge_set("rapid_llm_scheduler_in_flight", self.in_flight)
+                self._cond.notify_all()
+
+
+class ScheduledProvider:
+    """Provider stand-in whose complete() queues for a scheduler slot first.
+
+    `get_provider` is only called when the first call is made, so requests
+    answered without the LLM never build a client.
+    """
+
+    def __init__(
+        self,
+        get_provider: Callable,
+        priority: str = INTERACTIVE,
+        engagement_id: Optional[str] = None,
+        scheduler: Optional[LLMScheduler] = None,
+    ):
+        self.get_provider = get_provider
+        self.priority = priority
+        self.engagement_id = engagement_id
+        self.scheduler = scheduler
+        self._provider = None
+
+    def complete(self, system_prompt, user_prompt, **kwargs) -> dict:
+        if self._provider is None:
+            self._provider = self.get_provider()
+        tokens = (len(flatten(system_prompt)) + len(flatten(user_prompt))) // 4
+        with (self.scheduler or get_scheduler()).slot(self.priority, self.engagement_id, tokens):
+            return self._provider.complete(system_prompt, user_prompt, **kwargs)
+
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """Process-wide scheduler from the RAPID_LLM_* settings, built on first use."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = LLMScheduler()
+    return _scheduler
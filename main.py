@@ -1,31 +1,246 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
+from pydantic import BaseModel, ValidationError
 from typing import Optional, List, Dict, Any
+import atexit
+import copy
+import hashlib
 import json
 import os
 import re
+import tempfile
+import time
 from datetime import datetime, timezone
 
+import catalogue_search
+import dedup_index
+import etags
+import fast_json
+import gap_export
+import keyword_rules
+import metrics
+import prompts
+import requirement_import
+import shared_state
+import singleflight
+import template_results
+import transcript_sessions
+from gap_engine import GapEngine, GapRun
+from llm_scheduler import BULK, INTERACTIVE, ScheduledProvider
+from migration_plan import MigrationPlanner
+from compression import CompressionMiddleware
+
 # Import providers and database
-from providers import get_provider
+from providers import ProviderUnavailable, get_provider
 from database import (
     save_gap_analysis,
     get_results_by_engagement,
+    get_results_since,
     get_gap_results_by_req_id,
     create_requirement,
+    create_requirements,
     get_requirements_by_engagement,
+    iter_requirements,
+    get_latest_results,
     get_requirement_by_id,
     update_requirement,
+    update_requirements,
+    gap_result_record,
+    save_gap_analyses,
+    warm_up,
 )
-from scope_items import SCOPE_ITEMS, get_catalogue_text
+from scope_items import CATALOGUE_VERSION, SCOPE_ITEM_BY_ID, SCOPE_ITEMS, compact_matches, expand_match, expand_matches, get_catalogue_text
+from storage import format_req_id, req_number
+from write_behind import WriteBehindBuffer
+
+# Build the DB client at startup rather than on the first request; set
+# RAPID_WARM_UP=0 to defer it entirely (e.g. one-off CLI runs)
+WARM_UP_ON_STARTUP = os.getenv("RAPID_WARM_UP", "1") == "1"
+
+# Queue gap-result inserts and analysed-status updates and write them in
+# batches off the request path (see write_behind.py). Off by default because
+# results then appear in reads up to RAPID_WRITE_BEHIND_MAX_DELAY_S later.
+WRITE_BEHIND = os.getenv("RAPID_WRITE_BEHIND", "0") == "1"
+
+# Reuse a gap-analysis LLM answer for an identical prompt (same template
+# version, catalogue and description) for this many seconds; shared by all
+# workers through shared_state. 0 disables.
+RESULT_CACHE_TTL_S = float(os.getenv("RAPID_RESULT_CACHE_TTL_S", "0"))
+metrics.describe("rapid_result_cache_total", "counter", "Gap-analysis LLM result cache lookups by outcome")
+
+# Identical LLM calls already in flight in this process are made once and shared
+_gap_flights = singleflight.Group("gap_analysis")
+_extraction_flights = singleflight.Group("transcript_extraction")
+_write_behind: Optional[WriteBehindBuffer] = None
+
+# analyse-all copies the gap result of a near-duplicate requirement (see
+# dedup_index.py) instead of calling the LLM for it again
+REUSE_DUPLICATE_RESULTS = os.getenv("RAPID_REUSE_DUPLICATE_RESULTS", "1") == "1"
+
+
+def _get_write_behind() -> WriteBehindBuffer:
+    global _write_behind
+    if _write_behind is None:
+        _write_behind = WriteBehindBuffer(save_gap_analyses, update_requirements)
+        # Safety net for exits that skip the lifespan shutdown; close() is idempotent
+        atexit.register(_write_behind.close)
+    return _write_behind
+
+
+def _persist_gap_result(**fields):
+    """Save a gap result now, or queue it when write-behind is enabled."""
+    if WRITE_BEHIND:
+        _get_write_behind().add_gap_result(gap_result_record(**fields))
+    else:
+        save_gap_analysis(**fields)
+
+
+def _persist_requirement_update(req_id: str, engagement_id: str, updates: dict):
+    if WRITE_BEHIND:
+        _get_write_behind().add_requirement_update(req_id, engagement_id, updates)
+    else:
+        update_requirement(req_id, engagement_id, updates)
+
+
+def preload():
+    """Build the static catalogue structures. gunicorn.conf.py calls this in the
+    master before forking so workers share them copy-on-write."""
+    catalogue_search.get_index()
+    keyword_rules.get_rules()
+    _catalogue_context(None)
+    _prompt_tokens_estimate(None)
+    if fast_json.ENABLED:
+        # The key get_catalogue uses for an unfiltered listing
+        _catalogue_body("")
+    template_results.load(CATALOGUE_VERSION, _GAP_PROMPT.version)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARM_UP_ON_STARTUP:
+        try:
+            elapsed = await run_in_threadpool(warm_up)
+            print(f"Storage warm-up completed in {elapsed * 1000:.0f} ms")
+        except Exception as e:
+            # Non-fatal: the client is retried lazily on first use
+            print(f"Storage warm-up failed: {e}")
+        await run_in_threadpool(preload)
+    if WRITE_BEHIND:
+        try:
+            replayed = await run_in_threadpool(_get_write_behind().replay_spool)
+            if replayed:
+                print(f"Write-behind replayed {replayed} spooled write(s)")
+        except Exception as e:
+            print(f"Write-behind spool replay failed: {e}")
+    yield
+    if _write_behind is not None:
+        result = await run_in_threadpool(_write_behind.close)
+        print(f"Write-behind flushed on shutdown: {result}")
+
 
 app = FastAPI(
     title="RAPID Gap Analysis API",
     description="AI-powered SAP S/4HANA scope item gap analysis using semantic matching",
-    version="1.2.0"
+    version="1.2.0",
+    lifespan=lifespan,
 )
 
+def _match_route(request: Request) -> tuple:
+    """Resolve the matching route path (e.g. /requirements/{req_id}) and its path params."""
+    for route in app.router.routes:
+        match, child_scope = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, "path", request.url.path), child_scope.get("path_params", {})
+    return "unmatched", {}
+
+
+def _route_template(request: Request) -> str:
+    """Route path used for metric labels."""
+    return _match_route(request)[0]
+
+
+# ── Conditional GET / compression ─────────────────────────────────────────────
+# Middleware registered first runs innermost: conditional_get sees the route
+# before any DB work, compression wraps its output (suffixing the ETag),
+# and CORS and instrumentation wrap everything including 304s.
+
+ETAGS_ENABLED = os.getenv("RAPID_ETAGS", "1") == "1"
+
+metrics.describe("rapid_http_not_modified_total", "counter", "Conditional GETs answered with 304")
+
+
+def _catalogue_version(path_params: dict, query) -> Optional[str]:
+    return CATALOGUE_VERSION
+
+
+# shared_state ledger key bumped whenever a template's gap matches are cached
+_TEMPLATE_RESULTS_LEDGER = "template_results:computed"
+
+
+def _templates_version(path_params: dict, query) -> Optional[str]:
+    if "include_results" not in query:
+        return CATALOGUE_VERSION
+    # Gap matches change when the results file is rewritten or a template is
+    # computed live, in any worker
+    state = shared_state.get_shared_state()
+    computed = int(state.ledger_get(_TEMPLATE_RESULTS_LEDGER).get(_TEMPLATE_RESULTS_LEDGER, 0))
+    return f"{CATALOGUE_VERSION}.{_GAP_PROMPT.version}.{template_results.mtime()}.{state.instance_id}.{computed}"
+
+
+def _engagement_version(path_params: dict, query) -> Optional[str]:
+    engagement_id = path_params.get("engagement_id") or query.get("engagement_id")
+    return etags.data_version(engagement_id) if engagement_id else None
+
+
+# Route template → version token for its data; only these routes get ETags
+_ETAG_ROUTES = {
+    "/catalogue": _catalogue_version,
+    "/catalogue/search": _catalogue_version,
+    "/lobs": _catalogue_version,
+    "/requirements/templates": _templates_version,
+    "/results": _engagement_version,
+    "/requirements": _engagement_version,
+    "/requirements/{req_id}": _engagement_version,
+    "/requirements/{req_id}/traceability": _engagement_version,
+    "/engagement/{engagement_id}/summary": _engagement_version,
+    "/engagement/{engagement_id}/process-mirror": _engagement_version,
+    "/engagement/{engagement_id}/migration-plan": _engagement_version,
+    "/engagement/{engagement_id}/duplicates": _engagement_version,
+    "/engagement/{engagement_id}/export": _engagement_version,
+    "/engagement/{engagement_id}/sign-off-status": _engagement_version,
+    "/engagement/{engagement_id}/kpi-summary": _engagement_version,
+}
+
+
+@app.middleware("http")
+async def conditional_get(request: Request, call_next):
+    if not ETAGS_ENABLED or request.method != "GET":
+        return await call_next(request)
+    route, path_params = _match_route(request)
+    version_for = _ETAG_ROUTES.get(route)
+    version = version_for(path_params, request.query_params) if version_for else None
+    if version is None:
+        return await call_next(request)
+
+    etag = etags.make_etag(request.url.path, sorted(request.query_params.multi_items()), version)
+    if etags.if_none_match(request.headers.get("if-none-match"), etag):
+        metrics.inc("rapid_http_not_modified_total", route=route)
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    response = await call_next(request)
+    if response.status_code == 200:
+        response.headers["ETag"] = etag
+        # Cacheable, but the browser must revalidate (cheap 304) before reuse
+        response.headers.setdefault("Cache-Control", "no-cache")
+    return response
+
+
+app.add_middleware(CompressionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -35,6 +250,28 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    route = _route_template(request)
+    labels = {"route": route, "method": request.method}
+    timings = metrics.begin_request()
+    metrics.gauge_add("rapid_http_requests_in_flight", 1, **labels)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.gauge_add("rapid_http_requests_in_flight", -1, **labels)
+        metrics.observe("rapid_http_request_duration_seconds", elapsed, **labels)
+        metrics.inc("rapid_http_requests_total", status=str(status), **labels)
+        if status >= 500:
+            metrics.inc("rapid_http_request_errors_total", **labels)
+    response.headers["Server-Timing"] = metrics.server_timing_header(timings, elapsed)
+    return response
+
+
 # ── Pydantic models ───────────────────────────────────────────────────────────
 
 class GapAnalysisRequest(BaseModel):
@@ -62,6 +299,7 @@ class GapAnalysisResponse(BaseModel):
     total_scope_items_searched: int
     tokens_used: Optional[int] = None
     timestamp: str
+    matched_by: Optional[str] = "llm"   # "llm" or "keyword_rules"
 
 class RequirementCreate(BaseModel):
     engagement_id: str
@@ -112,6 +350,14 @@ class TranscriptExtractRequest(BaseModel):
     stakeholder: str
     transcript_text: str
 
+class TranscriptSessionCreate(BaseModel):
+    engagement_id: str
+    stakeholder: str
+
+class TranscriptSegmentRequest(BaseModel):
+    text: str
+    flush: bool = False  # extract now even if less than the minimum new text has arrived
+
 class ArchaeologistSessionRequest(BaseModel):
     engagement_id: str
     stakeholder: str
@@ -186,34 +432,70 @@ Response format (JSON array):
   }
 ]"""
 
+# Tool-use schemas: the provider forces the model to answer through these, so
+# replies arrive as validated JSON instead of text that has to be scraped.
+_GAP_MATCHES_TOOL = {
+    "name": "record_scope_item_matches",
+    "description": "Record the scope items that best match the business process, ranked by relevance.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "matches": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "string", "description": "Scope item code from the catalogue"},
+                        "confidence": {"type": "string", "enum": ["HIGH", "MEDIUM", "LOW"]},
+                        "rationale": {"type": "string"},
+                    },
+                    "required": ["id", "confidence", "rationale"],
+                },
+            },
+        },
+        "required": ["matches"],
+    },
+}
 
-def _run_gap_analysis(
-    provider,
-    process_description: str,
-    top_n: int = 5,
-    lob_filter: Optional[str] = None,
-) -> tuple:
-    """Returns (matches: List[ScopeItemMatch], tokens_used: int)."""
-    catalogue = build_catalogue_for_prompt(lob_filter)
-    user_prompt = (
+_GAP_PROMPT = prompts.register("gap_analysis", _GAP_SYSTEM_PROMPT, _GAP_MATCHES_TOOL)
+
+
+@lru_cache(maxsize=32)
+def _catalogue_context(lob_filter: Optional[str]) -> str:
+    """Static catalogue segment of the gap prompt; identical across calls so it caches."""
+    return f"SAP S/4HANA Cloud 2602 Scope Item Catalogue (2602 release):\n{build_catalogue_for_prompt(lob_filter)}"
+
+
+def _gap_prompt(process_description: str, top_n: int = 5, lob_filter: Optional[str] = None) -> prompts.Prompt:
+    return _GAP_PROMPT.build(
         f"Business Process Description:\n{process_description}\n\n"
-        f"SAP S/4HANA Cloud 2602 Scope Item Catalogue (2602 release):\n{catalogue}\n\n"
-        f"Return the top {top_n} most relevant scope items as JSON."
+        f"Return the top {top_n} most relevant scope items as JSON.",
+        static=_catalogue_context(lob_filter),
     )
-    result = provider.complete(_GAP_SYSTEM_PROMPT, user_prompt)
-    raw_text = result.get("content", "[]")
-    tokens_used = result.get("tokens_used")
 
+
+def _tool_items(result: dict, key: str) -> list:
+    """Items from a tool-use response; falls back to the JSON array in plain
+    text for providers that answer without tool use."""
+    data = result.get("data")
+    if isinstance(data, dict):
+        items = data.get(key) or []
+        if not isinstance(items, list):
+            raise ValueError(f"Tool output field '{key}' is not a list")
+        return items
+    raw_text = result.get("content", "[]")
     json_match = re.search(r'\[.*\]', raw_text, re.DOTALL)
     if not json_match:
         raise ValueError("No JSON array found in response")
+    return json.loads(json_match.group())
 
-    matches_raw = json.loads(json_match.group())
-    scope_lookup = {item['id']: item for item in SCOPE_ITEMS}
+
+def _build_matches(matches_raw: list, top_n: int) -> List[ScopeItemMatch]:
+    """ScopeItemMatch models for the LLM's picks, skipping ids not in the catalogue."""
     matches = []
     for m in matches_raw[:top_n]:
         item_id = m.get('id', '')
-        scope = scope_lookup.get(item_id, {})
+        scope = SCOPE_ITEM_BY_ID.get(item_id)
         if scope:
             matches.append(ScopeItemMatch(
                 id=item_id,
@@ -225,7 +507,92 @@ def _run_gap_analysis(
                 rationale=m.get('rationale', ''),
                 migration_objects=scope.get('migration_objects', []),
             ))
-    return matches, tokens_used
+    return matches
+
+
+@lru_cache(maxsize=32)
+def _prompt_tokens_estimate(lob_filter: Optional[str]) -> int:
+    """Rough input tokens of a gap-analysis prompt (~4 chars per token)."""
+    return len(_GAP_SYSTEM_PROMPT + _catalogue_context(lob_filter)) // 4
+
+
+def _keyword_rule_picks(
+    process_description: str,
+    top_n: int = 5,
+    lob_filter: Optional[str] = None,
+) -> Optional[List[dict]]:
+    """Picks from the keyword rules when they are decisive; None means ask the LLM."""
+    if not keyword_rules.ENABLED:
+        return None
+    picks = keyword_rules.get_rules().match(process_description, top_n=top_n, lob=lob_filter)
+    if picks is None:
+        keyword_rules.record(False)
+        return None
+    keyword_rules.record(True, tokens_saved=_prompt_tokens_estimate(lob_filter))
+    return picks
+
+
+def _prompt_key(prompt: prompts.Prompt) -> str:
+    digest = hashlib.sha256(prompt.text.encode()).hexdigest()
+    return f"{prompt.template.name}:{prompt.template.version}:{digest}"
+
+
+def _complete_gap_prompt(provider, prompt: prompts.Prompt) -> dict:
+    key = f"{_prompt_key(prompt)}:{CATALOGUE_VERSION}"
+    if RESULT_CACHE_TTL_S > 0:
+        cached = shared_state.get_shared_state().cache_get(key)
+        metrics.inc("rapid_result_cache_total", outcome="miss" if cached is None else "hit")
+        if cached is not None:
+            return {"data": cached, "content": json.dumps(cached), "tokens_used": 0}
+
+    def call() -> dict:
+        result = provider.complete(prompt.system, prompt.user, tool=_GAP_MATCHES_TOOL)
+        prompts.record(prompt, result)
+        if RESULT_CACHE_TTL_S > 0 and isinstance(result.get("data"), dict):
+            shared_state.get_shared_state().cache_set(key, result["data"], RESULT_CACHE_TTL_S)
+        return result
+
+    result, shared = _gap_flights.do(key, call)
+    # A coalesced caller spent nothing; the leader's run accounts for the tokens
+    return {**result, "tokens_used": 0} if shared else result
+
+
+def _persist_gap_run(run: GapRun):
+    _persist_gap_result(
+        engagement_id=run.engagement_id,
+        process_description=run.process_description,
+        matches=compact_matches(run.matches),
+        tokens_used=run.tokens_used,
+        timestamp=run.timestamp,
+        req_id=run.req_id,
+    )
+
+
+# get_provider is resolved per call so patching main.get_provider takes effect
+gap_engine = GapEngine(
+    get_provider=lambda: get_provider(),
+    candidates=_keyword_rule_picks,
+    prompt=_gap_prompt,
+    llm=_complete_gap_prompt,
+    parse=lambda result: _tool_items(result, "matches"),
+    enrich=_build_matches,
+    persist=_persist_gap_run,
+)
+
+
+def _run_gap_analysis(
+    provider,
+    process_description: str,
+    top_n: int = 5,
+    lob_filter: Optional[str] = None,
+    use_rules: bool = True,
+) -> tuple:
+    """Returns (matches: List[ScopeItemMatch], tokens_used: int); tokens_used is 0 for rule hits.
+
+    Unpersisted shortcut over gap_engine for the evaluation harness.
+    """
+    run = gap_engine.run(process_description, top_n, lob_filter, provider=provider, use_rules=use_rules)
+    return run.matches, run.tokens_used
 
 
 # ── Health / Catalogue / LOBs ─────────────────────────────────────────────────
@@ -239,13 +606,47 @@ def health():
         "release": "S/4HANA Cloud Public Edition 2602"
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus text exposition of route and dependency latency, in-flight and error counts."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+def _catalogue_items(lob: Optional[str]) -> list:
+    if not lob:
+        return SCOPE_ITEMS
+    return [i for i in SCOPE_ITEMS if i.get('lob', '').lower() == lob.lower()]
+
+
+@lru_cache(maxsize=64)
+def _catalogue_body(lob: str) -> bytes:
+    """Encoded /catalogue body; the catalogue is static so each filter is encoded once."""
+    items = _catalogue_items(lob)
+    return fast_json.dumps({"total": len(items), "items": items})
+
+
+@app.get("/prompts")
+def get_prompts():
+    """Prompt template versions and per-template prefix-cache hit ratios."""
+    return {"templates": prompts.cache_stats()}
+
 @app.get("/catalogue")
 def get_catalogue(lob: Optional[str] = None):
-    items = SCOPE_ITEMS
-    if lob:
-        items = [i for i in items if i.get('lob', '').lower() == lob.lower()]
+    if fast_json.ENABLED:
+        return Response(_catalogue_body((lob or "").lower()), media_type="application/json")
+    items = _catalogue_items(lob)
     return {"total": len(items), "items": items}
 
+@app.get("/catalogue/search")
+def search_catalogue(
+    q: str = "",
+    lob: Optional[str] = None,
+    process_group: Optional[str] = None,
+    limit: int = catalogue_search.DEFAULT_LIMIT,
+):
+    """Ranked, prefix- and typo-tolerant search over the scope item catalogue."""
+    limit = max(1, min(limit, catalogue_search.MAX_LIMIT))
+    return catalogue_search.get_index().search(q, lob=lob, process_group=process_group, limit=limit)
+
 @app.get("/lobs")
 def get_lobs():
     from collections import Counter
@@ -253,12 +654,18 @@ def get_lobs():
     return {"lobs": [{"name": k, "count": v} for k, v in sorted(counts.items())]}
 
 @app.get("/results")
-def get_results(engagement_id: str):
+def get_results(engagement_id: str, compact: bool = False):
+    """Past results; matches are joined with catalogue fields unless compact=true."""
     try:
         results = get_results_by_engagement(engagement_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    return {"engagement_id": engagement_id, "total": len(results), "results": results}
+    if not compact:
+        results = [{**r, "matches": expand_matches(r.get("matches"))} for r in results]
+    body = {"engagement_id": engagement_id, "total": len(results), "results": results}
+    if fast_json.ENABLED:
+        return fast_json.FastJSONResponse(body)
+    return body
 
 
 # ── Requirements ──────────────────────────────────────────────────────────────
@@ -285,14 +692,53 @@ def post_requirement(body: RequirementCreate):
 @app.get("/requirements", response_model=List[RequirementResponse])
 def list_requirements(engagement_id: str):
     try:
-        return get_requirements_by_engagement(engagement_id)
+        rows = get_requirements_by_engagement(engagement_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if fast_json.ENABLED:
+        # Rows were validated on write; skip response_model re-validation
+        return fast_json.FastJSONResponse(fast_json.project(rows, RequirementResponse))
+    return rows
+
+_VALID_TAGS = ["pain_point", "manual_step", "secret_sauce", "workaround", "hand_off"]
+
+_EXTRACTION_TOOL = {
+    "name": "record_requirements",
+    "description": "Record the discrete business requirements found in the transcript.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "requirements": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "title": {"type": "string"},
+                        "description": {"type": "string"},
+                        "tags": {"type": "array", "items": {"type": "string", "enum": _VALID_TAGS}},
+                        "business_process": {"type": "string"},
+                        "priority": {"type": "string", "enum": ["Must-Have", "Should-Have", "Nice-to-Have"]},
+                        "category": {"type": "string"},
+                        "shadow_tools": {"type": "array", "items": {"type": "string"}},
+                        "actors": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {"role": {"type": "string"}, "type": {"type": "string"}},
+                            },
+                        },
+                        "kpi_impact": {"type": ["object", "null"]},
+                    },
+                    "required": ["title", "description", "tags"],
+                },
+            },
+        },
+        "required": ["requirements"],
+    },
+}
 
-@app.post("/requirements/extract-from-transcript", status_code=201)
-def extract_from_transcript(body: TranscriptExtractRequest):
-    provider = get_provider()
-    system_prompt = """You are an expert business analyst capturing requirements from conversation transcripts for SAP S/4HANA implementation projects.
+
+_EXTRACTION_SYSTEM_PROMPT = """You are an expert business analyst capturing requirements from conversation transcripts for SAP S/4HANA implementation projects.
 
 Extract discrete business requirements from the transcript. For each requirement identify:
 - title: Brief descriptive title (max 10 words)
@@ -325,56 +771,291 @@ Rules:
 - tags must only come from: pain_point, manual_step, secret_sauce, workaround, hand_off
 - Return [] if no clear requirements are found"""
 
-    user_prompt = f"Stakeholder: {body.stakeholder}\n\nExtract requirements from this transcript:\n\n{body.transcript_text}\n\nReturn JSON array."
+_EXTRACTION_PROMPT = prompts.register("transcript_extraction", _EXTRACTION_SYSTEM_PROMPT, _EXTRACTION_TOOL)
 
+
+def _create_extracted_requirement(engagement_id: str, stakeholder: str, raw_input: str, item: dict) -> Optional[dict]:
+    """Create a requirement from one extracted item; None (logged) if the insert fails."""
+    tags = [t for t in (item.get("tags") or []) if t in _VALID_TAGS]
     try:
-        result = provider.complete(system_prompt, user_prompt, max_tokens=2048)
-        raw_text = result.get("content", "[]")
+        return create_requirement(
+            engagement_id=engagement_id,
+            title=item.get("title", "Untitled"),
+            description=item.get("description", ""),
+            source_type="Conversation",
+            tags=tags,
+            stakeholder=stakeholder,
+            raw_input=raw_input,
+            business_process=item.get("business_process") or None,
+            priority=item.get("priority") or "Must-Have",
+            category=item.get("category") or None,
+            shadow_tools=item.get("shadow_tools") or None,
+            actors=item.get("actors") or None,
+            kpi_impact=item.get("kpi_impact") or None,
+        )
+    except Exception as e:
+        print(f"Failed to create requirement '{item.get('title')}': {e}")
+        return None
+
+
+def _extracted_summary(req: dict) -> dict:
+    return {
+        "req_id": req["req_id"],
+        "title": req["title"],
+        "tags": req.get("tags", []),
+        "business_process": req.get("business_process"),
+        "priority": req.get("priority"),
+        "category": req.get("category"),
+        "shadow_tools": req.get("shadow_tools"),
+        "actors": req.get("actors"),
+        "kpi_impact": req.get("kpi_impact"),
+    }
+
+
+@app.post("/requirements/extract-from-transcript", status_code=201)
+def extract_from_transcript(body: TranscriptExtractRequest):
+    provider = ScheduledProvider(get_provider, BULK, body.engagement_id)
+
+    prompt = _EXTRACTION_PROMPT.build(
+        f"Stakeholder: {body.stakeholder}\n\nExtract requirements from this transcript:\n\n{body.transcript_text}\n\nReturn JSON array."
+    )
+
+    def extract_and_create() -> list:
+        with metrics.span("llm", "extract_from_transcript"):
+            result = provider.complete(prompt.system, prompt.user, max_tokens=2048, tool=_EXTRACTION_TOOL)
+            prompts.record(prompt, result)
 
-        json_match = re.search(r'\[.*\]', raw_text, re.DOTALL)
-        if not json_match:
-            raise ValueError("No JSON array found in response")
+        with metrics.span("parse", "extract_from_transcript"):
+            extracted = _tool_items(result, "requirements")
 
-        extracted = json.loads(json_match.group())
+        created = []
+        for item in extracted:
+            req = _create_extracted_requirement(body.engagement_id, body.stakeholder, body.transcript_text, item)
+            if req:
+                created.append(_extracted_summary(req))
+        return created
+
+    # A retried or double-submitted upload waits for the first one and gets the
+    # requirements it created, rather than extracting and creating them again
+    try:
+        created, _ = _extraction_flights.do(f"{body.engagement_id}:{_prompt_key(prompt)}", extract_and_create)
+    except ProviderUnavailable as e:
+        raise HTTPException(status_code=503, detail=f"Extraction failed: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Extraction failed: {e}")
 
-    valid_tags = {"pain_point", "manual_step", "secret_sauce", "workaround", "hand_off"}
-    created = []
-    for item in extracted:
-        tags = [t for t in (item.get("tags") or []) if t in valid_tags]
+    return {"created": len(created), "requirements": created}
+
+
+# ── Bulk Import ───────────────────────────────────────────────────────────────
+
+IMPORT_BATCH_SIZE = int(os.getenv("RAPID_IMPORT_BATCH_SIZE", "500"))
+IMPORT_MAX_REPORTED_ERRORS = 1000
+# Uploads bigger than this are spooled to a temp file rather than held in memory
+_IMPORT_SPOOL_BYTES = 1024 * 1024
+_IMPORT_FIELDS = [f for f in RequirementCreate.model_fields if f != "engagement_id"]
+
+
+def _import_requirement_rows(engagement_id: str, upload, fmt: str) -> dict:
+    """Validate and insert the rows of an uploaded sheet; bad rows are reported, not fatal."""
+    try:
+        reader = requirement_import.RowReader(upload, fmt, _IMPORT_FIELDS)
+    except requirement_import.ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    report = {
+        "engagement_id": engagement_id,
+        "format": fmt,
+        "rows": 0,
+        "created": 0,
+        "failed": 0,
+        "first_req_id": None,
+        "last_req_id": None,
+        "ignored_columns": reader.ignored_columns,
+        "errors": [],
+    }
+    batch = []  # (row_number, create_requirement kwargs)
+    # The first batch has the backend allocate REQ ids; later ones continue
+    # from its last id, so the engagement's max id is read once per import
+    next_number = None
+
+    def fail(row_number, error: str):
+        report["failed"] += 1
+        if len(report["errors"]) < IMPORT_MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": row_number, "error": error})
+
+    def flush():
+        nonlocal next_number
+        items = [kwargs for _, kwargs in batch]
+        if next_number is not None:
+            items = [{**kwargs, "req_id": format_req_id(next_number + i)} for i, kwargs in enumerate(items)]
         try:
-            req = create_requirement(
-                engagement_id=body.engagement_id,
-                title=item.get("title", "Untitled"),
-                description=item.get("description", ""),
-                source_type="Conversation",
-                tags=tags,
-                stakeholder=body.stakeholder,
-                raw_input=body.transcript_text,
-                business_process=item.get("business_process") or None,
-                priority=item.get("priority") or "Must-Have",
-                category=item.get("category") or None,
-                shadow_tools=item.get("shadow_tools") or None,
-                actors=item.get("actors") or None,
-                kpi_impact=item.get("kpi_impact") or None,
-            )
-            if req:
-                created.append({
-                    "req_id": req["req_id"],
-                    "title": req["title"],
-                    "tags": req.get("tags", []),
-                    "business_process": req.get("business_process"),
-                    "priority": req.get("priority"),
-                    "category": req.get("category"),
-                    "shadow_tools": req.get("shadow_tools"),
-                    "actors": req.get("actors"),
-                    "kpi_impact": req.get("kpi_impact"),
-                })
+            created = create_requirements(engagement_id, items)
         except Exception as e:
-            print(f"Failed to create requirement '{item.get('title')}': {e}")
+            print(f"Import batch of {len(batch)} rows failed for {engagement_id}: {e}")
+            for row_number, _ in batch:
+                fail(row_number, f"Insert failed: {e}")
+        else:
+            report["created"] += len(created)
+            if created:
+                report["first_req_id"] = report["first_req_id"] or created[0].get("req_id")
+                report["last_req_id"] = created[-1].get("req_id")
+                last_number = req_number(report["last_req_id"])
+                if last_number is not None:
+                    next_number = last_number + 1
+        batch.clear()
 
-    return {"created": len(created), "requirements": created}
+    try:
+        for row_number, fields in reader:
+            report["rows"] += 1
+            try:
+                body = RequirementCreate(engagement_id=engagement_id, **fields)
+            except ValidationError as e:
+                fail(row_number, "; ".join(
+                    f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
+                ))
+                continue
+            kwargs = body.model_dump()
+            kwargs.pop("engagement_id")
+            batch.append((row_number, kwargs))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                flush()
+    except requirement_import.ImportFormatError as e:
+        # Rows before the unreadable one are still imported
+        report["error"] = str(e)
+    finally:
+        reader.close()
+    if batch:
+        flush()
+    report["errors_truncated"] = report["failed"] > len(report["errors"])
+    return report
+
+
+@app.post("/engagement/{engagement_id}/requirements/import")
+async def import_requirements(engagement_id: str, request: Request, format: Optional[str] = None):
+    """Create requirements from a CSV or XLSX sheet sent as the raw request body."""
+    upload = tempfile.SpooledTemporaryFile(max_size=_IMPORT_SPOOL_BYTES)
+    try:
+        async for chunk in request.stream():
+            upload.write(chunk)
+        upload.seek(0)
+        try:
+            fmt = requirement_import.detect_format(format, request.headers.get("content-type"), upload)
+        except requirement_import.ImportFormatError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return await run_in_threadpool(_import_requirement_rows, engagement_id, upload, fmt)
+    finally:
+        upload.close()
+
+
+# ── Live Transcript Sessions ──────────────────────────────────────────────────
+
+# Items may name a requirement already captured in the session to refine it
+_SEGMENT_TOOL = copy.deepcopy(_EXTRACTION_TOOL)
+_SEGMENT_TOOL["input_schema"]["properties"]["requirements"]["items"]["properties"]["req_id"] = {
+    "type": "string",
+    "description": "req_id of an already captured requirement this item refines; omit for a new requirement",
+}
+
+_SEGMENT_PROMPT = prompts.register(
+    "transcript_segment",
+    _EXTRACTION_SYSTEM_PROMPT + """
+
+This is a live workshop transcript processed in segments.
+- The text may start with a short overlap that was already processed.
+- Requirements already captured in this session are listed with their req_id.
+- If the text adds to or corrects a captured requirement, return it with that req_id and a description that merges old and new detail.
+- Do not return a captured requirement the text says nothing new about.""",
+    _SEGMENT_TOOL,
+)
+
+
+def _session_state(session: transcript_sessions.TranscriptSession) -> dict:
+    return {
+        "session_id": session.session_id,
+        "engagement_id": session.engagement_id,
+        "stakeholder": session.stakeholder,
+        "segments": session.segments,
+        "cursor": session.cursor,
+        "pending_chars": session.pending_chars,
+        "requirements": session.requirements,
+    }
+
+
+@app.post("/requirements/transcript-sessions", status_code=201)
+def create_transcript_session(body: TranscriptSessionCreate):
+    try:
+        session = transcript_sessions.create(body.engagement_id, body.stakeholder)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return _session_state(session)
+
+
+@app.get("/requirements/transcript-sessions/{session_id}")
+def get_transcript_session(session_id: str):
+    session = transcript_sessions.load(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail=f"Transcript session {session_id} not found")
+    return _session_state(session)
+
+
+@app.delete("/requirements/transcript-sessions/{session_id}", status_code=204)
+def close_transcript_session(session_id: str):
+    transcript_sessions.close(session_id)
+
+
+@app.post("/requirements/transcript-sessions/{session_id}/segments")
+def post_transcript_segment(session_id: str, body: TranscriptSegmentRequest):
+    with transcript_sessions.lock_for(session_id):
+        session = transcript_sessions.load(session_id)
+        if not session:
+            raise HTTPException(status_code=404, detail=f"Transcript session {session_id} not found")
+        session.append(body.text)
+        pending = session.pending_chars
+        if pending == 0 or (pending < transcript_sessions.MIN_NEW_CHARS and not body.flush):
+            transcript_sessions.save(session)
+            return {**_session_state(session), "extracted": False, "created": [], "updated": []}
+
+        provider = ScheduledProvider(get_provider, INTERACTIVE, session.engagement_id)
+        prompt = _SEGMENT_PROMPT.build(
+            f"Stakeholder: {session.stakeholder}\n\nNew transcript text:\n\n{session.window()}\n\nReturn JSON array.",
+            stable=f"Requirements already captured in this session:\n{session.captured_text()}" if session.requirements else None,
+        )
+        try:
+            with metrics.span("llm", "transcript_segment"):
+                result = provider.complete(prompt.system, prompt.user, max_tokens=2048, tool=_SEGMENT_TOOL)
+            prompts.record(prompt, result)
+            with metrics.span("parse", "transcript_segment"):
+                extracted = _tool_items(result, "requirements")
+        except Exception as e:
+            # Keep the segment: the next one retries everything after the cursor
+            transcript_sessions.save(session)
+            status = 503 if isinstance(e, ProviderUnavailable) else 500
+            raise HTTPException(status_code=status, detail=f"Extraction failed: {e}")
+
+        created, updated = [], []
+        for item in extracted:
+            captured = session.find(item)
+            if captured is None:
+                req = _create_extracted_requirement(session.engagement_id, session.stakeholder, session.window(), item)
+                if req:
+                    session.remember(req)
+                    created.append(_extracted_summary(req))
+                continue
+            try:
+                current = get_requirement_by_id(captured["req_id"], session.engagement_id) or captured
+                item = {**item, "tags": [t for t in (item.get("tags") or []) if t in _VALID_TAGS]}
+                updates = transcript_sessions.merge_updates(current, item)
+                if updates:
+                    req = update_requirement(captured["req_id"], session.engagement_id, updates) or {**current, **updates}
+                    session.remember(req)
+                    updated.append({"req_id": captured["req_id"], "fields": sorted(updates)})
+            except Exception as e:
+                print(f"Failed to update requirement {captured['req_id']}: {e}")
+
+        session.cursor = len(session.transcript)
+        transcript_sessions.save(session)
+    return {**_session_state(session), "extracted": True, "created": created, "updated": updated}
 
 
 # ── Domain Templates ───────────────────────────────────────────────────────────
@@ -516,18 +1197,168 @@ _DOMAIN_TEMPLATES: Dict[str, List[Dict]] = {
 _VALID_DOMAINS = list(_DOMAIN_TEMPLATES.keys())
 
 
-@app.get("/requirements/templates")
-def get_requirement_templates(domain: str):
+# Template descriptions are the same in every engagement, so their gap matches
+# come from template_results.json (cli.py precompute-templates) when it is
+# current, else are computed once and shared through shared_state
+TEMPLATE_RESULT_TTL_S = float(os.getenv("RAPID_TEMPLATE_RESULT_TTL_S", str(30 * 86400)))
+metrics.describe("rapid_template_results_total", "counter", "Template gap matches served, by source")
+
+
+def _domain_key(domain: str) -> str:
     key = domain.lower()
     if key not in _DOMAIN_TEMPLATES:
         raise HTTPException(
             status_code=400,
             detail=f"Unknown domain '{domain}'. Valid options: {', '.join(_VALID_DOMAINS)}",
         )
+    return key
+
+
+def _template_result_key(description: str) -> str:
+    return f"template_gap:{CATALOGUE_VERSION}:{_GAP_PROMPT.version}:{template_results.description_key(description)}"
+
+
+def _known_template_matches(description: str) -> Optional[list]:
+    """Precomputed or cached compact matches for a template description, without calling the LLM."""
+    precomputed = template_results.load(CATALOGUE_VERSION, _GAP_PROMPT.version)
+    matches = precomputed.get(template_results.description_key(description))
+    if matches is not None:
+        metrics.inc("rapid_template_results_total", source="precomputed")
+        return matches
+    matches = shared_state.get_shared_state().cache_get(_template_result_key(description))
+    if matches is not None:
+        metrics.inc("rapid_template_results_total", source="cache")
+    return matches
+
+
+def _template_matches(description: str, provider) -> tuple:
+    """(compact matches, tokens_used) for a template description; tokens_used is 0 unless computed now."""
+    known = _known_template_matches(description)
+    if known is not None:
+        return known, 0
+    run = gap_engine.run(description, provider=provider)
+    compact = compact_matches(run.matches)
+    state = shared_state.get_shared_state()
+    state.cache_set(_template_result_key(description), compact, TEMPLATE_RESULT_TTL_S)
+    state.ledger_add(_TEMPLATE_RESULTS_LEDGER, 1)
+    metrics.inc("rapid_template_results_total", source="computed")
+    return compact, run.tokens_used
+
+
+def precompute_template_results(provider=None, force: bool = False, path: Optional[str] = None) -> dict:
+    """Compute gap matches for every distinct template description and write the results file.
+
+    Entries of a current file are kept unless `force`; a description that
+    fails is left out and reported, and is served live until the next run.
+    """
+    existing = {} if force else template_results.current(CATALOGUE_VERSION, _GAP_PROMPT.version, path)
+    provider = provider or ScheduledProvider(get_provider, BULK, "templates")
+    results: Dict[str, list] = {}
+    stats = {"templates": 0, "computed": 0, "reused": 0, "tokens_used": 0, "failed": []}
+    descriptions = dict.fromkeys(t["description"] for pack in _DOMAIN_TEMPLATES.values() for t in pack)
+    for description in descriptions:
+        key = template_results.description_key(description)
+        stats["templates"] += 1
+        if key in existing:
+            results[key] = existing[key]
+            stats["reused"] += 1
+            continue
+        try:
+            run = gap_engine.run(description, provider=provider)
+        except Exception as e:
+            print(f"Template precompute failed for '{description[:60]}': {e}")
+            stats["failed"].append(description)
+            continue
+        results[key] = compact_matches(run.matches)
+        stats["computed"] += 1
+        stats["tokens_used"] += run.tokens_used
+    template_results.write(results, CATALOGUE_VERSION, _GAP_PROMPT.version, path)
+    return stats
+
+
+@app.get("/requirements/templates")
+def get_requirement_templates(domain: str, include_results: bool = False):
+    """A domain's templates; include_results adds their precomputed or cached gap matches (null if none yet)."""
+    key = _domain_key(domain)
     templates = _DOMAIN_TEMPLATES[key]
+    if include_results:
+        templates = [
+            {**t, "gap_matches": expand_matches(known) if known is not None else None}
+            for t, known in ((t, _known_template_matches(t["description"])) for t in templates)
+        ]
     return {"domain": key, "total": len(templates), "templates": templates}
 
 
+@app.post("/engagement/{engagement_id}/requirements/from-templates", status_code=201)
+def instantiate_templates(
+    engagement_id: str,
+    domain: str,
+    indices: Optional[List[int]] = Query(None),
+    attach_results: bool = False,
+):
+    """Create a domain's templates (all, or those at `indices`) as requirements in one insert."""
+    key = _domain_key(domain)
+    templates = _DOMAIN_TEMPLATES[key]
+    if indices:
+        bad = [i for i in indices if not 0 <= i < len(templates)]
+        if bad:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Template index out of range for '{key}' (0-{len(templates) - 1}): {bad}",
+            )
+        templates = [templates[i] for i in dict.fromkeys(indices)]
+
+    try:
+        created = create_requirements(
+            engagement_id, [{**copy.deepcopy(t), "source_type": "Template"} for t in templates]
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    top_match = {}
+    failed = []
+    if attach_results:
+        provider = ScheduledProvider(get_provider, BULK, engagement_id)
+        timestamp = datetime.now(timezone.utc).isoformat()
+        records = []
+        for req in created:
+            try:
+                compact, tokens_used = _template_matches(req["description"], provider)
+            except Exception as e:
+                print(f"Template analysis failed for {req['req_id']}: {e}")
+                failed.append({"req_id": req["req_id"], "error": str(e)})
+                continue
+            records.append(gap_result_record(
+                engagement_id, req["description"], compact,
+                tokens_used=tokens_used, timestamp=timestamp, req_id=req["req_id"],
+            ))
+            top_match[req["req_id"]] = compact[0]["id"] if compact else None
+        try:
+            save_gap_analyses(records)
+            update_requirements(list(top_match), engagement_id, {"status": "analysed"})
+        except Exception as e:
+            print(f"Saving template results failed for {engagement_id} (non-fatal): {e}")
+            failed.extend({"req_id": rid, "error": str(e)} for rid in top_match)
+            top_match = {}
+
+    return {
+        "engagement_id": engagement_id,
+        "domain": key,
+        "created": len(created),
+        "results_attached": len(top_match),
+        "requirements": [
+            {
+                "req_id": req["req_id"],
+                "title": req["title"],
+                "status": "analysed" if req["req_id"] in top_match else req.get("status", "open"),
+                "top_match_id": top_match.get(req["req_id"]),
+            }
+            for req in created
+        ],
+        "failed": failed,
+    }
+
+
 _ARCHAEOLOGIST_SYSTEM_PROMPT = """You are a senior business analyst and process archaeologist conducting a discovery interview for a Cloud ERP transformation. Your job is to deeply understand how work actually happens today — not how it should work, but how it really works, including workarounds, exceptions, and shadow tools.
 
 Your behaviour:
@@ -556,6 +1387,37 @@ Response format — always return valid JSON only, no markdown fences:
 When extracted.ready is true, populate all extracted fields with what you have learned."""
 
 
+_ARCHAEOLOGIST_TOOL = {
+    "name": "record_interview_turn",
+    "description": "Record the analyst's next reply and what has been learned so far.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "reply": {"type": "string"},
+            "extracted": {
+                "type": "object",
+                "properties": {
+                    "ready": {"type": "boolean"},
+                    "title": {"type": "string"},
+                    "description": {"type": "string"},
+                    "tags": {"type": "array", "items": {"type": "string", "enum": _VALID_TAGS}},
+                    "shadow_tools": {"type": "array", "items": {"type": "string"}},
+                    "actors": {"type": "array", "items": {"type": "object"}},
+                    "pain_points": {"type": "array", "items": {"type": "string"}},
+                    "secret_sauce": {"type": "array", "items": {"type": "string"}},
+                },
+                "required": ["ready"],
+            },
+            "suggested_follow_ups": {"type": "array", "items": {"type": "string"}},
+        },
+        "required": ["reply", "extracted"],
+    },
+}
+
+
+_ARCHAEOLOGIST_PROMPT = prompts.register("archaeologist", _ARCHAEOLOGIST_SYSTEM_PROMPT, _ARCHAEOLOGIST_TOOL)
+
+
 def _extract_json_object(text: str) -> dict:
     """Extract first complete JSON object from text, stripping markdown fences."""
     text = re.sub(r'```(?:json)?\s*', '', text).strip()
@@ -575,9 +1437,10 @@ def _extract_json_object(text: str) -> dict:
 
 @app.post("/requirements/archaeologist-session")
 def archaeologist_session(body: ArchaeologistSessionRequest):
-    provider = get_provider()
+    provider = ScheduledProvider(get_provider, INTERACTIVE, body.engagement_id)
 
-    # Build conversation as a single user message (history + current turn)
+    # Build conversation as a single user message: context and history only
+    # grow within a session, so they form a cacheable prefix before this turn
     lines = [
         f"Context:",
         f"  Stakeholder: {body.stakeholder} | Role: {body.role} | Business Process: {body.business_process}",
@@ -588,16 +1451,21 @@ def archaeologist_session(body: ArchaeologistSessionRequest):
         for msg in body.session_history:
             prefix = "Analyst" if msg.get("role") == "assistant" else "Stakeholder"
             lines.append(f"  {prefix}: {msg.get('content', '')}")
-        lines.append("")
-    lines.append(f"Stakeholder: {body.message}")
-    lines.append("")
-    lines.append("Respond as the analyst. Return valid JSON only.")
-    user_prompt = "\n".join(lines)
+    prompt = _ARCHAEOLOGIST_PROMPT.build(
+        f"Stakeholder: {body.message}\n\nRespond as the analyst. Return valid JSON only.",
+        stable="\n".join(lines),
+    )
 
     try:
-        result = provider.complete(_ARCHAEOLOGIST_SYSTEM_PROMPT, user_prompt, max_tokens=2048)
-        raw_text = result.get("content", "{}")
-        parsed = _extract_json_object(raw_text)
+        with metrics.span("llm", "archaeologist_session"):
+            result = provider.complete(prompt.system, prompt.user, max_tokens=2048, tool=_ARCHAEOLOGIST_TOOL)
+        prompts.record(prompt, result)
+        with metrics.span("parse", "archaeologist_session"):
+            parsed = result.get("data")
+            if not isinstance(parsed, dict):
+                parsed = _extract_json_object(result.get("content", "{}"))
+    except ProviderUnavailable as e:
+        raise HTTPException(status_code=503, detail=f"Archaeologist LLM error: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Archaeologist LLM error: {e}")
 
@@ -609,7 +1477,7 @@ def archaeologist_session(body: ArchaeologistSessionRequest):
     }
 
     if extracted.get("ready"):
-        valid_tags = {"pain_point", "manual_step", "secret_sauce", "workaround", "hand_off"}
+        valid_tags = set(_VALID_TAGS)
         tags = [t for t in (extracted.get("tags") or []) if t in valid_tags]
         try:
             req = create_requirement(
@@ -735,7 +1603,7 @@ def get_traceability(req_id: str, engagement_id: str):
             "tags": tags,
         },
         "gap_analysis": {
-            "matches": gap_records[0].get("matches") if gap_records else [],
+            "matches": expand_matches(gap_records[0].get("matches")) if gap_records else [],
             "total_analyses": len(gap_records),
         },
         "answer_to": {
@@ -765,89 +1633,32 @@ async def gap_analysis(request: GapAnalysisRequest):
     elif not process_description:
         raise HTTPException(status_code=422, detail="Provide either process_description or req_id")
 
-    provider = get_provider()
-    catalogue = build_catalogue_for_prompt(request.lob_filter)
-
-    system_prompt = """You are an expert SAP S/4HANA implementation consultant specializing in Fit-to-Standard gap analysis.
-
-Your task: Given a business process description, identify the most relevant SAP S/4HANA Cloud Public Edition scope items from the provided catalogue.
-
-Instructions:
-1. Analyze the business process description semantically - look beyond keywords to understand intent
-2. Return the top matching scope items ranked by relevance
-3. For each match, provide confidence (HIGH / MEDIUM / LOW) and a brief rationale
-4. Consider that one business requirement often maps to multiple scope items
-5. Always return valid JSON only
-
-Response format (JSON array):
-[
-  {
-    "id": "scope_item_code",
-    "confidence": "HIGH|MEDIUM|LOW",
-    "rationale": "One sentence explaining why this scope item matches"
-  }
-]"""
-
-    user_prompt = f"""Business Process Description:
-{process_description}
-
-SAP S/4HANA Cloud 2602 Scope Item Catalogue (2602 release):
-{catalogue}
-
-Return the top {request.top_n} most relevant scope items as JSON."""
-
     try:
-        result = provider.complete(system_prompt, user_prompt)
-        raw_text = result.get("content", "[]")
-        tokens_used = result.get("tokens_used")
-
-        json_match = re.search(r'\[.*\]', raw_text, re.DOTALL)
-        if not json_match:
-            raise ValueError("No JSON array found in response")
-
-        matches_raw = json.loads(json_match.group())
-
-        scope_lookup = {item['id']: item for item in SCOPE_ITEMS}
-        matches = []
-        for m in matches_raw[:request.top_n]:
-            item_id = m.get('id', '')
-            scope = scope_lookup.get(item_id, {})
-            if scope:
-                matches.append(ScopeItemMatch(
-                    id=item_id,
-                    name=scope['name'],
-                    lob=scope['lob'],
-                    process_group=scope['process_group'],
-                    description=scope['description'],
-                    confidence=m.get('confidence', 'MEDIUM'),
-                    rationale=m.get('rationale', ''),
-                    migration_objects=scope.get('migration_objects', [])
-                ))
-
-        timestamp = datetime.utcnow().isoformat()
+        # In the threadpool: the engine blocks on the LLM scheduler and provider
+        run = await run_in_threadpool(
+            gap_engine.run,
+            process_description,
+            request.top_n,
+            request.lob_filter,
+            provider=ScheduledProvider(get_provider, INTERACTIVE, request.engagement_id),
+            engagement_id=request.engagement_id,
+            req_id=req_id,
+        )
 
-        try:
-            save_gap_analysis(
+        with metrics.span("serialize", "gap_analysis_response"):
+            return GapAnalysisResponse(
                 engagement_id=request.engagement_id,
-                process_description=process_description,
-                matches=[m.dict() for m in matches],
-                tokens_used=tokens_used,
-                timestamp=timestamp,
                 req_id=req_id,
+                process_description=process_description,
+                matches=run.matches,
+                total_scope_items_searched=len(SCOPE_ITEMS),
+                tokens_used=run.tokens_used,
+                timestamp=run.timestamp,
+                matched_by=run.matched_by,
             )
-        except Exception as db_err:
-            print(f"DB save failed (non-fatal): {db_err}")
-
-        return GapAnalysisResponse(
-            engagement_id=request.engagement_id,
-            req_id=req_id,
-            process_description=process_description,
-            matches=matches,
-            total_scope_items_searched=len(SCOPE_ITEMS),
-            tokens_used=tokens_used,
-            timestamp=timestamp
-        )
 
+    except ProviderUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -886,7 +1697,7 @@ def get_engagement_summary(engagement_id: str):
             gr = results_by_req.get(rid)
             if gr:
                 matches = gr.get("matches") or []
-                top = matches[0] if matches else {}
+                top = expand_match(matches[0]) if matches else {}
                 gap_results_summary.append({
                     "req_id": rid,
                     "title": req.get("title"),
@@ -907,6 +1718,16 @@ def get_engagement_summary(engagement_id: str):
 
 # ── Analyse All ───────────────────────────────────────────────────────────────
 
+def _latest_matches_by_req(engagement_id: str) -> Dict[str, list]:
+    """Compact matches of each requirement's latest gap result (results come newest first)."""
+    latest: Dict[str, list] = {}
+    for gr in get_results_by_engagement(engagement_id):
+        rid = gr.get("req_id")
+        if rid and rid not in latest:
+            latest[rid] = gr.get("matches") or []
+    return latest
+
+
 @app.post("/engagement/{engagement_id}/analyse-all")
 def analyse_all(engagement_id: str):
     try:
@@ -916,41 +1737,99 @@ def analyse_all(engagement_id: str):
 
     open_reqs = [r for r in requirements if r.get("status") == "open"]
     if not open_reqs:
-        return {"processed": 0, "results": []}
+        return {"processed": 0, "results": [], "failed": []}
 
-    provider = get_provider()
+    provider = ScheduledProvider(get_provider, BULK, engagement_id)
     results = []
+    failed = []
+
+    duplicates = dedup_index.get_index()
+    duplicates.sync(engagement_id, requirements)
+    analysed_ids = {r["req_id"] for r in requirements if r.get("status") == "analysed"}
+    # req_id → compact matches; stored results are only loaded if a duplicate needs them
+    known_matches: Dict[str, list] = {}
+    stored_loaded = False
 
     for req in open_reqs:
         req_id = req["req_id"]
         try:
-            matches, tokens_used = _run_gap_analysis(provider, req["description"])
-            timestamp = datetime.utcnow().isoformat()
-            try:
-                save_gap_analysis(
-                    engagement_id=engagement_id,
-                    process_description=req["description"],
-                    matches=[m.dict() for m in matches],
-                    tokens_used=tokens_used,
-                    timestamp=timestamp,
-                    req_id=req_id,
-                )
-            except Exception as db_err:
-                print(f"DB save failed for {req_id} (non-fatal): {db_err}")
-
-            update_requirement(req_id, engagement_id, {"status": "analysed"})
-
-            top = matches[0] if matches else None
+            reused_from = None
+            if REUSE_DUPLICATE_RESULTS:
+                similar = [other for other, _ in duplicates.duplicates_of(engagement_id, req_id)]
+                if not stored_loaded and analysed_ids.intersection(similar):
+                    for rid, compact in _latest_matches_by_req(engagement_id).items():
+                        known_matches.setdefault(rid, compact)
+                    stored_loaded = True
+                reused_from = next((other for other in similar if other in known_matches), None)
+
+            if reused_from:
+                compact = known_matches[reused_from]
+                try:
+                    _persist_gap_result(
+                        engagement_id=engagement_id,
+                        process_description=req["description"],
+                        matches=compact,
+                        tokens_used=0,
+                        timestamp=datetime.utcnow().isoformat(),
+                        req_id=req_id,
+                    )
+                except Exception as db_err:
+                    print(f"DB save failed for {req_id} (non-fatal): {db_err}")
+                top = expand_match(compact[0]) if compact else {}
+                top_id, top_name = top.get("id"), top.get("name")
+            else:
+                matches = gap_engine.run(
+                    req["description"], provider=provider, engagement_id=engagement_id, req_id=req_id
+                ).matches
+                known_matches[req_id] = compact_matches(matches)
+                top_id = matches[0].id if matches else None
+                top_name = matches[0].name if matches else None
+
+            _persist_requirement_update(req_id, engagement_id, {"status": "analysed"})
             results.append({
                 "req_id": req_id,
                 "title": req.get("title"),
-                "top_match_id": top.id if top else None,
-                "top_match_name": top.name if top else None,
+                "top_match_id": top_id,
+                "top_match_name": top_name,
+                "reused_from": reused_from,
             })
         except Exception as e:
             print(f"Analysis failed for {req_id}: {e}")
+            failed.append({"req_id": req_id, "error": str(e)})
+
+    return {"processed": len(results), "results": results, "failed": failed}
 
-    return {"processed": len(results), "results": results}
+
+# ── Duplicates ────────────────────────────────────────────────────────────────
+
+@app.get("/engagement/{engagement_id}/duplicates")
+def get_duplicates(engagement_id: str):
+    try:
+        requirements = get_requirements_by_engagement(engagement_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    index = dedup_index.get_index()
+    index.sync(engagement_id, requirements)
+    by_id = {r["req_id"]: r for r in requirements}
+    groups = []
+    for group in index.groups(engagement_id):
+        groups.append({
+            "canonical": group["req_ids"][0],
+            "min_similarity": group["min_similarity"],
+            "requirements": [
+                {"req_id": rid, "title": by_id[rid].get("title"), "status": by_id[rid].get("status")}
+                for rid in group["req_ids"]
+            ],
+        })
+    return {
+        "engagement_id": engagement_id,
+        "threshold": index.threshold,
+        "total_requirements": len(requirements),
+        "duplicate_groups": len(groups),
+        "redundant_requirements": sum(len(g["requirements"]) - 1 for g in groups),
+        "groups": groups,
+    }
 
 
 # ── Process Mirror ────────────────────────────────────────────────────────────
@@ -995,6 +1874,61 @@ def get_process_mirror(engagement_id: str):
     }
 
 
+# ── Migration Plan ────────────────────────────────────────────────────────────
+
+# Looks get_results_since up at call time so tests can patch it on main
+_migration_planner = MigrationPlanner(lambda engagement_id, after_id: get_results_since(engagement_id, after_id))
+
+
+@app.get("/engagement/{engagement_id}/migration-plan")
+def get_migration_plan(engagement_id: str, rebuild: bool = False):
+    """Deduplicated migration objects needed by each requirement's latest matches."""
+    if rebuild:
+        _migration_planner.reset(engagement_id)
+    try:
+        return _migration_planner.plan(engagement_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ── Export ────────────────────────────────────────────────────────────────────
+
+EXPORT_PAGE_SIZE = int(os.getenv("RAPID_EXPORT_PAGE_SIZE", "500"))
+# Gap analyses store at most top_n matches (5 by default)
+EXPORT_MAX_TOP = 20
+
+
+@app.get("/engagement/{engagement_id}/export")
+def export_engagement(engagement_id: str, format: str = "csv", top: int = Query(3, ge=1, le=EXPORT_MAX_TOP)):
+    """Stream the fit-gap matrix (requirement × top matches) as CSV, XLSX or NDJSON."""
+    fmt = format.lower()
+    if fmt not in gap_export.FORMATS:
+        raise HTTPException(
+            status_code=400, detail=f"Unsupported format '{format}'. Valid options: {', '.join(gap_export.FORMATS)}"
+        )
+    if fmt == "xlsx" and gap_export.openpyxl is None:
+        raise HTTPException(status_code=400, detail="XLSX export needs openpyxl installed; use csv or ndjson")
+
+    try:
+        # Read the first page now so a storage failure is still a 500, not a cut-off stream
+        pages = iter_requirements(engagement_id, EXPORT_PAGE_SIZE)
+        first = next(pages, [])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    def all_pages():
+        yield first
+        yield from pages
+
+    rows = gap_export.matrix_rows(all_pages(), lambda req_ids: get_latest_results(engagement_id, req_ids), top)
+    filename = re.sub(r"[^A-Za-z0-9._-]", "_", engagement_id)
+    return StreamingResponse(
+        gap_export.ENCODERS[fmt](rows),
+        media_type=gap_export.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}-fit-gap.{fmt}"'},
+    )
+
+
 # ── Sign-off Status ────────────────────────────────────────────────────────────
 
 @app.get("/engagement/{engagement_id}/sign-off-status")
@@ -0,0 +1,258 @@
+"""
+In-process latency and throughput instrumentation.
+
+Every HTTP request and every call into a dependency (LLM, Supabase, JSON
+parsing, Pydantic serialisation) is recorded as a latency summary with
+p50/p95/p99, an in-flight gauge and request/error counters. Everything is
+exported in Prometheus text format via render_prometheus() (served on
+/metrics) and, per request, as a Server-Timing header.
+
+Usage:
+    with span("llm", "gap_analysis"):
+        provider.complete(...)
+
+    @timed("supabase")
+    def get_requirement_by_id(...): ...
+"""
+import contextvars
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Latest N observations per series are kept for quantile estimation
+_RESERVOIR_SIZE = 2048
+_QUANTILES = (0.5, 0.95, 0.99)
+
+_lock = threading.Lock()
+_summaries: Dict[Tuple[str, tuple], "_Summary"] = {}
+_counters: Dict[Tuple[str, tuple], float] = {}
+_gauges: Dict[Tuple[str, tuple], float] = {}
+_help: Dict[str, Tuple[str, str]] = {}
+
+# Per-request list of (name, seconds) entries rendered into Server-Timing
+_request_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = (
+    contextvars.ContextVar("rapid_request_timings", default=None)
+)
+
+
+class _Summary:
+    __slots__ = ("samples", "count", "total")
+
+    def __init__(self):
+        self.samples = deque(maxlen=_RESERVOIR_SIZE)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value: float):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def quantiles(self) -> Dict[float, float]:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: 0.0 for q in _QUANTILES}
+        last = len(ordered) - 1
+        return {q: ordered[min(last, int(round(q * last)))] for q in _QUANTILES}
+
+
+def _key(name: str, labels: dict) -> Tuple[str, tuple]:
+    return name, tuple(sorted(labels.items()))
+
+
+def describe(name: str, kind: str, help_text: str):
+    """Register HELP/TYPE metadata for a metric family."""
+    _help[name] = (kind, help_text)
+
+
+# ── Recording ────────────────────────────────────────────────────────────────
+
+def observe(name: str, seconds: float, **labels):
+    key = _key(name, labels)
+    with _lock:
+        summary = _summaries.get(key)
+        if summary is None:
+            summary = _summaries[key] = _Summary()
+        summary.add(seconds)
+
+
+def inc(name: str, value: float = 1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def gauge_add(name: str, delta: float, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = _gauges.get(key, 0) + delta
+
+
+def gauge_set(name: str, value: float, **labels):
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def counter_value(name: str, **labels) -> float:
+    return _counters.get(_key(name, labels), 0)
+
+
+def counter_total(name: str, **label_filter) -> float:
+    """Sum a counter over every series whose labels include `label_filter`."""
+    wanted = set(label_filter.items())
+    with _lock:
+        return sum(v for (n, labels), v in _counters.items() if n == name and wanted <= set(labels))
+
+
+def gauge_value(name: str, **labels) -> float:
+    return _gauges.get(_key(name, labels), 0)
+
+
+def summary_snapshot(name: str, **labels) -> dict:
+    """Return {"count", "sum", "p50", "p95", "p99"} for one series."""
+    with _lock:
+        summary = _summaries.get(_key(name, labels))
+        if summary is None:
+            return {"count": 0, "sum": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+        qs = summary.quantiles()
+        return {
+            "count": summary.count,
+            "sum": summary.total,
+            "p50": qs[0.5],
+            "p95": qs[0.95],
+            "p99": qs[0.99],
+        }
+
+
+def reset():
+    """Drop all recorded series (tests and benchmarks)."""
+    with _lock:
+        _summaries.clear()
+        _counters.clear()
+        _gauges.clear()
+
+
+# ── Dependency spans ─────────────────────────────────────────────────────────
+
+describe("rapid_dependency_duration_seconds", "summary", "Latency of calls into a dependency")
+describe("rapid_dependency_in_flight", "gauge", "Dependency calls currently in progress")
+describe("rapid_dependency_calls_total", "counter", "Dependency calls")
+describe("rapid_dependency_errors_total", "counter", "Dependency calls that raised")
+
+
+@contextmanager
+def span(dependency: str, op: str):
+    """Time a block as one call to `dependency` (llm, supabase, parse, serialize...)."""
+    labels = {"dependency": dependency, "op": op}
+    gauge_add("rapid_dependency_in_flight", 1, **labels)
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        inc("rapid_dependency_errors_total", **labels)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        gauge_add("rapid_dependency_in_flight", -1, **labels)
+        inc("rapid_dependency_calls_total", **labels)
+        observe("rapid_dependency_duration_seconds", elapsed, **labels)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((dependency, elapsed))
+
+
+def timed(dependency: str, op: Optional[str] = None):
+    """Decorator form of span(); op defaults to the function name."""
+    def decorator(fn):
+        name = op or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(dependency, name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ── Per-request Server-Timing ────────────────────────────────────────────────
+
+describe("rapid_http_request_duration_seconds", "summary", "HTTP request latency by route")
+describe("rapid_http_requests_in_flight", "gauge", "HTTP requests currently being served")
+describe("rapid_http_requests_total", "counter", "HTTP requests by route and status")
+describe("rapid_http_request_errors_total", "counter", "HTTP requests that failed with 5xx or raised")
+
+
+def begin_request() -> List[Tuple[str, float]]:
+    """Start collecting spans for the current request.
+
+    The returned list is shared by reference with any task or threadpool
+    worker spawned from this context, so spans recorded inside sync route
+    handlers still land here.
+    """
+    timings: List[Tuple[str, float]] = []
+    _request_timings.set(timings)
+    return timings
+
+
+def server_timing_header(timings: List[Tuple[str, float]], total: float) -> str:
+    """Render collected spans as `name;dur=ms` entries, summed per dependency."""
+    totals: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+        counts[name] = counts.get(name, 0) + 1
+    parts = [
+        f'{name};dur={seconds * 1000:.1f};desc="{counts[name]} call(s)"'
+        for name, seconds in totals.items()
+    ]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+# ── Prometheus export ────────────────────────────────────────────────────────
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: tuple, extra: Optional[dict] = None) -> str:
+    items = list(labels) + sorted((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _fmt(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render_prometheus() -> str:
+    with _lock:
+        summaries = {k: (s.count, s.total, s.quantiles()) for k, s in _summaries.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    families: Dict[str, List[str]] = {}
+    kinds: Dict[str, str] = {}
+    for (name, labels), (count, total, qs) in sorted(summaries.items()):
+        kinds[name] = "summary"
+        lines = families.setdefault(name, [])
+        for q, value in qs.items():
+            lines.append(f"{name}{_labels(labels, {'quantile': q})} {_fmt(value)}")
+        lines.append(f"{name}_sum{_labels(labels)} {_fmt(total)}")
+        lines.append(f"{name}_count{_labels(labels)} {count}")
+    for store, kind in ((counters, "counter"), (gauges, "gauge")):
+        for (name, labels), value in sorted(store.items()):
+            kinds[name] = kind
+            families.setdefault(name, []).append(f"{name}{_labels(labels)} {_fmt(value)}")
+
+    out = []
+    for name, lines in families.items():
+        kind, help_text = _help.get(name, (kinds[name], name))
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kinds[name]}")
+        out.extend(lines)
+    return "\n".join(out) + "\n"
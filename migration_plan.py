@@ -0,0 +1,129 @@
+"""
+Engagement migration plans: which data migration objects the matched scope
+items need, and which requirements drive each one.
+
+A requirement's matches are taken from its latest gap result (by timestamp,
+then id). Gap results without a req_id (ad-hoc /gap-analysis calls) are
+ignored. The planner keeps per-engagement state in memory:
+
+    watermark   highest gap_results.id applied so far
+    latest      req_id → (timestamp, id, scope item ids) of its latest result
+    objects     migration object → {req_id: scope item ids needing it}
+
+Each call fetches only rows with id > watermark and moves a requirement's
+contribution from its old matches to its new ones, so the cost of a call is
+proportional to the results written since the previous one rather than to
+the engagement's history. State is per process and rebuilt from storage on
+first use; at most MAX_ENGAGEMENTS engagements are kept (least recently used
+are dropped and rebuilt on demand). The watermark assumes ids become visible
+in increasing order; reset() forces a rebuild if rows are ever written out of
+band.
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from scope_items import MIGRATION_OBJECT_INDEX, SCOPE_ITEM_BY_ID
+
+MAX_ENGAGEMENTS = 256
+
+
+class _EngagementPlan:
+    def __init__(self):
+        self.watermark = 0
+        self.latest: Dict[str, tuple] = {}
+        self.objects: Dict[str, Dict[str, set]] = {}
+        self.lock = threading.Lock()
+
+    def _objects_for(self, scope_ids: frozenset):
+        for scope_id in scope_ids:
+            for obj in SCOPE_ITEM_BY_ID.get(scope_id, {}).get("migration_objects", []):
+                yield obj, scope_id
+
+    def _add(self, req_id: str, scope_ids: frozenset):
+        for obj, scope_id in self._objects_for(scope_ids):
+            self.objects.setdefault(obj, {}).setdefault(req_id, set()).add(scope_id)
+
+    def _remove(self, req_id: str, scope_ids: frozenset):
+        for obj, scope_id in self._objects_for(scope_ids):
+            drivers = self.objects.get(obj, {})
+            drivers.get(req_id, set()).discard(scope_id)
+            if req_id in drivers and not drivers[req_id]:
+                del drivers[req_id]
+            if obj in self.objects and not drivers:
+                del self.objects[obj]
+
+    def apply(self, row: dict) -> bool:
+        """Fold one gap result in; True when it became its requirement's latest."""
+        self.watermark = max(self.watermark, row["id"])
+        req_id = row.get("req_id")
+        if not req_id:
+            return False
+        key = (row.get("timestamp") or "", row["id"])
+        current = self.latest.get(req_id)
+        if current and current[:2] >= key:
+            return False
+        scope_ids = frozenset(m.get("id") for m in row.get("matches") or [] if m.get("id"))
+        if current:
+            self._remove(req_id, current[2])
+        self._add(req_id, scope_ids)
+        self.latest[req_id] = (*key, scope_ids)
+        return True
+
+
+class MigrationPlanner:
+    """`fetch_since(engagement_id, after_id)` returns gap_results rows with id > after_id."""
+
+    def __init__(self, fetch_since: Callable[[str, int], list], max_engagements: int = MAX_ENGAGEMENTS):
+        self.fetch_since = fetch_since
+        self.max_engagements = max_engagements
+        self._plans: "OrderedDict[str, _EngagementPlan]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _plan_for(self, engagement_id: str) -> _EngagementPlan:
+        with self._lock:
+            plan = self._plans.get(engagement_id)
+            if plan is None:
+                plan = self._plans[engagement_id] = _EngagementPlan()
+                while len(self._plans) > self.max_engagements:
+                    self._plans.popitem(last=False)
+            self._plans.move_to_end(engagement_id)
+            return plan
+
+    def plan(self, engagement_id: str) -> dict:
+        state = self._plan_for(engagement_id)
+        with state.lock:
+            rows = self.fetch_since(engagement_id, state.watermark)
+            for row in rows:
+                state.apply(row)
+            objects = [
+                {
+                    "migration_object": obj,
+                    "requirement_count": len(drivers),
+                    "req_ids": sorted(drivers),
+                    "scope_items": sorted(set().union(*drivers.values())),
+                    "catalogue_scope_items": len(MIGRATION_OBJECT_INDEX.get(obj, [])),
+                }
+                for obj, drivers in state.objects.items()
+            ]
+            analysed = len(state.latest)
+        objects.sort(key=lambda o: (-o["requirement_count"], o["migration_object"]))
+        return {
+            "engagement_id": engagement_id,
+            "generated_at": datetime.utcnow().isoformat(),
+            "summary": {
+                "requirements_analysed": analysed,
+                "total_migration_objects": len(objects),
+                "results_applied": len(rows),
+            },
+            "objects": objects,
+        }
+
+    def reset(self, engagement_id: Optional[str] = None):
+        """Drop cached state (one engagement or all) so the next plan rebuilds it."""
+        with self._lock:
+            if engagement_id is None:
+                self._plans.clear()
+            else:
+                self._plans.pop(engagement_id, None)
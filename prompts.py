@@ -0,0 +1,154 @@
+"""
+Prompt assembly for every LLM call.
+
+Anthropic prompt caching (and any KV prefix cache) only reuses an identical
+prefix: tools → system → messages. A prompt is therefore assembled
+static-first:
+
+    system  [instructions] [static context, e.g. the catalogue] ← breakpoint
+    user    [stable per-session text, e.g. history]             ← breakpoint
+            [variable text: the requirement, transcript, message]
+
+Breakpoints are `cache_control: ephemeral` markers on the last block of each
+cacheable run. Below the model's minimum cacheable length a breakpoint is
+ignored by the API, so marking short prompts costs nothing.
+
+Each template has a version: a hash of its instructions and tool schema.
+Anything that caches or evaluates model output should key on it, so editing
+a prompt can never serve answers produced by the old one.
+
+record() folds a provider result's cache usage into per-template counters;
+cache_stats() reports hit ratios (also exported as Prometheus metrics). Tokens
+spent are also added to a per-day ledger in shared_state, so the daily total
+covers every worker of a multi-worker deployment.
+"""
+import hashlib
+import json
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+
+import metrics
+import shared_state
+
+metrics.describe("rapid_prompt_tokens_total", "counter", "LLM input tokens by prompt template and cache outcome")
+metrics.describe("rapid_prompt_cache_total", "counter", "LLM calls by prompt template and prefix-cache hit/miss")
+
+_CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def _block(text: str, cache: bool = False) -> dict:
+    block = {"type": "text", "text": text}
+    if cache:
+        block["cache_control"] = dict(_CACHE_CONTROL)
+    return block
+
+
+def flatten(content: Union[str, List[dict]]) -> str:
+    """Plain text of a system/user value, whether a string or content blocks."""
+    if isinstance(content, str):
+        return content
+    return "\n\n".join(block.get("text", "") for block in content)
+
+
+class Prompt:
+    """An assembled prompt; pass .system and .user to provider.complete()."""
+
+    def __init__(self, template: "PromptTemplate", system: List[dict], user: Union[str, List[dict]]):
+        self.template = template
+        self.system = system
+        self.user = user
+
+    @property
+    def text(self) -> str:
+        return f"{flatten(self.system)}\n\n{flatten(self.user)}"
+
+
+class PromptTemplate:
+    def __init__(self, name: str, instructions: str, tool: Optional[dict] = None):
+        self.name = name
+        self.instructions = instructions
+        self.tool = tool
+        self.version = hashlib.sha256(
+            json.dumps([instructions, tool], sort_keys=True).encode()
+        ).hexdigest()[:12]
+
+    def build(self, variable: str, static: Optional[str] = None, stable: Optional[str] = None) -> Prompt:
+        """`static` is shared by every caller; `stable` only grows within a session."""
+        system = [_block(self.instructions)]
+        if static:
+            system.append(_block(static))
+        system[-1]["cache_control"] = dict(_CACHE_CONTROL)
+        user: Union[str, List[dict]] = variable
+        if stable:
+            user = [_block(stable, cache=True), _block(variable)]
+        return Prompt(self, system, user)
+
+
+TEMPLATES: Dict[str, PromptTemplate] = {}
+
+
+def register(name: str, instructions: str, tool: Optional[dict] = None) -> PromptTemplate:
+    template = PromptTemplate(name, instructions, tool)
+    TEMPLATES[name] = template
+    return template
+
+
+def versions() -> Dict[str, str]:
+    return {name: t.version for name, t in sorted(TEMPLATES.items())}
+
+
+# ── Cache accounting ─────────────────────────────────────────────────────────
+
+_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def _ledger_key(template: str) -> str:
+    return f"tokens:{datetime.utcnow().date().isoformat()}:{template}"
+
+
+def record(prompt: Prompt, result: dict):
+    """Count a provider result's input tokens by cache outcome for the prompt's template."""
+    read = result.get("cache_read_tokens") or 0
+    written = result.get("cache_creation_tokens") or 0
+    uncached = result.get("input_tokens") or 0
+    name = prompt.template.name
+    with _lock:
+        stats = _stats.setdefault(name, {"calls": 0, "hits": 0, "cache_read": 0, "cache_write": 0, "uncached": 0})
+        stats["calls"] += 1
+        stats["hits"] += 1 if read else 0
+        stats["cache_read"] += read
+        stats["cache_write"] += written
+        stats["uncached"] += uncached
+    if result.get("tokens_used"):
+        shared_state.get_shared_state().ledger_add(_ledger_key(name), result["tokens_used"])
+    metrics.inc("rapid_prompt_cache_total", template=name, outcome="hit" if read else "miss")
+    for kind, tokens in (("cache_read", read), ("cache_write", written), ("uncached", uncached)):
+        if tokens:
+            metrics.inc("rapid_prompt_tokens_total", tokens, template=name, kind=kind)
+
+
+def cache_stats() -> Dict[str, dict]:
+    """Per template: version, calls, request hit ratio, share of input tokens
+    read from cache and tokens spent today by all workers."""
+    with _lock:
+        snapshot = {name: dict(stats) for name, stats in _stats.items()}
+    today = shared_state.get_shared_state().ledger_get(_ledger_key(""))
+    report = {}
+    for name, template in sorted(TEMPLATES.items()):
+        stats = snapshot.get(name, {"calls": 0, "hits": 0, "cache_read": 0, "cache_write": 0, "uncached": 0})
+        total = stats["cache_read"] + stats["cache_write"] + stats["uncached"]
+        report[name] = {
+            "version": template.version,
+            **stats,
+            "hit_ratio": round(stats["hits"] / stats["calls"], 4) if stats["calls"] else None,
+            "token_hit_ratio": round(stats["cache_read"] / total, 4) if total else None,
+            "tokens_today": int(today.get(_ledger_key(name), 0)),
+        }
+    return report
+
+
+def reset_stats():
+    with _lock:
+        _stats.clear()
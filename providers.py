@@ -1,30 +1,278 @@
+import json
 import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
 from dotenv import load_dotenv
+
+import metrics
+
 load_dotenv()
 
+# ── Resilience settings ──────────────────────────────────────────────────────
+# Retries use full-jitter exponential backoff and honour retry-after. The
+# deadline bounds the whole call (all attempts). Hedging is off unless
+# RAPID_LLM_HEDGE_AFTER_S is set: a second identical request is fired if the
+# first has not answered by then, and whichever finishes first wins.
+
+MAX_RETRIES = int(os.getenv("RAPID_LLM_MAX_RETRIES", "4"))
+BACKOFF_BASE_S = float(os.getenv("RAPID_LLM_BACKOFF_BASE_S", "0.5"))
+BACKOFF_MAX_S = float(os.getenv("RAPID_LLM_BACKOFF_MAX_S", "20"))
+CALL_DEADLINE_S = float(os.getenv("RAPID_LLM_DEADLINE_S", "90"))
+HEDGE_AFTER_S = float(os.getenv("RAPID_LLM_HEDGE_AFTER_S", "0"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("RAPID_LLM_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN_S = float(os.getenv("RAPID_LLM_BREAKER_COOLDOWN_S", "30"))
+
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+# Patched in tests so backoff does not actually sleep
+_sleep = time.sleep
+
+metrics.describe("rapid_llm_calls_total", "counter", "Provider calls by outcome")
+metrics.describe("rapid_llm_retries_total", "counter", "Provider retries by error type")
+metrics.describe("rapid_llm_hedged_total", "counter", "Hedged provider requests by winner")
+metrics.describe("rapid_llm_breaker_state", "gauge", "Circuit breaker state (0 closed, 1 half-open, 2 open)")
+metrics.describe("rapid_llm_breaker_transitions_total", "counter", "Circuit breaker state changes")
+
+
+class ProviderUnavailable(Exception):
+    """Raised without calling the API: breaker open, no scheduler slot or call deadline exhausted."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker shared by every provider instance.
+
+    closed    → calls flow; `failure_threshold` retryable failures in a row opens it
+    open      → calls are rejected until `cooldown_s` has passed
+    half_open → one probe call is let through; success closes, failure re-opens
+
+    A call that ends without saying anything about provider health (a caller
+    error, a spent deadline) calls release(), which frees the probe slot only.
+    """
+    _STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, cooldown_s: float = BREAKER_COOLDOWN_S):
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        metrics.gauge_set("rapid_llm_breaker_state", 0)
+
+    def _transition(self, state: str):
+        if state != self.state:
+            metrics.inc("rapid_llm_breaker_transitions_total", to=state)
+        self.state = state
+        metrics.gauge_set("rapid_llm_breaker_state", self._STATE_VALUES[state])
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.cooldown_s:
+                    return False
+                self._transition("half_open")
+            if self.state == "half_open":
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probe_in_flight = False
+            self._transition("closed")
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._transition("open")
+
+    def release(self):
+        with self._lock:
+            self._probe_in_flight = False
+
+    def reset(self):
+        with self._lock:
+            self.failures = 0
+            self._probe_in_flight = False
+            self._transition("closed")
+
+
+_breaker = CircuitBreaker()
+_hedge_pool: Optional[ThreadPoolExecutor] = None
+_hedge_pool_lock = threading.Lock()
+
+
+def _get_hedge_pool() -> ThreadPoolExecutor:
+    global _hedge_pool
+    with _hedge_pool_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge")
+        return _hedge_pool
+
+
+def _is_retryable(exc: Exception) -> bool:
+    import anthropic
+    if isinstance(exc, (anthropic.APITimeoutError, anthropic.APIConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    return status in _RETRYABLE_STATUS
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    """Seconds requested by the server via retry-after-ms / retry-after, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** attempt)))
+
+
 class AnthropicProvider:
     def __init__(self):
         import anthropic
-        self.client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+        # Retries are handled here (breaker-aware), not by the SDK
+        self.client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"), max_retries=0)
         self.call_count = 0
         self.total_input_tokens = 0
         self.total_output_tokens = 0
+        self.retry_count = 0
 
-    def complete(self, system_prompt, user_prompt, max_tokens=1024):
-        msg = self.client.messages.create(
+    def _create(self, system_prompt, user_prompt, max_tokens, timeout, tool=None):
+        kwargs = {}
+        if tool:
+            # Force the model to answer through the tool so the reply is schema-valid JSON
+            kwargs["tools"] = [tool]
+            kwargs["tool_choice"] = {"type": "tool", "name": tool["name"]}
+        return self.client.messages.create(
             model="claude-haiku-4-5-20251001",
             max_tokens=max_tokens,
             system=system_prompt,
-            messages=[{"role": "user", "content": user_prompt}]
+            messages=[{"role": "user", "content": user_prompt}],
+            timeout=timeout,
+            **kwargs,
         )
+
+    def _create_hedged(self, system_prompt, user_prompt, max_tokens, timeout, tool=None):
+        """Fire a second identical request if the first is slower than HEDGE_AFTER_S."""
+        pool = _get_hedge_pool()
+        primary = pool.submit(self._create, system_prompt, user_prompt, max_tokens, timeout, tool)
+        done, _ = wait([primary], timeout=HEDGE_AFTER_S)
+        if done:
+            return primary.result()
+        hedge = pool.submit(
+            self._create, system_prompt, user_prompt, max_tokens, max(0.1, timeout - HEDGE_AFTER_S), tool
+        )
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    metrics.inc("rapid_llm_hedged_total", winner="primary" if future is primary else "hedge")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def complete(
+        self,
+        system_prompt,
+        user_prompt,
+        max_tokens=1024,
+        deadline_s: Optional[float] = None,
+        tool: Optional[dict] = None,
+    ):
+        """Returns {"content", "tokens_used", "input_tokens", "cache_read_tokens",
+        "cache_creation_tokens"}; with `tool` ({"name", "description",
+        "input_schema"}) the model is forced to call it and the validated tool
+        input is also returned as "data". `system_prompt` and `user_prompt` may
+        be strings or content-block lists carrying cache_control breakpoints
+        (see prompts.py)."""
+        deadline = time.monotonic() + (deadline_s or CALL_DEADLINE_S)
+        attempt = 0
+        while True:
+            if not _breaker.allow():
+                metrics.inc("rapid_llm_calls_total", outcome="rejected")
+                raise ProviderUnavailable("LLM provider circuit breaker is open")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                _breaker.release()
+                metrics.inc("rapid_llm_calls_total", outcome="deadline")
+                raise ProviderUnavailable("LLM call deadline exceeded")
+            try:
+                if 0 < HEDGE_AFTER_S < remaining:
+                    msg = self._create_hedged(system_prompt, user_prompt, max_tokens, remaining, tool)
+                else:
+                    msg = self._create(system_prompt, user_prompt, max_tokens, remaining, tool)
+            except Exception as e:
+                if not _is_retryable(e):
+                    # Caller errors (400, 401...) say nothing about provider health
+                    _breaker.release()
+                    metrics.inc("rapid_llm_calls_total", outcome="error")
+                    raise
+                _breaker.record_failure()
+                delay = _retry_after(e)
+                delay = _backoff(attempt) if delay is None else delay
+                if attempt >= MAX_RETRIES or time.monotonic() + delay >= deadline:
+                    metrics.inc("rapid_llm_calls_total", outcome="error")
+                    raise
+                attempt += 1
+                self.retry_count += 1
+                metrics.inc("rapid_llm_retries_total", reason=type(e).__name__)
+                _sleep(delay)
+                continue
+            _breaker.record_success()
+            metrics.inc("rapid_llm_calls_total", outcome="ok")
+            break
+
+        # With prompt caching, input_tokens only counts the uncached part
+        cache_read = getattr(msg.usage, "cache_read_input_tokens", 0) or 0
+        cache_creation = getattr(msg.usage, "cache_creation_input_tokens", 0) or 0
+        input_tokens = msg.usage.input_tokens + cache_read + cache_creation
         self.call_count += 1
-        self.total_input_tokens += msg.usage.input_tokens
+        self.total_input_tokens += input_tokens
         self.total_output_tokens += msg.usage.output_tokens
-        tokens_used = msg.usage.input_tokens + msg.usage.output_tokens
-        return {
-            "content": msg.content[0].text,
-            "tokens_used": tokens_used
+        tokens_used = input_tokens + msg.usage.output_tokens
+        result = {
+            "content": "".join(b.text for b in msg.content if getattr(b, "type", "text") == "text"),
+            "tokens_used": tokens_used,
+            "input_tokens": msg.usage.input_tokens,
+            "cache_read_tokens": cache_read,
+            "cache_creation_tokens": cache_creation,
         }
+        for block in msg.content:
+            if getattr(block, "type", None) == "tool_use":
+                result["data"] = block.input
+                result["content"] = json.dumps(block.input)
+                break
+        return result
 
 def get_provider():
     return AnthropicProvider()
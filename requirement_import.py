@@ -0,0 +1,135 @@
+"""
+Row readers for the bulk requirement import
+(POST /engagement/{engagement_id}/requirements/import).
+
+Both formats are read one row at a time from a seekable file object, so a
+50k-row sheet is never held in memory as a whole:
+
+    csv   csv.reader over the UTF-8 text (a leading BOM is ignored)
+    xlsx  openpyxl in read-only mode, first worksheet
+
+The first row is the header. Header cells are matched to requirement fields
+case-insensitively, with spaces and dashes read as underscores; unknown
+columns are ignored and reported. Iterating a RowReader yields
+(row_number, fields) with row numbers as the spreadsheet shows them (the
+header is row 1). Blank rows are skipped and empty cells left out, so the
+model's defaults apply. List columns are split on ';' (or ',' when a cell
+has no ';'); JSON columns take a JSON object or array.
+
+openpyxl is an optional dependency; without it xlsx uploads are rejected.
+"""
+import csv
+import io
+import json
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import openpyxl
+except ImportError:  # optional dependency
+    openpyxl = None
+
+FORMATS = ("csv", "xlsx")
+REQUIRED_FIELDS = ("title", "description")
+LIST_FIELDS = {"tags", "shadow_tools"}
+JSON_FIELDS = {"kpi_impact", "actors"}
+
+_XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+_ZIP_MAGIC = b"PK\x03\x04"
+_HEADER_SEPARATORS = re.compile(r"[\s\-]+")
+
+
+class ImportFormatError(ValueError):
+    """The upload cannot be read as a requirements sheet at all."""
+
+
+def detect_format(requested: Optional[str], content_type: Optional[str], fileobj) -> str:
+    """csv or xlsx, from ?format=, else the Content-Type, else the file's first bytes."""
+    if requested:
+        fmt = requested.lower()
+        if fmt not in FORMATS:
+            raise ImportFormatError(f"Unsupported format '{requested}'. Valid options: {', '.join(FORMATS)}")
+        return fmt
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type == _XLSX_CONTENT_TYPE:
+        return "xlsx"
+    if content_type in ("text/csv", "application/csv"):
+        return "csv"
+    head = fileobj.read(len(_ZIP_MAGIC))
+    fileobj.seek(0)
+    return "xlsx" if head == _ZIP_MAGIC else "csv"
+
+
+def _field_name(header) -> str:
+    return _HEADER_SEPARATORS.sub("_", str(header or "").strip().lower())
+
+
+def _cell(field: str, value):
+    """Stored form of one non-empty cell; JSON that does not parse is left for validation to reject."""
+    if hasattr(value, "isoformat"):
+        value = value.isoformat()
+    value = str(value).strip()
+    if field in LIST_FIELDS:
+        separator = ";" if ";" in value else ","
+        return [item.strip() for item in value.split(separator) if item.strip()]
+    if field in JSON_FIELDS:
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+class RowReader:
+    def __init__(self, fileobj, fmt: str, fields: Iterable[str]):
+        self._workbook = None
+        if fmt == "xlsx":
+            if openpyxl is None:
+                raise ImportFormatError("XLSX import needs openpyxl installed; upload CSV instead")
+            try:
+                self._workbook = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+            except Exception as e:
+                raise ImportFormatError(f"Not a readable XLSX workbook: {e}")
+            rows = self._workbook.worksheets[0].iter_rows(values_only=True)
+        else:
+            text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+            rows = csv.reader(text)
+        self._rows: Iterator = rows
+
+        try:
+            header = next(self._rows, None)
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise ImportFormatError(f"Unreadable header row: {e}")
+        if not header:
+            raise ImportFormatError("The upload has no header row")
+        known = set(fields)
+        self._columns: List[Tuple[int, str]] = []
+        self.ignored_columns: List[str] = []
+        for i, cell in enumerate(header):
+            name = _field_name(cell)
+            if name in known:
+                self._columns.append((i, name))
+            elif name:
+                self.ignored_columns.append(str(cell).strip())
+        missing = [f for f in REQUIRED_FIELDS if f not in {name for _, name in self._columns}]
+        if missing:
+            raise ImportFormatError(f"Missing required column(s): {', '.join(missing)}")
+
+    def __iter__(self) -> Iterator[Tuple[int, dict]]:
+        row_number = 1
+        try:
+            for row in self._rows:
+                row_number += 1
+                fields = {}
+                for i, name in self._columns:
+                    value = row[i] if i < len(row) else None
+                    if value is not None and str(value).strip():
+                        fields[name] = _cell(name, value)
+                if fields:
+                    yield row_number, fields
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise ImportFormatError(f"Row {row_number}: {e}")
+
+    def close(self):
+        if self._workbook is not None:
+            self._workbook.close()
@@ -14,6 +14,12 @@ Each entry:
   keywords      - Key terms for semantic search (lowercase)
 """
 
+import hashlib
+import json
+
+# Release this catalogue corresponds to; stamped on every stored gap match
+CATALOGUE_RELEASE = "2602"
+
 SCOPE_ITEMS = [
   {
     "id": "J58",
@@ -4263,6 +4269,24 @@ SCOPE_ITEMS = [
 # Quick lookup dict
 SCOPE_ITEM_BY_ID = {item["id"]: item for item in SCOPE_ITEMS}
 
+
+def _migration_object_index() -> dict:
+    index = {}
+    for item in SCOPE_ITEMS:
+        for obj in item.get("migration_objects", []):
+            index.setdefault(obj, []).append(item["id"])
+    return index
+
+
+# Reverse index: migration object → ids of the scope items that require it
+MIGRATION_OBJECT_INDEX = _migration_object_index()
+
+# Content hash of the catalogue; changes whenever any item is edited, so it
+# can key caches and ETags that depend on catalogue data
+CATALOGUE_VERSION = f"{CATALOGUE_RELEASE}-" + hashlib.sha256(
+    json.dumps(SCOPE_ITEMS, sort_keys=True).encode()
+).hexdigest()[:12]
+
 def get_catalogue_text():
     """Returns all scope items as a single formatted string for LLM context."""
     lines = []
@@ -4272,3 +4296,48 @@ def get_catalogue_text():
         if item.get('migration_objects'):
             lines.append(f"  Migration Objects: {', '.join(item['migration_objects'])}")
     return "\n".join(lines)
+
+
+# ── Compact gap-result matches ───────────────────────────────────────────────
+# gap_results rows store only what the LLM decided; the static catalogue
+# fields are joined back in from SCOPE_ITEM_BY_ID when results are read.
+
+CATALOGUE_FIELDS = ("name", "lob", "process_group", "description", "migration_objects")
+_CONFIDENCE_SCORE = {"HIGH": 0.9, "MEDIUM": 0.6, "LOW": 0.3}
+
+
+def compact_match(match, rank: int) -> dict:
+    """Reduce a ScopeItemMatch (model or dict) to {id, confidence, rationale, rank, score, catalogue_release}."""
+    if not isinstance(match, dict):
+        # Read the model's fields in place rather than copying via .dict()
+        match = vars(match)
+    confidence = match.get("confidence", "MEDIUM")
+    return {
+        "id": match["id"],
+        "confidence": confidence,
+        "rationale": match.get("rationale", ""),
+        "rank": rank,
+        "score": match.get("score", _CONFIDENCE_SCORE.get(confidence, 0.5)),
+        "catalogue_release": match.get("catalogue_release", CATALOGUE_RELEASE),
+    }
+
+
+def compact_matches(matches: list) -> list:
+    return [compact_match(m, rank) for rank, m in enumerate(matches, start=1)]
+
+
+def expand_match(match: dict) -> dict:
+    """Add catalogue fields to a stored match; legacy full rows pass through."""
+    if "name" in match:
+        return match
+    item = SCOPE_ITEM_BY_ID.get(match.get("id"), {})
+    expanded = {"id": match.get("id")}
+    expanded.update({field: item.get(field) for field in CATALOGUE_FIELDS})
+    expanded["migration_objects"] = expanded["migration_objects"] or []
+    expanded.update(match)
+    return expanded
+
+
+def expand_matches(matches: list) -> list:
+    return [expand_match(m) for m in matches or []]
+
@@ -0,0 +1,286 @@
+"""
+State shared by every worker process of a deployment.
+
+A single uvicorn process can keep caches and counters in memory, but under
+gunicorn each of N workers would get its own copy: caches N times colder,
+token accounting split N ways and rate limits N times too loose. This module
+keeps that state where every worker on the host sees it:
+
+    cache    key → JSON value with an expiry (LLM result cache)
+    ledger   additive counters (tokens spent per prompt template per day,
+             engagement data versions behind ETags)
+    buckets  token buckets (provider rate limits)
+
+Backends:
+    SQLiteSharedState — a WAL-mode SQLite file; safe across processes on one
+                        host. Used when RAPID_SHARED_STATE_PATH is set
+                        (gunicorn.conf.py sets it for multi-worker runs).
+    MemorySharedState — dicts under a lock; the single-process default.
+
+Connections are opened lazily and reopened after a fork, so the gunicorn
+master can import this module before spawning workers.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+SHARED_STATE_PATH = os.getenv("RAPID_SHARED_STATE_PATH", "")
+
+# Expired cache rows are swept once every this many writes
+_PURGE_EVERY = 256
+
+
+class SharedState:
+    """Interface both backends implement."""
+
+    name = "base"
+
+    @property
+    def instance_id(self) -> str:
+        """Random id of this store, fixed for its lifetime; a new store gets a new one."""
+        raise NotImplementedError
+
+    def cache_get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def cache_set(self, key: str, value: Any, ttl_s: float):
+        raise NotImplementedError
+
+    def cache_delete(self, key: str):
+        raise NotImplementedError
+
+    def ledger_add(self, key: str, amount: float) -> float:
+        """Add to a counter and return its new total."""
+        raise NotImplementedError
+
+    def ledger_get(self, prefix: str = "") -> Dict[str, float]:
+        """Every counter whose key starts with `prefix`."""
+        raise NotImplementedError
+
+    def acquire(self, key: str, rate_per_s: float, burst: float, cost: float = 1.0) -> float:
+        """Take `cost` tokens from a bucket refilled at `rate_per_s` up to `burst`.
+
+        Returns 0.0 when taken, else the seconds until enough tokens will be
+        available (nothing is taken; call again after waiting).
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+def _refill(tokens: float, updated: float, now: float, rate_per_s: float, burst: float) -> float:
+    return min(burst, tokens + max(0.0, now - updated) * rate_per_s)
+
+
+class MemorySharedState(SharedState):
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache: Dict[str, tuple] = {}
+        self._ledger: Dict[str, float] = {}
+        self._buckets: Dict[str, tuple] = {}
+        self._instance_id = uuid.uuid4().hex[:8]
+
+    @property
+    def instance_id(self) -> str:
+        return self._instance_id
+
+    def cache_get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._cache[key]
+                return None
+            return json.loads(entry[0])
+
+    def cache_set(self, key: str, value: Any, ttl_s: float):
+        with self._lock:
+            self._cache[key] = (json.dumps(value), time.time() + ttl_s)
+
+    def cache_delete(self, key: str):
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def ledger_add(self, key: str, amount: float) -> float:
+        with self._lock:
+            self._ledger[key] = self._ledger.get(key, 0.0) + amount
+            return self._ledger[key]
+
+    def ledger_get(self, prefix: str = "") -> Dict[str, float]:
+        with self._lock:
+            return {k: v for k, v in self._ledger.items() if k.startswith(prefix)}
+
+    def acquire(self, key: str, rate_per_s: float, burst: float, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = _refill(tokens, updated, now, rate_per_s, burst)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (cost - tokens) / rate_per_s
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._ledger.clear()
+            self._buckets.clear()
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key        TEXT PRIMARY KEY,
+    value      TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ledger (
+    key   TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    key     TEXT PRIMARY KEY,
+    tokens  REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SQLiteSharedState(SharedState):
+    """Bucket timestamps use wall-clock time: monotonic clocks are per process."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._writes = 0
+        self._instance_id: Optional[str] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # A connection must not cross a fork; workers open their own
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SQLITE_SCHEMA)
+            # The first process to open the file picks the id; the rest read it
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('instance_id', ?)", (uuid.uuid4().hex[:8],))
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    @property
+    def instance_id(self) -> str:
+        if self._instance_id is None:
+            with self._lock:
+                row = self._connection().execute("SELECT value FROM meta WHERE key = 'instance_id'").fetchone()
+            self._instance_id = row[0]
+        return self._instance_id
+
+    def cache_get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def cache_set(self, key: str, value: Any, ttl_s: float):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now + ttl_s),
+            )
+            self._writes += 1
+            if self._writes % _PURGE_EVERY == 0:
+                conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+
+    def cache_delete(self, key: str):
+        with self._lock:
+            self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def ledger_add(self, key: str, amount: float) -> float:
+        with self._lock:
+            return self._connection().execute(
+                "INSERT INTO ledger (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value RETURNING value",
+                (key, amount),
+            ).fetchone()[0]
+
+    def ledger_get(self, prefix: str = "") -> Dict[str, float]:
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT key, value FROM ledger WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            ).fetchall()
+        return dict(rows)
+
+    def acquire(self, key: str, rate_per_s: float, burst: float, cost: float = 1.0) -> float:
+        with self._lock:
+            conn = self._connection()
+            # IMMEDIATE takes the write lock up front so the read-modify-write
+            # is atomic across processes
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens = _refill(*(row or (burst, now)), now, rate_per_s, burst)
+                wait = 0.0
+                if tokens >= cost:
+                    tokens -= cost
+                else:
+                    wait = (cost - tokens) / rate_per_s
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return wait
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            for table in ("cache", "ledger", "buckets"):
+                conn.execute(f"DELETE FROM {table}")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+def create_shared_state(path: Optional[str] = None) -> SharedState:
+    path = SHARED_STATE_PATH if path is None else path
+    return SQLiteSharedState(path) if path else MemorySharedState()
+
+
+_state: Optional[SharedState] = None
+_state_lock = threading.Lock()
+
+
+def get_shared_state() -> SharedState:
+    """Backend from RAPID_SHARED_STATE_PATH, built on first use."""
+    global _state
+    if _state is None:
+        with _state_lock:
+            if _state is None:
+                _state = create_shared_state()
+    return _state
+
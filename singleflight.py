@@ -0,0 +1,66 @@
+"""
+Single-flight coalescing of identical in-flight calls.
+
+    flights = Group("gap_analysis")
+    result, shared = flights.do(key, lambda: provider.complete(...))
+
+The first caller for a key (the leader) runs the function. Callers arriving
+with the same key while it runs wait for it and get the same result, or the
+same exception, with shared=True. A key is only coalesced while its call is in
+flight, so nothing is cached here; completed results are the result cache's
+job. Groups are per process: identical calls in different workers still run
+once each.
+"""
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import metrics
+
+metrics.describe("rapid_llm_coalesced_total", "counter", "Calls that waited on an identical in-flight call instead of making their own")
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class Group:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn() once per in-flight key; returns (result, shared)."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+        if not leader:
+            metrics.inc("rapid_llm_coalesced_total", op=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
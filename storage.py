@@ -0,0 +1,598 @@
+"""
+Storage backends behind the database.py helpers.
+
+database.py builds records (defaults, timestamps) and delegates the actual
+reads and writes to a StorageBackend:
+
+    SupabaseBackend — the hosted Postgres tables via supabase-py (production)
+    SQLiteBackend   — an embedded single-file database for tests, load tests
+                      and air-gapped demos
+
+Selected with RAPID_STORAGE_BACKEND=supabase|sqlite (default supabase);
+RAPID_SQLITE_PATH sets the SQLite file (default rapid.db, ":memory:" allowed).
+Rows are returned as plain dicts with the same shape Supabase returns.
+"""
+import json
+import sqlite3
+import threading
+from typing import Optional
+
+
+class StorageBackend:
+    """Interface every backend implements; method names mirror database.py."""
+
+    name = "base"
+
+    # ── gap_results ──
+    def save_gap_result(self, record: dict) -> dict:
+        raise NotImplementedError
+
+    def save_gap_results(self, records: list) -> list:
+        """Insert many gap results in one round trip."""
+        raise NotImplementedError
+
+    def get_results_by_engagement(self, engagement_id: str) -> list:
+        raise NotImplementedError
+
+    def get_gap_results_by_req_id(self, req_id: str, engagement_id: str) -> list:
+        raise NotImplementedError
+
+    def iter_gap_results(self, batch_size: int = 500):
+        """Yield every gap_results row in pages, keyset-paginated on id."""
+        raise NotImplementedError
+
+    def iter_results_since(self, engagement_id: str, after_id: int, batch_size: int = 500):
+        """Yield an engagement's gap_results rows with id > after_id, in id order, in pages."""
+        raise NotImplementedError
+
+    def update_gap_result(self, row_id, updates: dict) -> dict:
+        raise NotImplementedError
+
+    # ── requirements ──
+    def next_req_id(self, engagement_id: str) -> str:
+        raise NotImplementedError
+
+    def create_requirement(self, record: dict) -> dict:
+        """Insert a requirement; allocates record['req_id'] when it is missing."""
+        raise NotImplementedError
+
+    def create_requirements(self, records: list) -> list:
+        """Insert requirements of one engagement in one round trip.
+
+        Records without a req_id get a consecutive block of REQ ids, in order.
+        """
+        raise NotImplementedError
+
+    def get_requirements_by_engagement(self, engagement_id: str) -> list:
+        raise NotImplementedError
+
+    def iter_requirements(self, engagement_id: str, batch_size: int = 500):
+        """Yield an engagement's requirements in pages, keyset-paginated on id."""
+        raise NotImplementedError
+
+    def get_latest_results(self, engagement_id: str, req_ids: list) -> dict:
+        """req_id → newest gap_results row, for those of `req_ids` that have one."""
+        raise NotImplementedError
+
+    def get_requirement_by_id(self, req_id: str, engagement_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def update_requirement(self, req_id: str, engagement_id: str, updates: dict) -> dict:
+        raise NotImplementedError
+
+    def update_requirements(self, req_ids: list, engagement_id: str, updates: dict) -> list:
+        """Apply the same `updates` to many requirements of one engagement."""
+        raise NotImplementedError
+
+
+_REQ_DIGITS = 3
+
+
+def format_req_id(n: int) -> str:
+    return f"REQ-{n:0{_REQ_DIGITS}d}"
+
+
+def req_number(req_id: str) -> Optional[int]:
+    try:
+        return int(req_id.split("-")[1])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+# ── Supabase ─────────────────────────────────────────────────────────────────
+
+class SupabaseBackend(StorageBackend):
+    name = "supabase"
+
+    def __init__(self, client):
+        self.client = client
+
+    def save_gap_result(self, record: dict) -> dict:
+        response = self.client.table("gap_results").insert(record).execute()
+        return response.data[0] if response.data else {}
+
+    def save_gap_results(self, records: list) -> list:
+        if not records:
+            return []
+        response = self.client.table("gap_results").insert(records).execute()
+        return response.data or []
+
+    def get_results_by_engagement(self, engagement_id: str) -> list:
+        response = (
+            self.client.table("gap_results")
+            .select("*")
+            .eq("engagement_id", engagement_id)
+            .order("timestamp", desc=True)
+            .execute()
+        )
+        return response.data or []
+
+    def get_gap_results_by_req_id(self, req_id: str, engagement_id: str) -> list:
+        response = (
+            self.client.table("gap_results")
+            .select("*")
+            .eq("req_id", req_id)
+            .eq("engagement_id", engagement_id)
+            .order("timestamp", desc=True)
+            .execute()
+        )
+        return response.data or []
+
+    def iter_gap_results(self, batch_size: int = 500):
+        last_id = 0
+        while True:
+            response = (
+                self.client.table("gap_results")
+                .select("*")
+                .gt("id", last_id)
+                .order("id")
+                .limit(batch_size)
+                .execute()
+            )
+            rows = response.data or []
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1]["id"]
+
+    def iter_results_since(self, engagement_id: str, after_id: int, batch_size: int = 500):
+        while True:
+            response = (
+                self.client.table("gap_results")
+                .select("*")
+                .eq("engagement_id", engagement_id)
+                .gt("id", after_id)
+                .order("id")
+                .limit(batch_size)
+                .execute()
+            )
+            rows = response.data or []
+            if not rows:
+                return
+            yield rows
+            after_id = rows[-1]["id"]
+
+    def update_gap_result(self, row_id, updates: dict) -> dict:
+        response = self.client.table("gap_results").update(updates).eq("id", row_id).execute()
+        return response.data[0] if response.data else {}
+
+    def _req_ids_like(self, engagement_id: str, pattern: str, latest: bool = False) -> list:
+        query = (
+            self.client.table("requirements")
+            .select("req_id")
+            .eq("engagement_id", engagement_id)
+            .like("req_id", pattern)
+        )
+        if latest:
+            query = query.order("req_id", desc=True)
+        return query.limit(1).execute().data or []
+
+    def _max_req_number(self, engagement_id: str) -> int:
+        # REQ ids are zero-padded to _REQ_DIGITS, so text order is numeric order
+        # among ids of one width: find the widest, then its top id. A few
+        # single-row reads, however many requirements the engagement holds
+        width = _REQ_DIGITS
+        while self._req_ids_like(engagement_id, "REQ-" + "_" * (width + 1) + "%"):
+            width += 1
+        rows = self._req_ids_like(engagement_id, "REQ-" + "_" * width, latest=True)
+        return (req_number(rows[0]["req_id"]) or 0) if rows else 0
+
+    def next_req_id(self, engagement_id: str) -> str:
+        """Generate next sequential REQ-XXX id, unique within an engagement."""
+        return format_req_id(self._max_req_number(engagement_id) + 1)
+
+    def create_requirement(self, record: dict) -> dict:
+        if not record.get("req_id"):
+            record = {**record, "req_id": self.next_req_id(record["engagement_id"])}
+        response = self.client.table("requirements").insert(record).execute()
+        return response.data[0] if response.data else {}
+
+    def create_requirements(self, records: list) -> list:
+        if not records:
+            return []
+        n = None
+        numbered = []
+        for record in records:
+            if not record.get("req_id"):
+                if n is None:
+                    n = self._max_req_number(records[0]["engagement_id"]) + 1
+                record = {**record, "req_id": format_req_id(n)}
+                n += 1
+            numbered.append(record)
+        # A bulk insert sends one key set for all rows; missing=default gives a
+        # row's absent columns their column default (priority, confidence_score,
+        # sign_off_status) rather than null
+        response = self.client.table("requirements").insert(numbered, default_to_null=False).execute()
+        return response.data or []
+
+    def get_requirements_by_engagement(self, engagement_id: str) -> list:
+        response = (
+            self.client.table("requirements")
+            .select("*")
+            .eq("engagement_id", engagement_id)
+            .order("req_id")
+            .execute()
+        )
+        return response.data or []
+
+    def iter_requirements(self, engagement_id: str, batch_size: int = 500):
+        last_id = 0
+        while True:
+            response = (
+                self.client.table("requirements")
+                .select("*")
+                .eq("engagement_id", engagement_id)
+                .gt("id", last_id)
+                .order("id")
+                .limit(batch_size)
+                .execute()
+            )
+            rows = response.data or []
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1]["id"]
+
+    def get_latest_results(self, engagement_id: str, req_ids: list) -> dict:
+        if not req_ids:
+            return {}
+        response = (
+            self.client.table("gap_results")
+            .select("*")
+            .eq("engagement_id", engagement_id)
+            .in_("req_id", list(req_ids))
+            .order("timestamp", desc=True)
+            .execute()
+        )
+        latest = {}
+        for row in response.data or []:
+            latest.setdefault(row["req_id"], row)
+        return latest
+
+    def get_requirement_by_id(self, req_id: str, engagement_id: str) -> Optional[dict]:
+        response = (
+            self.client.table("requirements")
+            .select("*")
+            .eq("req_id", req_id)
+            .eq("engagement_id", engagement_id)
+            .limit(1)
+            .execute()
+        )
+        data = response.data or []
+        return data[0] if data else None
+
+    def update_requirement(self, req_id: str, engagement_id: str, updates: dict) -> dict:
+        response = (
+            self.client.table("requirements")
+            .update(updates)
+            .eq("req_id", req_id)
+            .eq("engagement_id", engagement_id)
+            .execute()
+        )
+        return response.data[0] if response.data else {}
+
+    def update_requirements(self, req_ids: list, engagement_id: str, updates: dict) -> list:
+        if not req_ids:
+            return []
+        response = (
+            self.client.table("requirements")
+            .update(updates)
+            .eq("engagement_id", engagement_id)
+            .in_("req_id", list(req_ids))
+            .execute()
+        )
+        return response.data or []
+
+
+# ── SQLite ───────────────────────────────────────────────────────────────────
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS requirements (
+    id                INTEGER PRIMARY KEY AUTOINCREMENT,
+    req_id            TEXT NOT NULL,
+    engagement_id     TEXT NOT NULL,
+    title             TEXT NOT NULL,
+    description       TEXT NOT NULL,
+    source_type       TEXT,
+    tags              TEXT,
+    stakeholder       TEXT,
+    raw_input         TEXT,
+    status            TEXT DEFAULT 'open',
+    created_at        TEXT,
+    business_process  TEXT,
+    priority          TEXT DEFAULT 'Must-Have',
+    category          TEXT,
+    kpi_impact        TEXT,
+    confidence_score  REAL DEFAULT 0.8,
+    current_state_ref TEXT,
+    actors            TEXT,
+    shadow_tools      TEXT,
+    sign_off_status   TEXT DEFAULT 'draft',
+    sign_off_by       TEXT,
+    sign_off_at       TEXT,
+    sap_mapping_id    TEXT,
+    fit_assessment    TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_requirements_engagement_req
+    ON requirements (engagement_id, req_id);
+
+CREATE TABLE IF NOT EXISTS gap_results (
+    id                  INTEGER PRIMARY KEY AUTOINCREMENT,
+    engagement_id       TEXT NOT NULL,
+    req_id              TEXT,
+    process_description TEXT,
+    matches             TEXT,
+    tokens_used         INTEGER,
+    timestamp           TEXT NOT NULL
+);
+-- timestamp is a trailing column so per-requirement history needs no sort;
+-- without it the planner prefers the timestamp index and scans the engagement
+CREATE INDEX IF NOT EXISTS idx_gap_results_engagement_req
+    ON gap_results (engagement_id, req_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_gap_results_engagement_timestamp
+    ON gap_results (engagement_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_gap_results_engagement_id
+    ON gap_results (engagement_id, id);
+"""
+
+# Columns stored as JSON text (jsonb / text[] in Supabase)
+_JSON_COLUMNS = {"tags", "kpi_impact", "actors", "shadow_tools", "matches"}
+
+
+class SQLiteBackend(StorageBackend):
+    name = "sqlite"
+
+    def __init__(self, path: str = "rapid.db"):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SQLITE_SCHEMA)
+            self._columns = {
+                table: {row["name"] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+                for table in ("requirements", "gap_results")
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ── helpers ──
+    def _encode(self, table: str, record: dict) -> dict:
+        unknown = set(record) - self._columns[table]
+        if unknown:
+            raise ValueError(f"Unknown column(s) for {table}: {', '.join(sorted(unknown))}")
+        return {k: json.dumps(v) if k in _JSON_COLUMNS and v is not None else v for k, v in record.items()}
+
+    @staticmethod
+    def _decode(row: sqlite3.Row) -> dict:
+        out = dict(row)
+        for key in _JSON_COLUMNS & out.keys():
+            if out[key] is not None:
+                out[key] = json.loads(out[key])
+        return out
+
+    def _insert(self, table: str, record: dict) -> dict:
+        encoded = self._encode(table, record)
+        columns = ", ".join(encoded)
+        placeholders = ", ".join("?" for _ in encoded)
+        cur = self._conn.execute(
+            f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", tuple(encoded.values())
+        )
+        row = self._conn.execute(f"SELECT * FROM {table} WHERE id = ?", (cur.lastrowid,)).fetchone()
+        return self._decode(row)
+
+    def _select(self, sql: str, params: tuple) -> list:
+        with self._lock:
+            return [self._decode(r) for r in self._conn.execute(sql, params).fetchall()]
+
+    # ── gap_results ──
+    def save_gap_result(self, record: dict) -> dict:
+        with self._lock:
+            return self._insert("gap_results", record)
+
+    def save_gap_results(self, records: list) -> list:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = [self._insert("gap_results", record) for record in records]
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return rows
+
+    def get_results_by_engagement(self, engagement_id: str) -> list:
+        return self._select(
+            "SELECT * FROM gap_results WHERE engagement_id = ? ORDER BY timestamp DESC",
+            (engagement_id,),
+        )
+
+    def get_gap_results_by_req_id(self, req_id: str, engagement_id: str) -> list:
+        return self._select(
+            "SELECT * FROM gap_results WHERE engagement_id = ? AND req_id = ? ORDER BY timestamp DESC",
+            (engagement_id, req_id),
+        )
+
+    def iter_gap_results(self, batch_size: int = 500):
+        last_id = 0
+        while True:
+            rows = self._select(
+                "SELECT * FROM gap_results WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+            )
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1]["id"]
+
+    def iter_results_since(self, engagement_id: str, after_id: int, batch_size: int = 500):
+        while True:
+            rows = self._select(
+                "SELECT * FROM gap_results WHERE engagement_id = ? AND id > ? ORDER BY id LIMIT ?",
+                (engagement_id, after_id, batch_size),
+            )
+            if not rows:
+                return
+            yield rows
+            after_id = rows[-1]["id"]
+
+    def update_gap_result(self, row_id, updates: dict) -> dict:
+        encoded = self._encode("gap_results", updates)
+        assignments = ", ".join(f"{column} = ?" for column in encoded)
+        with self._lock:
+            self._conn.execute(f"UPDATE gap_results SET {assignments} WHERE id = ?", (*encoded.values(), row_id))
+            row = self._conn.execute("SELECT * FROM gap_results WHERE id = ?", (row_id,)).fetchone()
+        return self._decode(row) if row else {}
+
+    # ── requirements ──
+    def _max_req_number(self, engagement_id: str) -> int:
+        row = self._conn.execute(
+            "SELECT MAX(CAST(substr(req_id, 5) AS INTEGER)) FROM requirements "
+            "WHERE engagement_id = ? AND req_id LIKE 'REQ-%'",
+            (engagement_id,),
+        ).fetchone()
+        return row[0] or 0
+
+    def next_req_id(self, engagement_id: str) -> str:
+        with self._lock:
+            return format_req_id(self._max_req_number(engagement_id) + 1)
+
+    def create_requirement(self, record: dict) -> dict:
+        with self._lock:
+            # Allocation and insert share one transaction, so ids never collide
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if not record.get("req_id"):
+                    record = {**record, "req_id": format_req_id(self._max_req_number(record["engagement_id"]) + 1)}
+                row = self._insert("requirements", record)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return row
+
+    def create_requirements(self, records: list) -> list:
+        if not records:
+            return []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                n = None
+                rows = []
+                for record in records:
+                    if not record.get("req_id"):
+                        if n is None:
+                            n = self._max_req_number(records[0]["engagement_id"]) + 1
+                        record = {**record, "req_id": format_req_id(n)}
+                        n += 1
+                    rows.append(self._insert("requirements", record))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return rows
+
+    def get_requirements_by_engagement(self, engagement_id: str) -> list:
+        return self._select(
+            "SELECT * FROM requirements WHERE engagement_id = ? ORDER BY req_id",
+            (engagement_id,),
+        )
+
+    def iter_requirements(self, engagement_id: str, batch_size: int = 500):
+        last_id = 0
+        while True:
+            rows = self._select(
+                "SELECT * FROM requirements WHERE engagement_id = ? AND id > ? ORDER BY id LIMIT ?",
+                (engagement_id, last_id, batch_size),
+            )
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1]["id"]
+
+    def get_latest_results(self, engagement_id: str, req_ids: list) -> dict:
+        if not req_ids:
+            return {}
+        placeholders = ", ".join("?" for _ in req_ids)
+        # Each MAX(timestamp) is a seek on idx_gap_results_engagement_req
+        rows = self._select(
+            f"SELECT g.* FROM gap_results g WHERE g.engagement_id = ? AND g.req_id IN ({placeholders}) "
+            "AND g.timestamp = (SELECT MAX(timestamp) FROM gap_results "
+            "WHERE engagement_id = g.engagement_id AND req_id = g.req_id) ORDER BY g.id DESC",
+            (engagement_id, *req_ids),
+        )
+        latest = {}
+        for row in rows:
+            latest.setdefault(row["req_id"], row)
+        return latest
+
+    def get_requirement_by_id(self, req_id: str, engagement_id: str) -> Optional[dict]:
+        rows = self._select(
+            "SELECT * FROM requirements WHERE engagement_id = ? AND req_id = ? LIMIT 1",
+            (engagement_id, req_id),
+        )
+        return rows[0] if rows else None
+
+    def update_requirement(self, req_id: str, engagement_id: str, updates: dict) -> dict:
+        encoded = self._encode("requirements", updates)
+        assignments = ", ".join(f"{column} = ?" for column in encoded)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE requirements SET {assignments} WHERE engagement_id = ? AND req_id = ?",
+                (*encoded.values(), engagement_id, req_id),
+            )
+            row = self._conn.execute(
+                "SELECT * FROM requirements WHERE engagement_id = ? AND req_id = ?",
+                (engagement_id, req_id),
+            ).fetchone()
+        return self._decode(row) if row else {}
+
+    def update_requirements(self, req_ids: list, engagement_id: str, updates: dict) -> list:
+        if not req_ids:
+            return []
+        encoded = self._encode("requirements", updates)
+        assignments = ", ".join(f"{column} = ?" for column in encoded)
+        placeholders = ", ".join("?" for _ in req_ids)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE requirements SET {assignments} WHERE engagement_id = ? AND req_id IN ({placeholders})",
+                (*encoded.values(), engagement_id, *req_ids),
+            )
+            rows = self._conn.execute(
+                f"SELECT * FROM requirements WHERE engagement_id = ? AND req_id IN ({placeholders}) ORDER BY req_id",
+                (engagement_id, *req_ids),
+            ).fetchall()
+        return [self._decode(r) for r in rows]
+
+
+def create_backend(kind: str, supabase_client=None, sqlite_path: str = "rapid.db") -> StorageBackend:
+    kind = (kind or "supabase").lower()
+    if kind == "sqlite":
+        return SQLiteBackend(sqlite_path)
+    if kind == "supabase":
+        return SupabaseBackend(supabase_client)
+    raise ValueError(f"Unknown storage backend '{kind}'. Valid options: supabase, sqlite")
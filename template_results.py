@@ -0,0 +1,111 @@
+"""
+Precomputed gap matches for the domain templates.
+
+Template descriptions are fixed, so their gap analysis only changes when the
+catalogue or the gap prompt does. `python cli.py precompute-templates`
+computes them once and writes RAPID_TEMPLATE_RESULTS_PATH (default
+template_results.json next to this file):
+
+    {"catalogue_version": "2602-…", "prompt_version": "…", "generated_at": "…",
+     "results": {"<sha256 of description>": [compact matches], …}}
+
+The file is only used while both versions match the running code:
+CATALOGUE_VERSION hashes SCOPE_ITEMS, and the gap_analysis prompt version
+hashes its system prompt and tool. Editing either makes the file stale. It is
+then ignored (and reported on load) until precompute-templates runs again.
+
+No results file is committed: until precompute-templates has run in a
+deployment, each template's first analysis calls the LLM and is cached in
+shared_state for RAPID_TEMPLATE_RESULT_TTL_S.
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+PATH = os.getenv(
+    "RAPID_TEMPLATE_RESULTS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "template_results.json"),
+)
+
+# (file mtime, catalogue version, prompt version, results) of the last load
+_loaded: Optional[tuple] = None
+_load_lock = threading.Lock()
+
+
+def description_key(description: str) -> str:
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+def read(path: str = None) -> Optional[dict]:
+    """The stored file as written, or None when it is missing or unreadable."""
+    try:
+        with open(path or PATH) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Template results file unreadable (ignored): {e}")
+        return None
+
+
+def write(results: Dict[str, list], catalogue_version: str, prompt_version: str, path: str = None):
+    """Replace the file atomically, so workers never read a half-written one."""
+    path = path or PATH
+    data = {
+        "catalogue_version": catalogue_version,
+        "prompt_version": prompt_version,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "results": results,
+    }
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, sort_keys=True)
+    os.replace(tmp, path)
+    reset()
+
+
+def mtime(path: str = None) -> int:
+    """Modification time of the file in ns, or 0 when there is none."""
+    try:
+        return os.stat(path or PATH).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _is_current(data: Optional[dict], catalogue_version: str, prompt_version: str) -> bool:
+    return bool(data) and (data.get("catalogue_version"), data.get("prompt_version")) == (
+        catalogue_version, prompt_version
+    )
+
+
+def current(catalogue_version: str, prompt_version: str, path: str = None) -> Dict[str, list]:
+    """description key → compact matches, or {} if the file is missing or stale."""
+    data = read(path)
+    return (data.get("results") or {}) if _is_current(data, catalogue_version, prompt_version) else {}
+
+
+def load(catalogue_version: str, prompt_version: str) -> Dict[str, list]:
+    """current() for the default path; re-read only when the file's mtime
+    (or the requested versions) change, so a precompute run reaches every worker."""
+    global _loaded
+    key = (mtime(), catalogue_version, prompt_version)
+    loaded = _loaded
+    if loaded is None or loaded[:3] != key:
+        with _load_lock:
+            loaded = _loaded
+            if loaded is None or loaded[:3] != key:
+                data = read()
+                if data and not _is_current(data, catalogue_version, prompt_version):
+                    print("Template results file is stale for this catalogue/prompt; run cli.py precompute-templates")
+                    data = None
+                loaded = _loaded = key + ((data or {}).get("results") or {},)
+    return loaded[3]
+
+
+def reset():
+    global _loaded
+    with _load_lock:
+        _loaded = None
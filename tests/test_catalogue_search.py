@@ -0,0 +1,64 @@
+"""
+pytest tests for the catalogue inverted index and GET /catalogue/search.
+"""
+import sys
+import os
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import catalogue_search  # noqa: E402
+from catalogue_search import CatalogueIndex, edit_distance, get_index  # noqa: E402
+from main import app  # noqa: E402
+
+
+def _ids(result: dict) -> list:
+    return [item["id"] for item in result["items"]]
+
+
+class TestIndex:
+    def test_exact_name_ranks_first(self):
+        assert _ids(get_index().search("accounts payable"))[0] == "J45"
+
+    def test_id_lookup(self):
+        assert _ids(get_index().search("j45")) == ["J45"]
+
+    def test_prefix_and_typo_tolerance(self):
+        assert "J58" in _ids(get_index().search("gener ledg"))
+        assert "J45" in _ids(get_index().search("acounts payabel"))
+
+    def test_items_matching_more_tokens_rank_higher(self):
+        index = CatalogueIndex([
+            {"id": "A", "name": "Bank statement", "lob": "Finance", "process_group": "Cash", "description": ""},
+            {"id": "B", "name": "Bank", "lob": "Finance", "process_group": "Cash",
+             "description": "bank bank bank", "keywords": ["bank"]},
+        ])
+        assert _ids(index.search("bank statement")) == ["A", "B"]
+
+    def test_filters_and_empty_query(self):
+        result = get_index().search("", lob="finance", limit=5)
+        assert len(result["items"]) == 5
+        assert result["total"] == len([i for i in get_index().items if i["lob"] == "Finance"])
+        assert all(i["lob"] == "Finance" for i in get_index().search("invoice", lob="Finance")["items"])
+        assert get_index().search("invoice", lob="No Such LOB")["total"] == 0
+
+    def test_edit_distance(self):
+        assert edit_distance("invoice", "invioce", 2) == 1
+        assert edit_distance("ledger", "leger", 1) == 1
+        assert edit_distance("ledger", "budget", 2) > 2
+
+
+class TestEndpoint:
+    def test_search_returns_ranked_items_with_scores(self):
+        resp = TestClient(app).get("/catalogue/search?q=invioce&limit=3")
+        assert resp.status_code == 200
+        body = resp.json()
+        assert len(body["items"]) == 3
+        scores = [i["score"] for i in body["items"]]
+        assert scores == sorted(scores, reverse=True)
+
+    def test_limit_is_clamped_and_etag_sent(self):
+        resp = TestClient(app).get("/catalogue/search?q=a&limit=100000")
+        assert len(resp.json()["items"]) <= catalogue_search.MAX_LIMIT
+        assert "etag" in resp.headers
@@ -0,0 +1,82 @@
+"""
+pytest tests for compact gap-result matches: write-time compaction,
+read-time enrichment, /results?compact=true and the migration command.
+"""
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cli  # noqa: E402
+from main import app  # noqa: E402
+from scope_items import CATALOGUE_RELEASE, compact_matches, expand_matches  # noqa: E402
+from storage import SQLiteBackend  # noqa: E402
+
+LEGACY_MATCH = {
+    "id": "J45", "name": "Accounts Payable", "lob": "Finance", "process_group": "Accounts Payable",
+    "description": "Supplier invoices", "confidence": "HIGH", "rationale": "AP", "migration_objects": [],
+}
+
+
+class TestCompaction:
+    def test_compact_keeps_decision_fields_only(self):
+        compact = compact_matches([LEGACY_MATCH, {**LEGACY_MATCH, "id": "BD9", "confidence": "LOW"}])
+        assert compact[0] == {
+            "id": "J45", "confidence": "HIGH", "rationale": "AP",
+            "rank": 1, "score": 0.9, "catalogue_release": CATALOGUE_RELEASE,
+        }
+        assert compact[1]["rank"] == 2
+
+    def test_expand_joins_catalogue(self):
+        expanded = expand_matches(compact_matches([LEGACY_MATCH]))[0]
+        assert expanded["name"] == "Accounts Payable"
+        assert expanded["lob"] == "Finance"
+        assert expanded["rationale"] == "AP"
+
+    def test_legacy_rows_pass_through(self):
+        assert expand_matches([LEGACY_MATCH]) == [LEGACY_MATCH]
+
+
+class TestEndpoints:
+    def test_gap_analysis_persists_compact_matches(self):
+        provider = MagicMock()
+        provider.complete.return_value = {
+            "content": "", "data": {"matches": [{"id": "J45", "confidence": "HIGH", "rationale": "AP"}]},
+            "tokens_used": 10,
+        }
+        with patch("main.get_provider", return_value=provider), patch("main.save_gap_analysis") as save:
+            resp = TestClient(app).post("/gap-analysis", json={"engagement_id": "eng-1", "process_description": "AP"})
+        assert resp.json()["matches"][0]["name"] == "Accounts Payable"
+        stored = save.call_args.kwargs["matches"][0]
+        assert "name" not in stored and stored["rank"] == 1
+
+    def test_results_expanded_unless_compact(self):
+        rows = [{"id": 1, "engagement_id": "eng-1", "matches": compact_matches([LEGACY_MATCH])}]
+        with patch("main.get_results_by_engagement", return_value=rows):
+            client = TestClient(app)
+            full = client.get("/results?engagement_id=eng-1").json()
+            compact = client.get("/results?engagement_id=eng-1&compact=true").json()
+        assert full["results"][0]["matches"][0]["name"] == "Accounts Payable"
+        assert "name" not in compact["results"][0]["matches"][0]
+
+
+class TestMigration:
+    def test_converts_legacy_rows_once(self):
+        backend = SQLiteBackend(":memory:")
+        for i in range(3):
+            backend.save_gap_result({
+                "engagement_id": "eng-1", "req_id": f"REQ-00{i}", "matches": [LEGACY_MATCH],
+                "timestamp": "2026-01-01T00:00:00",
+            })
+        dry = cli.migrate_compact_matches(backend, dry_run=True, batch_size=2)
+        assert dry["converted"] == 3
+        assert "name" in backend.get_results_by_engagement("eng-1")[0]["matches"][0]
+
+        stats = cli.migrate_compact_matches(backend, batch_size=2)
+        assert stats["scanned"] == 3 and stats["converted"] == 3
+        assert stats["bytes_after"] < stats["bytes_before"]
+        assert "name" not in backend.get_results_by_engagement("eng-1")[0]["matches"][0]
+        assert cli.migrate_compact_matches(backend)["converted"] == 0
@@ -0,0 +1,151 @@
+"""
+pytest tests for near-duplicate requirement detection (MinHash LSH), the
+/duplicates endpoint and result reuse in analyse-all.
+"""
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dedup_index  # noqa: E402
+from dedup_index import DuplicateIndex  # noqa: E402
+from main import app  # noqa: E402
+
+INVOICE = "Three-way match for supplier invoices against purchase orders and goods receipts before payment."
+INVOICE_EDIT = "Three-way matching of supplier invoices against purchase orders and goods receipts before payment"
+PAYROLL = "Run monthly payroll for salaried employees including tax withholding and pension deductions."
+
+
+def _req(req_id, description, status="open", title="Requirement"):
+    return {"req_id": req_id, "engagement_id": "eng-1", "title": title, "description": description, "status": status}
+
+
+@pytest.fixture(autouse=True)
+def fresh_index():
+    index = DuplicateIndex()
+    with patch("dedup_index._index", index):
+        yield index
+
+
+class TestIndex:
+    def test_minor_edit_is_a_duplicate_and_unrelated_text_is_not(self, fresh_index):
+        fresh_index.sync("eng-1", [_req("REQ-001", INVOICE), _req("REQ-002", INVOICE_EDIT), _req("REQ-003", PAYROLL)])
+        dupes = fresh_index.duplicates_of("eng-1", "REQ-001")
+        assert [rid for rid, _ in dupes] == ["REQ-002"]
+        assert dupes[0][1] >= fresh_index.threshold
+        assert fresh_index.duplicates_of("eng-1", "REQ-003") == []
+
+    def test_engagements_are_indexed_separately(self, fresh_index):
+        fresh_index.sync("eng-1", [_req("REQ-001", INVOICE)])
+        fresh_index.sync("eng-2", [_req("REQ-001", INVOICE_EDIT)])
+        assert fresh_index.duplicates_of("eng-1", "REQ-001") == []
+
+    def test_sync_drops_deleted_and_reindexes_edited_rows(self, fresh_index):
+        fresh_index.sync("eng-1", [_req("REQ-001", INVOICE), _req("REQ-002", INVOICE_EDIT)])
+        fresh_index.sync("eng-1", [_req("REQ-001", INVOICE), _req("REQ-002", PAYROLL)])
+        assert fresh_index.duplicates_of("eng-1", "REQ-001") == []
+        fresh_index.sync("eng-1", [_req("REQ-002", INVOICE)])
+        assert fresh_index.groups("eng-1") == []
+
+    def test_observe_indexes_writes_for_synced_engagements_only(self, fresh_index):
+        fresh_index.observe(_req("REQ-009", INVOICE))
+        assert fresh_index.groups("eng-1") == []
+        fresh_index.sync("eng-1", [_req("REQ-001", INVOICE)])
+        fresh_index.observe(_req("REQ-002", INVOICE_EDIT))
+        assert fresh_index.groups("eng-1")[0]["req_ids"] == ["REQ-001", "REQ-002"]
+
+    def test_groups_are_transitive(self, fresh_index):
+        fresh_index.sync("eng-1", [
+            _req("REQ-003", INVOICE_EDIT), _req("REQ-001", INVOICE), _req("REQ-002", INVOICE + " Urgent."),
+            _req("REQ-004", PAYROLL),
+        ])
+        groups = fresh_index.groups("eng-1")
+        assert len(groups) == 1
+        assert groups[0]["req_ids"] == ["REQ-001", "REQ-002", "REQ-003"]
+        assert 0 < groups[0]["min_similarity"] <= 1
+
+    def test_req_ids_sort_numerically(self, fresh_index):
+        fresh_index.sync("eng-1", [
+            _req("REQ-1000", INVOICE), _req("REQ-999", INVOICE_EDIT), _req("REQ-1001", PAYROLL),
+            _req("REQ-1002", PAYROLL + " Monthly."),
+        ])
+        assert [g["req_ids"] for g in fresh_index.groups("eng-1")] == [["REQ-999", "REQ-1000"], ["REQ-1001", "REQ-1002"]]
+
+    def test_least_recently_used_engagement_is_dropped(self):
+        index = DuplicateIndex(max_engagements=1)
+        index.sync("eng-1", [_req("REQ-001", INVOICE), _req("REQ-002", INVOICE_EDIT)])
+        index.sync("eng-2", [_req("REQ-001", PAYROLL)])
+        assert index.duplicates_of("eng-1", "REQ-001") == []
+
+
+class TestEndpoints:
+    def test_duplicates_endpoint_lists_groups(self):
+        reqs = [_req("REQ-001", INVOICE), _req("REQ-002", INVOICE_EDIT, status="analysed"), _req("REQ-003", PAYROLL)]
+        with patch("main.get_requirements_by_engagement", return_value=reqs):
+            body = TestClient(app).get("/engagement/eng-1/duplicates").json()
+        assert body["duplicate_groups"] == 1 and body["redundant_requirements"] == 1
+        group = body["groups"][0]
+        assert group["canonical"] == "REQ-001"
+        assert [r["status"] for r in group["requirements"]] == ["open", "analysed"]
+
+    def test_analyse_all_reuses_results_of_duplicates(self):
+        provider = MagicMock()
+        provider.complete.return_value = {
+            "data": {"matches": [{"id": "J45", "confidence": "HIGH", "rationale": "3-way match"}]}, "tokens_used": 10,
+        }
+        reqs = [_req("REQ-001", INVOICE), _req("REQ-002", INVOICE_EDIT), _req("REQ-003", PAYROLL)]
+        with (
+            patch("main.get_requirements_by_engagement", return_value=reqs),
+            patch("main.get_provider", return_value=provider),
+            patch("keyword_rules.ENABLED", False),
+            patch("main.save_gap_analysis") as save,
+            patch("main.update_requirement"),
+        ):
+            body = TestClient(app).post("/engagement/eng-1/analyse-all").json()
+        assert provider.complete.call_count == 2
+        by_id = {r["req_id"]: r for r in body["results"]}
+        assert by_id["REQ-002"]["reused_from"] == "REQ-001"
+        assert by_id["REQ-002"]["top_match_id"] == "J45"
+        assert by_id["REQ-003"]["reused_from"] is None
+        reused = next(c.kwargs for c in save.call_args_list if c.kwargs["req_id"] == "REQ-002")
+        assert reused["tokens_used"] == 0
+
+    def test_analyse_all_reuses_stored_result_of_analysed_duplicate(self):
+        provider = MagicMock()
+        reqs = [_req("REQ-001", INVOICE, status="analysed"), _req("REQ-002", INVOICE_EDIT)]
+        stored = [{"req_id": "REQ-001", "matches": [{"id": "J45", "confidence": "HIGH", "rationale": "3-way match"}]}]
+        with (
+            patch("main.get_requirements_by_engagement", return_value=reqs),
+            patch("main.get_results_by_engagement", return_value=stored),
+            patch("main.get_provider", return_value=provider),
+            patch("main.save_gap_analysis"),
+            patch("main.update_requirement"),
+        ):
+            body = TestClient(app).post("/engagement/eng-1/analyse-all").json()
+        provider.complete.assert_not_called()
+        assert body["results"][0]["reused_from"] == "REQ-001"
+        assert body["results"][0]["top_match_id"] == "J45"
+
+    def test_reuse_can_be_switched_off(self):
+        provider = MagicMock()
+        provider.complete.return_value = {"data": {"matches": []}, "tokens_used": 10}
+        reqs = [_req("REQ-001", INVOICE), _req("REQ-002", INVOICE_EDIT)]
+        with (
+            patch("main.REUSE_DUPLICATE_RESULTS", False),
+            patch("main.get_requirements_by_engagement", return_value=reqs),
+            patch("main.get_provider", return_value=provider),
+            patch("keyword_rules.ENABLED", False),
+            patch("main.save_gap_analysis"),
+            patch("main.update_requirement"),
+        ):
+            TestClient(app).post("/engagement/eng-1/analyse-all")
+        assert provider.complete.call_count == 2
+
+
+def test_get_index_is_a_singleton():
+    with patch("dedup_index._index", None):
+        assert dedup_index.get_index() is dedup_index.get_index()
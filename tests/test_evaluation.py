@@ -0,0 +1,53 @@
+"""
+Recall guard for gap-analysis matching modes.
+Runs the golden dataset offline against recorded provider outputs.
+"""
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.evaluate import MODES, evaluate_mode, load_golden, recall_at, reciprocal_rank  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def cases():
+    return load_golden()
+
+
+class TestScoring:
+    def test_recall_at(self):
+        assert recall_at(["A", "B", "C"], ["B", "X"], 1) == 0.0
+        assert recall_at(["A", "B", "C"], ["B", "X"], 3) == 0.5
+
+    def test_reciprocal_rank(self):
+        assert reciprocal_rank(["A", "B"], ["B"]) == 0.5
+        assert reciprocal_rank(["A"], ["Z"]) == 0.0
+
+
+class TestModes:
+    @pytest.mark.parametrize("mode", list(MODES))
+    def test_mode_runs_without_failures(self, cases, mode):
+        report = evaluate_mode(mode, cases, k=5)
+        assert report["failures"] == []
+        assert report["cases"] == len(cases)
+
+    def test_full_catalogue_recall_floor(self, cases):
+        report = evaluate_mode("full_catalogue", cases, k=5)
+        assert report["recall"]["@5"] >= 0.95
+        assert report["mrr"] >= 0.9
+
+    def test_lob_filter_trades_tokens_for_recall(self, cases):
+        full = evaluate_mode("full_catalogue", cases, k=5)
+        lob = evaluate_mode("lob_filter", cases, k=5)
+        assert lob["tokens_per_requirement"] < full["tokens_per_requirement"]
+        assert lob["recall"]["@5"] <= full["recall"]["@5"]
+
+    def test_keyword_rules_skip_llm_for_decisive_cases(self, cases):
+        full = evaluate_mode("full_catalogue", cases, k=5)
+        rules = evaluate_mode("keyword_rules", cases, k=5)
+        assert rules["llm_call_rate"] < 1.0
+        assert rules["tokens_per_requirement"] < full["tokens_per_requirement"]
+        assert rules["recall"]["@5"] >= 0.9
@@ -0,0 +1,116 @@
+"""
+pytest tests for the streaming fit-gap matrix export.
+"""
+import sys
+import os
+import csv
+import io
+import json
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import gap_export  # noqa: E402
+from main import app  # noqa: E402
+from storage import SQLiteBackend  # noqa: E402
+
+URL = "/engagement/eng-1/export"
+
+
+@pytest.fixture
+def backend():
+    b = SQLiteBackend(":memory:")
+    for title in ("Invoice approval", "Vendor onboarding", "Payroll"):
+        b.create_requirement({"engagement_id": "eng-1", "title": title, "description": title, "status": "open"})
+    b.save_gap_result({
+        "engagement_id": "eng-1", "req_id": "REQ-001", "timestamp": "2026-03-01T10:00:00",
+        "matches": [{"id": "J58", "confidence": "LOW", "rationale": "old"}],
+    })
+    b.save_gap_result({
+        "engagement_id": "eng-1", "req_id": "REQ-001", "timestamp": "2026-03-02T10:00:00",
+        "matches": [
+            {"id": "J58", "confidence": "HIGH", "rationale": "GL"},
+            {"id": "J77", "confidence": "MEDIUM", "rationale": "Group"},
+        ],
+    })
+    b.save_gap_result({"engagement_id": "eng-1", "req_id": "REQ-002", "timestamp": "2026-03-02T10:00:00", "matches": []})
+    with patch.object(database, "_backend", b):
+        yield b
+    b.close()
+
+
+def _csv(resp):
+    return list(csv.DictReader(io.StringIO(resp.content.decode("utf-8-sig"))))
+
+
+class TestExport:
+    def test_csv_matrix_uses_latest_result(self, backend):
+        resp = TestClient(app).get(URL)
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/csv")
+        assert 'filename="eng-1-fit-gap.csv"' in resp.headers["content-disposition"]
+        rows = _csv(resp)
+        assert [(r["req_id"], r["rank"], r["scope_item_id"]) for r in rows] == [
+            ("REQ-001", "1", "J58"), ("REQ-001", "2", "J77"), ("REQ-002", "", ""), ("REQ-003", "", ""),
+        ]
+        assert rows[0]["confidence"] == "HIGH"
+        assert rows[0]["migration_objects"] == "G/L account balance; G/L open items"
+        assert rows[0]["analysed_at"] == "2026-03-02T10:00:00"
+
+    def test_ndjson_is_paged_and_limited_to_top(self, backend):
+        with patch("main.EXPORT_PAGE_SIZE", 1), patch("main.get_latest_results", wraps=database.get_latest_results) as latest:
+            resp = TestClient(app).get(URL, params={"format": "ndjson", "top": 1})
+        rows = [json.loads(line) for line in resp.text.splitlines()]
+        assert [r["req_id"] for r in rows] == ["REQ-001", "REQ-002", "REQ-003"]
+        assert rows[0]["scope_item_name"]
+        assert latest.call_count == 3
+
+    def test_unknown_format_and_storage_failure(self, backend):
+        assert TestClient(app).get(URL, params={"format": "pdf"}).status_code == 400
+        with patch("main.iter_requirements", side_effect=RuntimeError("db down")):
+            assert TestClient(app).get(URL).status_code == 500
+
+    def test_top_is_bounded(self, backend):
+        client = TestClient(app)
+        for top in (0, -1, 21):
+            assert client.get(URL, params={"top": top}).status_code == 422
+
+    def test_formula_cells_are_neutralised(self, backend):
+        backend.create_requirement({
+            "engagement_id": "eng-1", "title": '=HYPERLINK("http://x","y")', "description": "d", "status": "open",
+            "business_process": "@SUM(A1)", "category": "-1+1",
+        })
+        row = _csv(TestClient(app).get(URL))[-1]
+        assert row["title"] == '\'=HYPERLINK("http://x","y")'
+        assert (row["business_process"], row["category"]) == ("'@SUM(A1)", "'-1+1")
+        assert _csv(TestClient(app).get(URL))[0]["title"] == "Invoice approval"
+        ndjson = TestClient(app).get(URL, params={"format": "ndjson"}).text.splitlines()[-1]
+        assert json.loads(ndjson)["title"].startswith("=")
+
+    def test_xlsx_needs_openpyxl(self, backend):
+        with patch("gap_export.openpyxl", None):
+            assert TestClient(app).get(URL, params={"format": "xlsx"}).status_code == 400
+
+    def test_xlsx_round_trip(self, backend):
+        openpyxl = pytest.importorskip("openpyxl")
+        resp = TestClient(app).get(URL, params={"format": "xlsx"})
+        sheet = openpyxl.load_workbook(io.BytesIO(resp.content)).active
+        values = list(sheet.values)
+        assert values[0] == gap_export.COLUMNS
+        assert len(values) == 5
+
+    def test_xlsx_formula_cells_stay_text(self, backend):
+        openpyxl = pytest.importorskip("openpyxl")
+        backend.create_requirement({"engagement_id": "eng-1", "title": "=1+1", "description": "d", "status": "open"})
+        resp = TestClient(app).get(URL, params={"format": "xlsx"})
+        cell = list(openpyxl.load_workbook(io.BytesIO(resp.content)).active.values)[-1][1]
+        assert cell == "'=1+1"
+
+
+def test_csv_header_only_for_empty_engagement():
+    chunks = list(gap_export.csv_chunks(gap_export.matrix_rows(iter([]), lambda ids: {})))
+    assert b"".join(chunks).decode("utf-8-sig").strip() == ",".join(gap_export.COLUMNS)
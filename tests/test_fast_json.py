@@ -0,0 +1,79 @@
+"""
+pytest tests for the opt-in orjson fast path (RAPID_FAST_JSON=1) and its
+fallback when orjson is not installed.
+"""
+import sys
+import os
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fast_json  # noqa: E402
+import main  # noqa: E402
+from main import RequirementResponse, ScopeItemMatch, app  # noqa: E402
+from scope_items import compact_matches  # noqa: E402
+
+ROWS = [
+    {
+        "id": 7, "req_id": "REQ-001", "engagement_id": "eng-1", "title": "T", "description": "D",
+        "status": "open", "tags": ["pain_point"], "kpi_impact": {"metric": "DSO"}, "created_at": "2026-01-01",
+    },
+    {"id": 8, "req_id": "REQ-002", "engagement_id": "eng-1", "title": "T2", "description": "D2", "status": "open"},
+]
+
+
+def _get(path: str, enabled: bool, **patches):
+    with patch("fast_json.ENABLED", enabled), patch.multiple("main", **patches):
+        return TestClient(app).get(path, headers={"Accept-Encoding": "identity"})
+
+
+class TestFastPath:
+    def test_requirements_listing_matches_validated_output(self):
+        slow = _get("/requirements?engagement_id=eng-1", False, get_requirements_by_engagement=lambda e: ROWS)
+        fast = _get("/requirements?engagement_id=eng-1", True, get_requirements_by_engagement=lambda e: ROWS)
+        assert fast.headers["content-type"] == "application/json"
+        assert fast.json() == slow.json()
+        assert "id" not in fast.json()[0]
+        assert fast.json()[1]["tags"] == []
+
+    def test_results_and_catalogue_match(self):
+        rows = [{"id": 1, "engagement_id": "eng-1", "matches": compact_matches([{"id": "J45", "confidence": "HIGH"}])}]
+        for path in ("/results?engagement_id=eng-1", "/catalogue", "/catalogue?lob=Finance"):
+            slow = _get(path, False, get_results_by_engagement=lambda e: rows)
+            fast = _get(path, True, get_results_by_engagement=lambda e: rows)
+            assert fast.json() == slow.json(), path
+
+    def test_project_fills_defaults_without_validating(self):
+        projected = fast_json.project([{"req_id": "REQ-001", "confidence_score": "n/a"}], RequirementResponse)
+        assert projected[0]["tags"] == []
+        assert projected[0]["confidence_score"] == "n/a"
+        assert set(projected[0]) == set(RequirementResponse.model_fields)
+
+    def test_preload_warms_the_unfiltered_catalogue(self):
+        main._catalogue_body.cache_clear()
+        with patch("fast_json.ENABLED", True):
+            main.preload()
+            TestClient(app).get("/catalogue")
+        assert main._catalogue_body.cache_info().hits == 1
+
+
+class TestWithoutOrjson:
+    def test_dumps_falls_back_to_stdlib(self):
+        with patch("fast_json.orjson", None):
+            assert fast_json.dumps({"name": "Café", 1: [True, None]}) == '{"name":"Café","1":[true,null]}'.encode()
+
+    def test_preload_skips_the_catalogue_body(self):
+        main._catalogue_body.cache_clear()
+        with patch("fast_json.orjson", None), patch("fast_json.ENABLED", False):
+            main.preload()
+        assert main._catalogue_body.cache_info().currsize == 0
+
+
+def test_compact_match_reads_models_directly():
+    match = ScopeItemMatch(
+        id="J45", name="Accounts Payable", lob="Finance", process_group="AP",
+        description="", confidence="LOW", rationale="r", migration_objects=[],
+    )
+    assert compact_matches([match]) == compact_matches([match.model_dump()])
@@ -0,0 +1,99 @@
+"""
+pytest tests for the staged gap-analysis engine shared by /gap-analysis and analyse-all.
+"""
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gap_engine import GapEngine  # noqa: E402
+import main  # noqa: E402
+from main import app  # noqa: E402
+
+PICKS = [{"id": "J45", "confidence": "HIGH", "rationale": "AP"}]
+
+
+def _engine(candidates=None, persist=None):
+    provider = MagicMock()
+    provider.complete.return_value = {"data": {"matches": PICKS}, "tokens_used": 42}
+    engine = GapEngine(
+        get_provider=lambda: provider,
+        candidates=candidates,
+        prompt=lambda desc, top_n, lob: f"{desc}/{top_n}/{lob}",
+        llm=lambda p, prompt: p.complete("sys", prompt),
+        parse=lambda result: result["data"]["matches"],
+        enrich=lambda picks, top_n: [p["id"] for p in picks[:top_n]],
+        persist=persist,
+    )
+    return engine, provider
+
+
+class TestEngine:
+    def test_llm_path_runs_every_stage(self):
+        persist = MagicMock()
+        engine, provider = _engine(candidates=lambda *a: None, persist=persist)
+        run = engine.run("Supplier invoices", top_n=3, engagement_id="eng-1", req_id="REQ-001")
+        assert run.matches == ["J45"]
+        assert run.tokens_used == 42 and run.matched_by == "llm"
+        provider.complete.assert_called_once_with("sys", "Supplier invoices/3/None")
+        persist.assert_called_once_with(run)
+        assert list(run.stage_seconds) == ["candidates", "prompt", "llm", "parse", "enrich", "persist"]
+
+    def test_candidate_picks_skip_the_llm(self):
+        get_provider = MagicMock()
+        engine, provider = _engine(candidates=lambda *a: PICKS)
+        engine.get_provider = get_provider
+        run = engine.run("Three-way match")
+        assert run.matched_by == "keyword_rules" and run.tokens_used == 0
+        get_provider.assert_not_called()
+        assert "llm" not in run.stage_seconds
+
+    def test_use_rules_false_bypasses_candidates(self):
+        candidates = MagicMock(return_value=PICKS)
+        engine, _ = _engine(candidates=candidates)
+        assert engine.run("x", use_rules=False).matched_by == "llm"
+        candidates.assert_not_called()
+
+    def test_unpersisted_without_engagement(self):
+        persist = MagicMock()
+        engine, _ = _engine(persist=persist)
+        engine.run("x")
+        persist.assert_not_called()
+
+    def test_persist_failure_is_non_fatal(self):
+        engine, _ = _engine(persist=MagicMock(side_effect=Exception("DB down")))
+        run = engine.run("x", engagement_id="eng-1")
+        assert run.matches == ["J45"]
+
+
+class TestEndpointsShareEngine:
+    def _provider(self):
+        provider = MagicMock()
+        provider.complete.return_value = {"data": {"matches": PICKS}, "tokens_used": 10}
+        return provider
+
+    def test_gap_analysis_reports_stage_timings(self):
+        with patch("main.get_provider", return_value=self._provider()), patch("main.save_gap_analysis") as save:
+            resp = TestClient(app).post("/gap-analysis", json={"engagement_id": "eng-1", "process_description": "AP"})
+        assert resp.status_code == 200
+        timing = resp.headers["Server-Timing"]
+        for stage in ("candidates", "prompt", "llm", "parse", "enrich", "persist"):
+            assert f"{stage};dur=" in timing
+        assert save.call_args.kwargs["matches"][0]["id"] == "J45"
+
+    def test_analyse_all_runs_through_engine(self):
+        reqs = [{"req_id": "REQ-001", "engagement_id": "eng-1", "description": "AP", "status": "open"}]
+        with (
+            patch("main.gap_engine.run", wraps=main.gap_engine.run) as run,
+            patch("main.get_requirements_by_engagement", return_value=reqs),
+            patch("main.get_provider", return_value=self._provider()),
+            patch("main.save_gap_analysis") as save,
+            patch("main.update_requirement"),
+        ):
+            resp = TestClient(app).post("/engagement/eng-1/analyse-all")
+        assert resp.json()["results"][0]["top_match_id"] == "J45"
+        assert run.call_args.kwargs["req_id"] == "REQ-001"
+        assert save.call_args.kwargs["req_id"] == "REQ-001"
@@ -0,0 +1,106 @@
+"""
+pytest tests for response compression and ETag / If-None-Match handling.
+"""
+import sys
+import os
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import compression  # noqa: E402
+import database  # noqa: E402
+import etags  # noqa: E402
+from main import app  # noqa: E402
+from shared_state import SQLiteSharedState  # noqa: E402
+from storage import SQLiteBackend  # noqa: E402
+
+
+class TestCompression:
+    def test_large_json_is_gzipped(self):
+        resp = TestClient(app).get("/catalogue", headers={"Accept-Encoding": "gzip"})
+        assert resp.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in resp.headers["vary"]
+        assert resp.json()["total"] > 200
+
+    def test_small_and_identity_responses_untouched(self):
+        client = TestClient(app)
+        assert "content-encoding" not in client.get("/health", headers={"Accept-Encoding": "gzip"}).headers
+        assert "content-encoding" not in client.get("/catalogue", headers={"Accept-Encoding": "identity"}).headers
+
+    def test_choose_encoding(self):
+        assert compression.choose_encoding("gzip, deflate") == "gzip"
+        assert compression.choose_encoding("gzip;q=0") is None
+        assert compression.choose_encoding("") is None
+        with patch.object(compression, "brotli", object()):
+            assert compression.choose_encoding("gzip, br") == "br"
+
+    def test_streaming_response_compressed_incrementally(self):
+        stream_app = FastAPI()
+
+        @stream_app.get("/stream")
+        def stream():
+            return StreamingResponse((f'{{"row": {i}}}\n' for i in range(500)), media_type="application/x-ndjson")
+
+        stream_app.add_middleware(compression.CompressionMiddleware)
+        resp = TestClient(stream_app).get("/stream", headers={"Accept-Encoding": "gzip"})
+        assert resp.headers["content-encoding"] == "gzip"
+        assert resp.text.splitlines()[499] == '{"row": 499}'
+
+
+class TestETags:
+    def test_catalogue_revalidates_to_304(self):
+        client = TestClient(app)
+        first = client.get("/catalogue", headers={"Accept-Encoding": "gzip"})
+        etag = first.headers["etag"]
+        assert etag.endswith('-gzip"')
+        second = client.get("/catalogue", headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert second.content == b""
+        # The query string is part of the representation
+        assert client.get("/catalogue?lob=Finance", headers={"If-None-Match": etag}).status_code == 200
+
+    def test_engagement_etag_changes_after_write(self):
+        backend = SQLiteBackend(":memory:")
+        with patch.object(database, "_backend", backend):
+            client = TestClient(app)
+            client.post("/requirements", json={"engagement_id": "eng-etag", "title": "T", "description": "D"})
+            etag = client.get("/requirements?engagement_id=eng-etag").headers["etag"]
+
+            with patch.object(backend, "get_requirements_by_engagement") as read:
+                resp = client.get("/requirements?engagement_id=eng-etag", headers={"If-None-Match": etag})
+            assert resp.status_code == 304
+            read.assert_not_called()
+
+            client.post("/requirements", json={"engagement_id": "eng-etag", "title": "T2", "description": "D2"})
+            resp = client.get("/requirements?engagement_id=eng-etag", headers={"If-None-Match": etag})
+            assert resp.status_code == 200
+            assert len(resp.json()) == 2
+
+    def test_if_none_match_comparison(self):
+        assert etags.if_none_match('"abc-gzip"', '"abc"')
+        assert etags.if_none_match('W/"abc", "def"', '"abc"')
+        assert etags.if_none_match("*", '"abc"')
+        assert not etags.if_none_match('"abd"', '"abc"')
+
+    def test_can_be_disabled(self):
+        with patch("main.ETAGS_ENABLED", False):
+            assert "etag" not in TestClient(app).get("/lobs").headers
+
+    def test_engagement_version_is_shared_across_workers(self, tmp_path):
+        # Two handles on one state file stand in for two gunicorn workers
+        path = str(tmp_path / "shared.db")
+        worker_a, worker_b = SQLiteSharedState(path), SQLiteSharedState(path)
+        with patch("shared_state._state", worker_b):
+            before = etags.data_version("eng-1")
+        with patch("shared_state._state", worker_a):
+            assert etags.data_version("eng-1") == before
+            etags.bump("eng-1")
+            etags.bump("eng-10")
+        with patch("shared_state._state", worker_b):
+            after = etags.data_version("eng-1")
+        assert after != before and after.endswith(".1")
+        assert worker_a.instance_id == worker_b.instance_id
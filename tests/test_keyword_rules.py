@@ -0,0 +1,72 @@
+"""
+pytest tests for the Aho-Corasick keyword-rule fast path.
+"""
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics  # noqa: E402
+from keyword_rules import AhoCorasick, get_rules, normalise  # noqa: E402
+from main import app  # noqa: E402
+
+THREE_WAY = (
+    "Enforce three-way match between purchase order, goods receipt and supplier invoice "
+    "before vendor payments are released."
+)
+
+
+class TestAutomaton:
+    def test_finds_overlapping_patterns(self):
+        automaton = AhoCorasick(["he", "she", "his", "hers"])
+        assert sorted(automaton.find("ushers")) == ["he", "hers", "she"]
+
+    def test_keywords_only_hit_on_word_boundaries(self):
+        rules = get_rules()
+        assert normalise("Three-way  Match!") == " three way match "
+        assert " ach " not in rules.automaton.find(normalise("each batch"))
+        assert " mrp " in rules.automaton.find(normalise("run MRP nightly"))
+
+
+class TestRules:
+    def test_decisive_text_gets_high_confidence_rule_matches(self):
+        picks = get_rules().match(THREE_WAY)
+        assert picks[0]["id"] == "J62"
+        assert picks[0]["confidence"] == "HIGH"
+        assert '"three-way match"' in picks[0]["rationale"]
+        assert all(p["confidence"] in ("HIGH", "MEDIUM") for p in picks)
+
+    def test_ambiguous_text_falls_through(self):
+        assert get_rules().match("Payroll is checked in Excel every month.") is None
+        assert get_rules().match("") is None
+
+    def test_lob_filter_applies(self):
+        assert get_rules().match(THREE_WAY, lob="Human Resources") is None
+
+
+class TestGapAnalysisEndpoint:
+    def test_decisive_requirement_skips_provider(self):
+        provider = MagicMock()
+        with patch("main.get_provider", return_value=provider), patch("main.save_gap_analysis"):
+            resp = TestClient(app).post("/gap-analysis", json={"engagement_id": "eng-1", "process_description": THREE_WAY})
+        body = resp.json()
+        provider.complete.assert_not_called()
+        assert body["matched_by"] == "keyword_rules"
+        assert body["tokens_used"] == 0
+        assert body["matches"][0]["id"] == "J62"
+        assert 'outcome="decisive"' in metrics.render_prometheus()
+
+    def test_disabled_rules_use_provider(self):
+        provider = MagicMock()
+        provider.complete.return_value = {"content": "", "data": {"matches": []}, "tokens_used": 5}
+        with (
+            patch("keyword_rules.ENABLED", False),
+            patch("main.get_provider", return_value=provider),
+            patch("main.save_gap_analysis"),
+        ):
+            resp = TestClient(app).post("/gap-analysis", json={"engagement_id": "eng-1", "process_description": THREE_WAY})
+        provider.complete.assert_called_once()
+        assert resp.json()["matched_by"] == "llm"
@@ -0,0 +1,133 @@
+"""
+pytest tests for the LLM scheduler: priority classes, per-engagement
+fairness, request/token buckets, queue timeouts and the queue-wait metric.
+"""
+import sys
+import os
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics  # noqa: E402
+from llm_scheduler import BULK, INTERACTIVE, LLMScheduler, ScheduledProvider  # noqa: E402
+from main import app  # noqa: E402
+from providers import ProviderUnavailable  # noqa: E402
+from shared_state import MemorySharedState  # noqa: E402
+
+
+def _scheduler(**kwargs):
+    return LLMScheduler(**{"max_concurrency": 1, "queue_timeout_s": 5, "state": MemorySharedState(), **kwargs})
+
+
+def _run_in_order(scheduler, calls):
+    """Hold the only slot, queue `calls` (priority, engagement) one by one, then
+    release it; returns the labels in the order they were admitted."""
+    order, threads = [], []
+    release = threading.Event()
+
+    def holder():
+        with scheduler.slot(BULK, "holder"):
+            release.wait(5)
+
+    def call(label, priority, engagement):
+        with scheduler.slot(priority, engagement):
+            order.append(label)
+
+    threads.append(threading.Thread(target=holder))
+    threads[0].start()
+    while scheduler.in_flight == 0:
+        time.sleep(0.001)
+    for i, (label, priority, engagement) in enumerate(calls, start=1):
+        t = threading.Thread(target=call, args=(label, priority, engagement))
+        t.start()
+        threads.append(t)
+        while scheduler.depth() < i:
+            time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join(5)
+    return order
+
+
+class TestOrdering:
+    def test_interactive_goes_before_queued_bulk(self):
+        order = _run_in_order(_scheduler(), [
+            ("bulk-1", BULK, "eng-1"), ("bulk-2", BULK, "eng-1"), ("chat", INTERACTIVE, "eng-2"),
+        ])
+        assert order == ["chat", "bulk-1", "bulk-2"]
+
+    def test_engagements_are_served_round_robin(self):
+        order = _run_in_order(_scheduler(), [
+            ("a1", BULK, "eng-a"), ("a2", BULK, "eng-a"), ("a3", BULK, "eng-a"), ("b1", BULK, "eng-b"),
+        ])
+        assert order == ["a1", "b1", "a2", "a3"]
+
+    def test_unknown_priority_rejected(self):
+        with pytest.raises(ValueError):
+            with _scheduler().slot("urgent"):
+                pass
+
+
+class TestLimits:
+    def test_request_bucket_holds_a_minute_of_requests(self):
+        scheduler = _scheduler(requests_per_minute=6, queue_timeout_s=0.05)
+        for _ in range(6):
+            with scheduler.slot():
+                pass
+        with pytest.raises(ProviderUnavailable):
+            with scheduler.slot():
+                pass
+        assert scheduler.depth() == 0 and scheduler.in_flight == 0
+
+    def test_token_bucket_limits_input_tokens(self):
+        scheduler = _scheduler(tokens_per_minute=1000, queue_timeout_s=0.05)
+        with scheduler.slot(tokens=600):
+            pass
+        with pytest.raises(ProviderUnavailable):
+            with scheduler.slot(tokens=600):
+                pass
+        with scheduler.slot(tokens=300):
+            pass
+
+    def test_queue_wait_is_recorded(self):
+        metrics.reset()
+        with _scheduler().slot(INTERACTIVE, "eng-1") as waited:
+            assert waited >= 0
+        assert metrics.summary_snapshot("rapid_llm_queue_wait_seconds", priority=INTERACTIVE)["count"] == 1
+
+
+class TestScheduledProvider:
+    def test_resolves_provider_lazily_and_passes_arguments_through(self):
+        provider = MagicMock()
+        provider.complete.return_value = {"content": "ok"}
+        get_provider = MagicMock(return_value=provider)
+        scheduled = ScheduledProvider(get_provider, BULK, "eng-1", scheduler=_scheduler())
+        get_provider.assert_not_called()
+        assert scheduled.complete("sys", "user", max_tokens=5) == {"content": "ok"}
+        scheduled.complete("sys", "again")
+        get_provider.assert_called_once()
+        provider.complete.assert_called_with("sys", "again")
+
+    def test_endpoints_use_their_priority_class(self):
+        metrics.reset()
+        provider = MagicMock()
+        provider.complete.return_value = {
+            "data": {"matches": [{"id": "J45", "confidence": "HIGH", "rationale": "AP"}]}, "tokens_used": 10,
+        }
+        reqs = [{"req_id": "REQ-001", "engagement_id": "eng-1", "description": "AP", "status": "open"}]
+        with (
+            patch("main.get_provider", return_value=provider),
+            patch("main.get_requirements_by_engagement", return_value=reqs),
+            patch("main.save_gap_analysis"),
+            patch("main.update_requirement"),
+        ):
+            client = TestClient(app)
+            client.post("/gap-analysis", json={"engagement_id": "eng-1", "process_description": "AP"})
+            client.post("/engagement/eng-1/analyse-all")
+        assert metrics.summary_snapshot("rapid_llm_queue_wait_seconds", priority=INTERACTIVE)["count"] == 1
+        assert metrics.summary_snapshot("rapid_llm_queue_wait_seconds", priority=BULK)["count"] == 1
@@ -0,0 +1,80 @@
+"""
+pytest tests for request/dependency instrumentation and the /metrics endpoint.
+All Supabase and provider calls are mocked.
+"""
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics  # noqa: E402
+from main import app  # noqa: E402
+
+ENGAGEMENT = "eng-metrics-test"
+
+
+@pytest.fixture
+def client():
+    metrics.reset()
+    return TestClient(app, raise_server_exceptions=True)
+
+
+class TestSpans:
+    def test_span_records_latency_and_calls(self):
+        metrics.reset()
+        with metrics.span("llm", "unit"):
+            pass
+        snap = metrics.summary_snapshot("rapid_dependency_duration_seconds", dependency="llm", op="unit")
+        assert snap["count"] == 1
+        assert metrics.counter_value("rapid_dependency_calls_total", dependency="llm", op="unit") == 1
+        assert metrics.gauge_value("rapid_dependency_in_flight", dependency="llm", op="unit") == 0
+
+    def test_span_counts_errors(self):
+        metrics.reset()
+        with pytest.raises(RuntimeError):
+            with metrics.span("supabase", "boom"):
+                raise RuntimeError("down")
+        assert metrics.counter_value("rapid_dependency_errors_total", dependency="supabase", op="boom") == 1
+
+    def test_quantiles(self):
+        metrics.reset()
+        for i in range(1, 101):
+            metrics.observe("lat", i / 100, route="/x")
+        snap = metrics.summary_snapshot("lat", route="/x")
+        assert snap["p50"] == pytest.approx(0.5, abs=0.02)
+        assert snap["p99"] == pytest.approx(0.99, abs=0.02)
+
+
+class TestMetricsEndpoint:
+    def test_route_metrics_use_path_template(self, client):
+        with patch("main.get_requirement_by_id", return_value=None):
+            client.get(f"/requirements/REQ-001?engagement_id={ENGAGEMENT}")
+        body = client.get("/metrics").text
+        assert 'route="/requirements/{req_id}"' in body
+        assert "rapid_http_request_duration_seconds" in body
+        assert 'quantile="0.95"' in body
+
+    def test_errors_counted_per_route(self, client):
+        with patch("main.get_requirements_by_engagement", side_effect=Exception("DB down")):
+            client.get(f"/engagement/{ENGAGEMENT}/summary")
+        assert metrics.counter_value(
+            "rapid_http_request_errors_total", route="/engagement/{engagement_id}/summary", method="GET"
+        ) == 1
+
+    def test_server_timing_header_includes_llm(self, client):
+        provider = MagicMock()
+        provider.complete.return_value = {"content": "[]", "tokens_used": 10}
+        with patch("main.get_provider", return_value=provider):
+            resp = client.post("/requirements/extract-from-transcript", json={
+                "engagement_id": ENGAGEMENT,
+                "stakeholder": "CFO",
+                "transcript_text": "nothing",
+            })
+        timing = resp.headers["Server-Timing"]
+        assert "llm;dur=" in timing
+        assert "parse;dur=" in timing
+        assert "total;dur=" in timing
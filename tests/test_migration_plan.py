@@ -0,0 +1,89 @@
+"""
+pytest tests for the incremental migration-object plan and its endpoint.
+"""
+import sys
+import os
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import main  # noqa: E402
+from migration_plan import MigrationPlanner  # noqa: E402
+from scope_items import MIGRATION_OBJECT_INDEX, SCOPE_ITEM_BY_ID, compact_matches  # noqa: E402
+from storage import SQLiteBackend  # noqa: E402
+
+ENG = "eng-plan"
+
+
+def _objects(scope_id: str) -> set:
+    return set(SCOPE_ITEM_BY_ID[scope_id]["migration_objects"])
+
+
+def _save(backend, req_id, ids, timestamp):
+    return backend.save_gap_result({
+        "engagement_id": ENG, "req_id": req_id, "timestamp": timestamp,
+        "matches": compact_matches([{"id": i, "confidence": "HIGH"} for i in ids]),
+    })
+
+
+class TestPlanner:
+    def setup_method(self):
+        self.backend = SQLiteBackend(":memory:")
+        self.calls = []
+
+        def fetch(engagement_id, after_id):
+            self.calls.append(after_id)
+            return [r for page in self.backend.iter_results_since(engagement_id, after_id) for r in page]
+
+        self.planner = MigrationPlanner(fetch)
+
+    def test_aggregates_latest_matches_per_requirement(self):
+        _save(self.backend, "REQ-001", ["J58"], "2026-01-01T00:00:00")
+        _save(self.backend, "REQ-002", ["J58"], "2026-01-01T00:00:01")
+        plan = self.planner.plan(ENG)
+        by_object = {o["migration_object"]: o for o in plan["objects"]}
+        assert set(by_object) == _objects("J58")
+        entry = by_object["G/L account balance"]
+        assert entry["req_ids"] == ["REQ-001", "REQ-002"]
+        assert entry["scope_items"] == ["J58"]
+        assert entry["catalogue_scope_items"] == len(MIGRATION_OBJECT_INDEX["G/L account balance"])
+
+    def test_only_new_rows_are_fetched_and_rematch_moves_contribution(self):
+        first = _save(self.backend, "REQ-001", ["J58"], "2026-01-01T00:00:00")
+        self.planner.plan(ENG)
+        _save(self.backend, "REQ-001", ["J45"], "2026-01-02T00:00:00")
+        plan = self.planner.plan(ENG)
+        assert self.calls == [0, first["id"]]
+        assert plan["summary"]["results_applied"] == 1
+        assert {o["migration_object"] for o in plan["objects"]} == _objects("J45")
+        assert plan["summary"]["requirements_analysed"] == 1
+
+    def test_older_result_written_later_does_not_win(self):
+        _save(self.backend, "REQ-001", ["J45"], "2026-01-02T00:00:00")
+        _save(self.backend, "REQ-001", ["J58"], "2026-01-01T00:00:00")
+        objects = {o["migration_object"] for o in self.planner.plan(ENG)["objects"]}
+        assert objects == _objects("J45")
+
+    def test_evicts_least_recently_used_engagements(self):
+        planner = MigrationPlanner(lambda engagement_id, after_id: [], max_engagements=2)
+        for engagement_id in ("a", "b", "c"):
+            planner.plan(engagement_id)
+        assert list(planner._plans) == ["b", "c"]
+
+
+def test_endpoint_reads_incrementally():
+    backend = SQLiteBackend(":memory:")
+    with patch.object(database, "_backend", backend):
+        main._migration_planner.reset()
+        _save(backend, "REQ-001", ["J58"], "2026-01-01T00:00:00")
+        client = TestClient(main.app)
+        first = client.get(f"/engagement/{ENG}/migration-plan").json()
+        assert first["summary"]["results_applied"] == 1
+        again = client.get(f"/engagement/{ENG}/migration-plan?rebuild=true").json()
+        assert again["objects"] == first["objects"]
+        with patch.object(backend, "iter_results_since", return_value=iter([])) as since:
+            client.get(f"/engagement/{ENG}/migration-plan?x=1")
+        assert since.call_args.args[1] > 0
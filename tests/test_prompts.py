@@ -0,0 +1,55 @@
+"""
+pytest tests for static-first prompt assembly, template versions and
+prefix-cache accounting.
+"""
+import sys
+import os
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+import prompts  # noqa: E402
+from benchmarks.fakes import FakeProvider  # noqa: E402
+
+
+class TestAssembly:
+    def test_gap_prompt_is_static_first(self):
+        prompt = main._gap_prompt("Supplier invoices arrive by email", top_n=3)
+        assert [b["text"][:20] for b in prompt.system] == [
+            main._GAP_SYSTEM_PROMPT[:20], "SAP S/4HANA Cloud 26",
+        ]
+        assert "cache_control" not in prompt.system[0]
+        assert prompt.system[-1]["cache_control"] == {"type": "ephemeral"}
+        assert prompt.user.startswith("Business Process Description:\nSupplier invoices")
+        # The cached prefix does not depend on the requirement
+        assert main._gap_prompt("Something else").system == prompt.system
+
+    def test_stable_session_text_gets_its_own_breakpoint(self):
+        template = prompts.PromptTemplate("t", "instructions")
+        prompt = template.build("new turn", stable="history")
+        assert prompt.user[0] == {"type": "text", "text": "history", "cache_control": {"type": "ephemeral"}}
+        assert prompt.user[1] == {"type": "text", "text": "new turn"}
+
+    def test_version_tracks_instructions_and_tool(self):
+        base = prompts.PromptTemplate("t", "a", {"name": "x"})
+        assert base.version == prompts.PromptTemplate("t", "a", {"name": "x"}).version
+        assert base.version != prompts.PromptTemplate("t", "b", {"name": "x"}).version
+        assert base.version != prompts.PromptTemplate("t", "a", {"name": "y"}).version
+        assert set(prompts.versions()) >= {"gap_analysis", "transcript_extraction", "archaeologist"}
+
+
+def test_cache_hit_ratio_reported_per_template():
+    prompts.reset_stats()
+    llm = FakeProvider()
+    body = {"engagement_id": "eng-1", "process_description": "Payroll is checked in Excel every month."}
+    with patch("main.get_provider", return_value=llm), patch("main.save_gap_analysis"):
+        client = TestClient(main.app)
+        client.post("/gap-analysis", json=body)
+        client.post("/gap-analysis", json={**body, "process_description": "Payroll runs are reviewed by HR."})
+        stats = client.get("/prompts").json()["templates"]["gap_analysis"]
+    assert stats["calls"] == 2
+    assert stats["hit_ratio"] == 0.5
+    assert stats["cache_read"] > 0 and stats["version"] == main._GAP_PROMPT.version
@@ -0,0 +1,218 @@
+"""
+pytest tests for the provider call layer: retries, backoff, circuit breaker,
+deadlines and hedging. The Anthropic client is replaced by a fake.
+"""
+import sys
+import os
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import anthropic
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics  # noqa: E402
+import providers  # noqa: E402
+from main import app  # noqa: E402
+
+
+def _message(text="[]", input_tokens=10, output_tokens=5):
+    return SimpleNamespace(
+        content=[SimpleNamespace(text=text)],
+        usage=SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens),
+    )
+
+
+def _status_error(status, headers=None):
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return anthropic.APIStatusError(f"status {status}", response=response, body=None)
+
+
+@pytest.fixture
+def provider():
+    metrics.reset()
+    providers._breaker.reset()
+    p = providers.AnthropicProvider()
+    p.client = MagicMock()
+    yield p
+    providers._breaker.reset()
+
+
+@pytest.fixture
+def sleeps():
+    recorded = []
+    with patch("providers._sleep", side_effect=recorded.append):
+        yield recorded
+
+
+class TestRetries:
+    def test_retries_overloaded_then_succeeds(self, provider, sleeps):
+        provider.client.messages.create.side_effect = [_status_error(529), _message("ok")]
+        result = provider.complete("sys", "user")
+        assert result["content"] == "ok"
+        assert result["tokens_used"] == 15
+        assert provider.client.messages.create.call_count == 2
+        assert len(sleeps) == 1
+        assert metrics.counter_value("rapid_llm_retries_total", reason="APIStatusError") == 1
+
+    def test_honours_retry_after(self, provider, sleeps):
+        provider.client.messages.create.side_effect = [_status_error(429, {"retry-after": "3"}), _message()]
+        provider.complete("sys", "user")
+        assert sleeps == [3.0]
+
+    def test_non_retryable_raises_immediately(self, provider, sleeps):
+        provider.client.messages.create.side_effect = _status_error(400)
+        with pytest.raises(anthropic.APIStatusError):
+            provider.complete("sys", "user")
+        assert provider.client.messages.create.call_count == 1
+        assert sleeps == []
+
+    def test_gives_up_after_max_retries(self, provider, sleeps):
+        provider.client.messages.create.side_effect = _status_error(503)
+        with patch("providers.MAX_RETRIES", 2), patch.object(providers._breaker, "failure_threshold", 100):
+            with pytest.raises(anthropic.APIStatusError):
+                provider.complete("sys", "user")
+        assert provider.client.messages.create.call_count == 3
+
+    def test_deadline_stops_retry_loop(self, provider, sleeps):
+        provider.client.messages.create.side_effect = _status_error(529, {"retry-after": "30"})
+        with pytest.raises(anthropic.APIStatusError):
+            provider.complete("sys", "user", deadline_s=5)
+        assert provider.client.messages.create.call_count == 1
+
+
+class TestCircuitBreaker:
+    def test_opens_after_threshold_and_rejects(self, provider, sleeps):
+        provider.client.messages.create.side_effect = _status_error(529)
+        with patch("providers.MAX_RETRIES", 10):
+            with pytest.raises(providers.ProviderUnavailable):
+                provider.complete("sys", "user")
+        assert providers._breaker.state == "open"
+        assert provider.client.messages.create.call_count == providers.BREAKER_FAILURE_THRESHOLD
+        assert metrics.gauge_value("rapid_llm_breaker_state") == 2
+
+    def test_half_open_probe_closes_on_success(self):
+        breaker = providers.CircuitBreaker(failure_threshold=1, cooldown_s=0.01)
+        breaker.record_failure()
+        assert not breaker.allow()
+        time.sleep(0.02)
+        assert breaker.allow()
+        assert breaker.state == "half_open"
+        assert not breaker.allow()  # only one probe at a time
+        breaker.record_success()
+        assert breaker.state == "closed"
+
+    def test_caller_error_on_half_open_probe_keeps_breaker_half_open(self, provider, sleeps):
+        with patch.object(providers._breaker, "failure_threshold", 1), patch.object(providers._breaker, "cooldown_s", 0):
+            providers._breaker.record_failure()
+            provider.client.messages.create.side_effect = _status_error(400)
+            with pytest.raises(anthropic.APIStatusError):
+                provider.complete("sys", "user")
+            assert providers._breaker.state == "half_open"
+            assert providers._breaker.failures == 1
+            # The probe slot is free again, and the next probe decides
+            provider.client.messages.create.side_effect = [_message("ok")]
+            assert provider.complete("sys", "user")["content"] == "ok"
+            assert providers._breaker.state == "closed"
+
+    def test_caller_error_does_not_reset_the_failure_streak(self, provider, sleeps):
+        provider.client.messages.create.side_effect = [_status_error(529), _status_error(400)]
+        with patch("providers.MAX_RETRIES", 1), pytest.raises(anthropic.APIStatusError):
+            provider.complete("sys", "user")
+        assert providers._breaker.failures == 1
+
+
+class TestHedging:
+    def test_hedge_wins_when_primary_is_slow(self, provider):
+        release = threading.Event()
+        calls = []
+
+        def create(**kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                release.wait(2)
+                return _message("slow")
+            return _message("fast")
+
+        provider.client.messages.create.side_effect = create
+        with patch("providers.HEDGE_AFTER_S", 0.05):
+            result = provider.complete("sys", "user")
+        release.set()
+        assert result["content"] == "fast"
+        assert metrics.counter_value("rapid_llm_hedged_total", winner="hedge") == 1
+
+
+class TestEndpointErrors:
+    def test_breaker_open_maps_to_503(self):
+        provider = MagicMock()
+        provider.complete.side_effect = providers.ProviderUnavailable("circuit open")
+        with patch("main.get_provider", return_value=provider):
+            resp = TestClient(app).post("/gap-analysis", json={
+                "engagement_id": "eng-1",
+                "process_description": "Three-way match",
+            })
+        assert resp.status_code == 503
+
+    def test_analyse_all_reports_failed_requirements(self):
+        provider = MagicMock()
+        provider.complete.side_effect = providers.ProviderUnavailable("circuit open")
+        reqs = [{"req_id": "REQ-001", "engagement_id": "eng-1", "description": "x", "status": "open"}]
+        with (
+            patch("main.get_requirements_by_engagement", return_value=reqs),
+            patch("main.get_provider", return_value=provider),
+        ):
+            resp = TestClient(app).post("/engagement/eng-1/analyse-all")
+        data = resp.json()
+        assert data["processed"] == 0
+        assert data["failed"][0]["req_id"] == "REQ-001"
+
+
+class TestToolUse:
+    def test_tool_use_block_returned_as_data(self, provider):
+        block = SimpleNamespace(type="tool_use", input={"matches": [{"id": "J45", "confidence": "HIGH", "rationale": "AP"}]})
+        provider.client.messages.create.return_value = SimpleNamespace(
+            content=[block], usage=SimpleNamespace(input_tokens=10, output_tokens=5),
+        )
+        tool = {"name": "record_scope_item_matches", "input_schema": {"type": "object"}}
+        result = provider.complete("sys", "user", tool=tool)
+        assert result["data"]["matches"][0]["id"] == "J45"
+        kwargs = provider.client.messages.create.call_args.kwargs
+        assert kwargs["tool_choice"] == {"type": "tool", "name": "record_scope_item_matches"}
+
+    def test_gap_analysis_uses_structured_data(self):
+        provider = MagicMock()
+        provider.complete.return_value = {
+            # Prose with brackets would break the old greedy regex scrape
+            "content": "see [note]",
+            "data": {"matches": [{"id": "J45", "confidence": "HIGH", "rationale": "AP"}]},
+            "tokens_used": 42,
+        }
+        with (
+            patch("main.get_provider", return_value=provider),
+            patch("main.save_gap_analysis"),
+        ):
+            resp = TestClient(app).post("/gap-analysis", json={
+                "engagement_id": "eng-1",
+                "process_description": "Vendor payments",
+            })
+        assert resp.status_code == 200
+        assert resp.json()["matches"][0]["id"] == "J45"
+        assert provider.complete.call_args.kwargs["tool"]["name"] == "record_scope_item_matches"
+
+
+class TestPromptCacheUsage:
+    def test_cache_tokens_reported_and_counted(self, provider):
+        msg = _message()
+        msg.usage.cache_read_input_tokens = 1000
+        msg.usage.cache_creation_input_tokens = 0
+        provider.client.messages.create.return_value = msg
+        result = provider.complete([{"type": "text", "text": "sys"}], "user")
+        assert result["cache_read_tokens"] == 1000
+        assert result["input_tokens"] == 10
+        assert result["tokens_used"] == 1015
@@ -0,0 +1,127 @@
+"""
+pytest tests for the bulk requirement import (CSV/XLSX raw upload).
+"""
+import sys
+import os
+import io
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import main  # noqa: E402
+from main import app  # noqa: E402
+from requirement_import import ImportFormatError, RowReader, detect_format  # noqa: E402
+from storage import SQLiteBackend  # noqa: E402
+
+URL = "/engagement/eng-1/requirements/import"
+CSV = (
+    "Title,Description,Tags,Priority,Confidence Score,Owner\n"
+    "Invoice approval,\"Approve invoices,\nover 10k\",pain_point; manual_step,Should-Have,0.9,Ana\n"
+    ",,,,,\n"
+    "Bad score,Score is not a number,,,high,\n"
+    "Vendor onboarding,Collect bank details,,,,\n"
+)
+
+
+@pytest.fixture
+def backend():
+    b = SQLiteBackend(":memory:")
+    with patch.object(database, "_backend", b):
+        yield b
+    b.close()
+
+
+def _post(body, **params):
+    return TestClient(app).post(URL, content=body, params=params, headers={"Content-Type": "text/csv"})
+
+
+class TestReader:
+    def test_header_mapping_and_cells(self):
+        reader = RowReader(io.BytesIO(("\ufeff" + CSV).encode()), "csv", main._IMPORT_FIELDS)
+        assert reader.ignored_columns == ["Owner"]
+        rows = list(reader)
+        assert [n for n, _ in rows] == [2, 4, 5]
+        first = rows[0][1]
+        assert first["description"] == "Approve invoices,\nover 10k"
+        assert first["tags"] == ["pain_point", "manual_step"]
+        assert "priority" not in rows[2][1]
+
+    def test_missing_required_column(self):
+        with pytest.raises(ImportFormatError, match="description"):
+            RowReader(io.BytesIO(b"Title,Tags\nA,b\n"), "csv", main._IMPORT_FIELDS)
+
+    def test_format_detection(self):
+        assert detect_format("XLSX", None, io.BytesIO(b"")) == "xlsx"
+        assert detect_format(None, "text/csv; charset=utf-8", io.BytesIO(b"")) == "csv"
+        assert detect_format(None, "application/octet-stream", io.BytesIO(b"PK\x03\x04rest")) == "xlsx"
+        with pytest.raises(ImportFormatError):
+            detect_format("json", None, io.BytesIO(b""))
+
+    def test_xlsx_without_openpyxl(self):
+        with patch("requirement_import.openpyxl", None), pytest.raises(ImportFormatError, match="openpyxl"):
+            RowReader(io.BytesIO(b"PK\x03\x04"), "xlsx", main._IMPORT_FIELDS)
+
+
+class TestEndpoint:
+    def test_valid_rows_are_created_and_bad_rows_reported(self, backend):
+        resp = _post(CSV.encode())
+        assert resp.status_code == 200
+        report = resp.json()
+        assert (report["rows"], report["created"], report["failed"]) == (3, 2, 1)
+        assert (report["first_req_id"], report["last_req_id"]) == ("REQ-001", "REQ-002")
+        assert report["errors"][0]["row"] == 4
+        assert "confidence_score" in report["errors"][0]["error"]
+        stored = backend.get_requirements_by_engagement("eng-1")
+        assert stored[0]["tags"] == ["pain_point", "manual_step"]
+        assert stored[0]["priority"] == "Should-Have" and stored[1]["priority"] == "Must-Have"
+
+    def test_rows_are_inserted_in_batches(self, backend):
+        body = "title,description\n" + "".join(f"R{i},D{i}\n" for i in range(5))
+        with (
+            patch("main.IMPORT_BATCH_SIZE", 2),
+            patch("main.create_requirements", wraps=database.create_requirements) as create,
+        ):
+            report = _post(body.encode()).json()
+        assert [len(c.args[1]) for c in create.call_args_list] == [2, 2, 1]
+        assert report["last_req_id"] == "REQ-005"
+        assert [r["req_id"] for r in backend.get_requirements_by_engagement("eng-1")] == [
+            f"REQ-{i:03d}" for i in range(1, 6)
+        ]
+
+    def test_max_req_id_is_read_once_per_import(self, backend):
+        body = "title,description\n" + "".join(f"R{i},D{i}\n" for i in range(5))
+        with (
+            patch("main.IMPORT_BATCH_SIZE", 2),
+            patch.object(backend, "_max_req_number", wraps=backend._max_req_number) as max_number,
+        ):
+            _post(body.encode())
+        assert max_number.call_count == 1
+
+    def test_failed_batch_does_not_abort_the_import(self, backend):
+        body = "title,description\n" + "".join(f"R{i},D{i}\n" for i in range(4))
+        with (
+            patch("main.IMPORT_BATCH_SIZE", 2),
+            patch("main.create_requirements", side_effect=[RuntimeError("db down"), [{"req_id": "REQ-001"}] * 2]),
+        ):
+            report = _post(body.encode()).json()
+        assert (report["created"], report["failed"]) == (2, 2)
+        assert [e["row"] for e in report["errors"]] == [2, 3]
+
+    def test_unreadable_upload_is_rejected(self, backend):
+        assert _post(b"Title,Owner\nA,B\n").status_code == 400
+        assert _post(b"", format="csv").status_code == 400
+
+    def test_xlsx_round_trip(self, backend):
+        openpyxl = pytest.importorskip("openpyxl")
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(["Title", "Description", "Confidence Score"])
+        sheet.append(["Invoice approval", "Approve invoices", 0.7])
+        buf = io.BytesIO()
+        workbook.save(buf)
+        report = TestClient(app).post(URL, content=buf.getvalue()).json()
+        assert report["format"] == "xlsx" and report["created"] == 1
@@ -0,0 +1,114 @@
+"""
+Tests for the cross-worker shared state (result cache, token ledger, rate
+buckets). Conformance tests run against both backends; the SQLite backend is
+also exercised from forked processes the way gunicorn workers use it.
+"""
+import sys
+import os
+import multiprocessing
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import prompts  # noqa: E402
+from main import app  # noqa: E402
+from shared_state import MemorySharedState, SQLiteSharedState, create_shared_state  # noqa: E402
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def state(request, tmp_path):
+    if request.param == "memory":
+        yield MemorySharedState()
+    else:
+        s = SQLiteSharedState(str(tmp_path / "shared.db"))
+        yield s
+        s.close()
+
+
+@pytest.fixture
+def fresh_state():
+    """Swap the process-wide backend for an empty in-memory one."""
+    state = MemorySharedState()
+    with patch("shared_state._state", state):
+        yield state
+
+
+class TestConformance:
+    def test_cache_round_trip_and_expiry(self, state):
+        state.cache_set("k", {"matches": [1, 2]}, ttl_s=60)
+        assert state.cache_get("k") == {"matches": [1, 2]}
+        state.cache_set("gone", "v", ttl_s=-1)
+        assert state.cache_get("gone") is None
+        assert state.cache_get("missing") is None
+        state.cache_delete("k")
+        assert state.cache_get("k") is None
+
+    def test_ledger_adds_and_filters_by_prefix(self, state):
+        state.ledger_add("tokens:2026-10-19:gap_analysis", 100)
+        assert state.ledger_add("tokens:2026-10-19:gap_analysis", 50) == 150
+        state.ledger_add("tokens:2026-10-18:gap_analysis", 7)
+        assert state.ledger_get("tokens:2026-10-19:") == {"tokens:2026-10-19:gap_analysis": 150}
+
+    def test_bucket_grants_burst_then_reports_wait(self, state):
+        assert [state.acquire("b", rate_per_s=1.0, burst=3) for _ in range(3)] == [0.0, 0.0, 0.0]
+        wait = state.acquire("b", rate_per_s=1.0, burst=3)
+        assert 0.9 < wait <= 1.0
+
+    def test_instance_id_is_stable(self, state):
+        assert state.instance_id and state.instance_id == state.instance_id
+
+    def test_clear(self, state):
+        state.cache_set("k", 1, ttl_s=60)
+        state.ledger_add("n", 1)
+        state.clear()
+        assert state.cache_get("k") is None and state.ledger_get() == {}
+
+
+def _worker_acquires(path, results):
+    s = SQLiteSharedState(path)
+    results.put(sum(1 for _ in range(10) if s.acquire("llm:requests", rate_per_s=0.001, burst=8) == 0.0))
+
+
+class TestAcrossProcesses:
+    def test_rate_bucket_is_shared_by_forked_workers(self, tmp_path):
+        path = str(tmp_path / "shared.db")
+        parent = SQLiteSharedState(path)
+        parent.ledger_add("warm", 1)  # open a connection before forking, as the master may
+        ctx = multiprocessing.get_context("fork")
+        results = ctx.Queue()
+        workers = [ctx.Process(target=_worker_acquires, args=(path, results)) for _ in range(3)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join(timeout=30)
+        assert sum(results.get(timeout=5) for _ in workers) == 8
+
+    def test_backend_selected_by_path(self, tmp_path):
+        assert create_shared_state("").name == "memory"
+        assert create_shared_state(str(tmp_path / "s.db")).name == "sqlite"
+
+
+class TestUsers:
+    def test_token_ledger_reports_tokens_today(self, fresh_state):
+        prompts.record(prompts.TEMPLATES["gap_analysis"].build("x"), {"tokens_used": 120})
+        assert prompts.cache_stats()["gap_analysis"]["tokens_today"] == 120
+
+    def test_gap_result_cache_skips_repeat_llm_calls(self, fresh_state):
+        provider = MagicMock()
+        provider.complete.return_value = {
+            "data": {"matches": [{"id": "J45", "confidence": "HIGH", "rationale": "AP"}]}, "tokens_used": 10,
+        }
+        body = {"engagement_id": "eng-1", "process_description": "Approvals for spend"}
+        with (
+            patch("main.RESULT_CACHE_TTL_S", 60),
+            patch("main.get_provider", return_value=provider),
+            patch("main.save_gap_analysis"),
+        ):
+            first = TestClient(app).post("/gap-analysis", json=body).json()
+            second = TestClient(app).post("/gap-analysis", json=body).json()
+        assert provider.complete.call_count == 1
+        assert second["matches"][0]["id"] == first["matches"][0]["id"] == "J45"
+        assert second["tokens_used"] == 0
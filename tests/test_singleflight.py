@@ -0,0 +1,157 @@
+"""
+pytest tests for single-flight coalescing of identical in-flight LLM calls
+and transcript extractions.
+"""
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+import metrics  # noqa: E402
+from main import app  # noqa: E402
+from singleflight import Group  # noqa: E402
+
+
+def _blocking(release: threading.Event, value="answer"):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return value
+    return fn, calls
+
+
+def _wait_for_waiters(group: Group, key: str, n: int):
+    while group._calls.get(key) is None or group._calls[key].waiters < n:
+        time.sleep(0.001)
+
+
+class TestGroup:
+    def test_concurrent_callers_share_one_call(self):
+        metrics.reset()
+        group, release = Group("unit"), threading.Event()
+        fn, calls = _blocking(release)
+        with ThreadPoolExecutor(4) as pool:
+            futures = [pool.submit(group.do, "k", fn)]
+            while not calls:
+                time.sleep(0.001)
+            futures += [pool.submit(group.do, "k", fn) for _ in range(3)]
+            _wait_for_waiters(group, "k", 3)
+            release.set()
+            results = [f.result(5) for f in futures]
+        assert len(calls) == 1
+        assert results[0] == ("answer", False)
+        assert results[1:] == [("answer", True)] * 3
+        assert metrics.counter_value("rapid_llm_coalesced_total", op="unit") == 3
+        assert group.in_flight() == 0
+
+    def test_error_reaches_every_waiter_and_key_is_released(self):
+        group, release = Group("unit"), threading.Event()
+
+        def fail():
+            release.wait(5)
+            raise RuntimeError("overloaded")
+        with ThreadPoolExecutor(2) as pool:
+            leader = pool.submit(group.do, "k", fail)
+            while group.in_flight() == 0:
+                time.sleep(0.001)
+            follower = pool.submit(group.do, "k", fail)
+            _wait_for_waiters(group, "k", 1)
+            release.set()
+            for f in (leader, follower):
+                with pytest.raises(RuntimeError):
+                    f.result(5)
+        assert group.do("k", lambda: "fresh") == ("fresh", False)
+
+    def test_different_keys_run_independently(self):
+        group = Group("unit")
+        assert group.do("a", lambda: 1) == (1, False)
+        assert group.do("b", lambda: 2) == (2, False)
+
+
+class TestGapAnalysisCoalescing:
+    def test_double_fired_analysis_makes_one_provider_call(self):
+        release = threading.Event()
+        provider = MagicMock()
+
+        def complete(*args, **kwargs):
+            release.wait(5)
+            return {"data": {"matches": [{"id": "J45", "confidence": "HIGH", "rationale": "AP"}]}, "tokens_used": 10}
+        provider.complete.side_effect = complete
+        body = {"engagement_id": "eng-1", "process_description": "Approvals for spend"}
+        client = TestClient(app)
+        with (
+            patch("main.get_provider", return_value=provider),
+            patch("main.save_gap_analysis"),
+            ThreadPoolExecutor(2) as pool,
+        ):
+            first = pool.submit(client.post, "/gap-analysis", json=body)
+            while main._gap_flights.in_flight() == 0:
+                time.sleep(0.001)
+            second = pool.submit(client.post, "/gap-analysis", json=body)
+            key = next(iter(main._gap_flights._calls))
+            _wait_for_waiters(main._gap_flights, key, 1)
+            release.set()
+            responses = [first.result(5).json(), second.result(5).json()]
+        assert provider.complete.call_count == 1
+        assert [r["matches"][0]["id"] for r in responses] == ["J45", "J45"]
+        assert sorted(r["tokens_used"] for r in responses) == [0, 10]
+
+
+class TestTranscriptExtractionCoalescing:
+    def test_double_submitted_transcript_creates_each_requirement_once(self):
+        release = threading.Event()
+        provider = MagicMock()
+
+        def complete(*args, **kwargs):
+            release.wait(5)
+            return {"data": {"requirements": [
+                {"title": "Excel consolidation", "description": "Finance merges three reports by hand"},
+                {"title": "Email approvals", "description": "Approvals are sent by email"},
+            ]}, "tokens_used": 400}
+        provider.complete.side_effect = complete
+        created = []
+
+        def create(**kwargs):
+            created.append(kwargs["title"])
+            return {"req_id": f"REQ-{len(created):03d}", "status": "open", **kwargs}
+        body = {"engagement_id": "eng-1", "stakeholder": "CFO", "transcript_text": "Month-end close is manual."}
+        client = TestClient(app)
+        with (
+            patch("main.get_provider", return_value=provider),
+            patch("main.create_requirement", side_effect=create),
+            ThreadPoolExecutor(2) as pool,
+        ):
+            first = pool.submit(client.post, "/requirements/extract-from-transcript", json=body)
+            while main._extraction_flights.in_flight() == 0:
+                time.sleep(0.001)
+            second = pool.submit(client.post, "/requirements/extract-from-transcript", json=body)
+            key = next(iter(main._extraction_flights._calls))
+            _wait_for_waiters(main._extraction_flights, key, 1)
+            release.set()
+            responses = [first.result(5).json(), second.result(5).json()]
+        assert provider.complete.call_count == 1
+        assert created == ["Excel consolidation", "Email approvals"]
+        assert [[r["req_id"] for r in resp["requirements"]] for resp in responses] == [["REQ-001", "REQ-002"]] * 2
+
+    def test_other_engagements_are_not_coalesced(self):
+        provider = MagicMock()
+        provider.complete.return_value = {"data": {"requirements": [{"title": "T", "description": "D"}]}, "tokens_used": 5}
+        with (
+            patch("main.get_provider", return_value=provider),
+            patch("main.create_requirement", side_effect=lambda **kw: {"req_id": "REQ-001", "status": "open", **kw}) as create,
+        ):
+            for engagement_id in ("eng-1", "eng-2"):
+                TestClient(app).post("/requirements/extract-from-transcript", json={
+                    "engagement_id": engagement_id, "stakeholder": "CFO", "transcript_text": "Same words.",
+                })
+        assert [c.kwargs["engagement_id"] for c in create.call_args_list] == ["eng-1", "eng-2"]
@@ -0,0 +1,87 @@
+"""
+pytest tests for lazy storage initialisation, the startup warm-up hook and
+the profile-startup CLI.
+"""
+import sys
+import os
+import subprocess
+import threading
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cli  # noqa: E402
+import database  # noqa: E402
+import main  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestLazyClient:
+    def test_import_does_not_load_supabase(self):
+        code = "import sys, database; print('supabase' in sys.modules, database._client is None)"
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+        assert out.stdout.split() == ["False", "True"]
+
+    def test_client_created_once_under_concurrency(self):
+        barrier = threading.Barrier(8)
+        create = MagicMock(return_value=MagicMock())
+
+        def worker():
+            barrier.wait()
+            database.get_backend()
+
+        with (
+            patch.object(database, "_client", None),
+            patch.object(database, "_backend", None),
+            patch.object(database, "STORAGE_BACKEND", "supabase"),
+            patch("supabase.create_client", create),
+        ):
+            threads = [threading.Thread(target=worker) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            assert database._backend.client is create.return_value
+        assert create.call_count == 1
+
+
+class TestWarmUp:
+    def test_warm_up_runs_on_startup(self):
+        with patch("main.warm_up", return_value=0.01) as warm:
+            with TestClient(main.app) as client:
+                assert client.get("/health").status_code == 200
+        warm.assert_called_once()
+
+    def test_warm_up_failure_is_not_fatal(self):
+        with patch("main.warm_up", side_effect=RuntimeError("supabase_url is required")):
+            with TestClient(main.app) as client:
+                assert client.get("/health").status_code == 200
+
+    def test_warm_up_can_be_disabled(self):
+        with patch("main.warm_up") as warm, patch("main.WARM_UP_ON_STARTUP", False):
+            with TestClient(main.app):
+                pass
+        warm.assert_not_called()
+
+
+class TestProfileStartup:
+    SAMPLE = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       120 |        120 |   metrics",
+        "import time:       300 |       3000 |     fastapi.routing",
+        "import time:       900 |       5000 |   fastapi",
+        "import time:       400 |       5520 | main",
+    ])
+
+    def test_parse_importtime(self):
+        rows = cli.parse_importtime(self.SAMPLE)
+        assert rows[0] == {"module": "metrics", "self_us": 120, "cumulative_us": 120, "depth": 1}
+        assert rows[-1]["depth"] == 0
+
+    def test_summary_groups_by_package(self):
+        summary = cli.summarise_imports(cli.parse_importtime(self.SAMPLE))
+        assert summary["top_packages_ms"]["fastapi"] == 1.2
+        assert summary["first_party_ms"] == {"metrics": 0.1, "main": 5.5}
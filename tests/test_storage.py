@@ -0,0 +1,206 @@
+"""
+Conformance tests for the storage backends. Every test in TestConformance
+runs against both the embedded SQLite backend and the Supabase backend
+(driven by the in-memory FakeSupabase client), so the two stay swappable.
+"""
+import sys
+import os
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+from benchmarks.fakes import FakeSupabase  # noqa: E402
+from storage import SQLiteBackend, SupabaseBackend, create_backend  # noqa: E402
+
+
+def _requirement(engagement_id="eng-1", title="Invoice approval", **extra):
+    return {
+        "engagement_id": engagement_id,
+        "title": title,
+        "description": f"{title} description",
+        "status": "open",
+        "created_at": "2026-03-01T10:00:00+00:00",
+        "tags": ["PAIN_POINT"],
+        **extra,
+    }
+
+
+def _gap(engagement_id="eng-1", req_id="REQ-001", timestamp="2026-03-01T10:00:00+00:00"):
+    return {
+        "engagement_id": engagement_id,
+        "req_id": req_id,
+        "process_description": "Three-way match",
+        "matches": [{"id": "J45", "confidence": "HIGH", "rationale": "AP"}],
+        "tokens_used": 1200,
+        "timestamp": timestamp,
+    }
+
+
+@pytest.fixture(params=["sqlite", "supabase"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        b = SQLiteBackend(str(tmp_path / "rapid.db"))
+        yield b
+        b.close()
+    else:
+        yield SupabaseBackend(FakeSupabase())
+
+
+class TestConformance:
+    def test_req_ids_are_sequential_per_engagement(self, backend):
+        assert backend.create_requirement(_requirement())["req_id"] == "REQ-001"
+        assert backend.create_requirement(_requirement(title="Second"))["req_id"] == "REQ-002"
+        assert backend.create_requirement(_requirement("eng-2"))["req_id"] == "REQ-001"
+        assert backend.next_req_id("eng-1") == "REQ-003"
+
+    def test_bulk_create_allocates_a_block(self, backend):
+        backend.create_requirement(_requirement())
+        rows = backend.create_requirements([_requirement(title=f"Row {i}") for i in range(3)])
+        assert [r["req_id"] for r in rows] == ["REQ-002", "REQ-003", "REQ-004"]
+        assert [r["title"] for r in rows] == ["Row 0", "Row 1", "Row 2"]
+        assert backend.create_requirements([]) == []
+        assert backend.next_req_id("eng-1") == "REQ-005"
+
+    def test_iter_requirements_pages_one_engagement(self, backend):
+        for i in range(5):
+            backend.create_requirement(_requirement(title=f"Row {i}"))
+        backend.create_requirement(_requirement("eng-2"))
+        pages = list(backend.iter_requirements("eng-1", batch_size=2))
+        assert [len(p) for p in pages] == [2, 2, 1]
+        assert [r["title"] for p in pages for r in p] == [f"Row {i}" for i in range(5)]
+
+    def test_latest_results_per_requirement(self, backend):
+        backend.save_gap_result(_gap(timestamp="2026-03-01T10:00:00+00:00"))
+        backend.save_gap_result({**_gap(timestamp="2026-03-02T10:00:00+00:00"), "tokens_used": 7})
+        backend.save_gap_result(_gap(req_id="REQ-002"))
+        backend.save_gap_result(_gap(engagement_id="eng-2", timestamp="2026-03-09T10:00:00+00:00"))
+        latest = backend.get_latest_results("eng-1", ["REQ-001", "REQ-003"])
+        assert list(latest) == ["REQ-001"]
+        assert latest["REQ-001"]["tokens_used"] == 7
+        assert backend.get_latest_results("eng-1", []) == {}
+
+    def test_json_columns_round_trip(self, backend):
+        kpi = {"metric": "DSO", "target": "-5", "unit": "days"}
+        backend.create_requirement(_requirement(kpi_impact=kpi, actors=["AP clerk"], shadow_tools=["Excel"]))
+        row = backend.get_requirement_by_id("REQ-001", "eng-1")
+        assert row["tags"] == ["PAIN_POINT"]
+        assert row["kpi_impact"] == kpi
+        assert row["actors"] == ["AP clerk"]
+        assert row["shadow_tools"] == ["Excel"]
+
+    def test_list_is_scoped_and_ordered(self, backend):
+        for title in ("A", "B", "C"):
+            backend.create_requirement(_requirement(title=title))
+        backend.create_requirement(_requirement("eng-2"))
+        rows = backend.get_requirements_by_engagement("eng-1")
+        assert [r["req_id"] for r in rows] == ["REQ-001", "REQ-002", "REQ-003"]
+
+    def test_missing_requirement(self, backend):
+        assert backend.get_requirement_by_id("REQ-999", "eng-1") is None
+        assert backend.update_requirement("REQ-999", "eng-1", {"status": "closed"}) == {}
+
+    def test_update_returns_updated_row(self, backend):
+        backend.create_requirement(_requirement())
+        row = backend.update_requirement("REQ-001", "eng-1", {"sign_off_status": "approved", "tags": ["RISK"]})
+        assert row["sign_off_status"] == "approved"
+        assert row["tags"] == ["RISK"]
+        assert backend.get_requirement_by_id("REQ-001", "eng-1")["sign_off_status"] == "approved"
+
+    def test_gap_results_newest_first(self, backend):
+        backend.save_gap_result(_gap(timestamp="2026-03-01T10:00:00+00:00"))
+        backend.save_gap_result(_gap(req_id="REQ-002", timestamp="2026-03-02T10:00:00+00:00"))
+        backend.save_gap_result(_gap("eng-2"))
+        rows = backend.get_results_by_engagement("eng-1")
+        assert [r["req_id"] for r in rows] == ["REQ-002", "REQ-001"]
+        assert rows[0]["matches"][0]["id"] == "J45"
+
+    def test_gap_results_by_req_id(self, backend):
+        saved = backend.save_gap_result(_gap())
+        backend.save_gap_result(_gap(req_id="REQ-002"))
+        assert saved["id"]
+        rows = backend.get_gap_results_by_req_id("REQ-001", "eng-1")
+        assert len(rows) == 1 and rows[0]["tokens_used"] == 1200
+
+    def test_iter_and_update_gap_results(self, backend):
+        for i in range(5):
+            backend.save_gap_result(_gap(req_id=f"REQ-00{i}"))
+        pages = list(backend.iter_gap_results(batch_size=2))
+        assert [len(p) for p in pages] == [2, 2, 1]
+        first = pages[0][0]
+        updated = backend.update_gap_result(first["id"], {"matches": []})
+        assert updated["matches"] == []
+
+    def test_iter_results_since_is_scoped_and_keyset(self, backend):
+        rows = [backend.save_gap_result(_gap(req_id=f"REQ-00{i}")) for i in range(4)]
+        backend.save_gap_result(_gap(engagement_id="eng-2"))
+        pages = list(backend.iter_results_since("eng-1", rows[0]["id"], batch_size=2))
+        assert [[r["req_id"] for r in p] for p in pages] == [["REQ-001", "REQ-002"], ["REQ-003"]]
+
+
+class TestSQLite:
+    def test_indexes_exist(self, tmp_path):
+        b = SQLiteBackend(str(tmp_path / "rapid.db"))
+        indexes = {
+            row["name"]: [c["name"] for c in b._conn.execute(f"PRAGMA index_info({row['name']})")]
+            for table in ("requirements", "gap_results")
+            for row in b._conn.execute(f"PRAGMA index_list({table})")
+        }
+        assert indexes["idx_requirements_engagement_req"] == ["engagement_id", "req_id"]
+        assert indexes["idx_gap_results_engagement_req"] == ["engagement_id", "req_id", "timestamp"]
+        assert indexes["idx_gap_results_engagement_timestamp"] == ["engagement_id", "timestamp"]
+        assert indexes["idx_gap_results_engagement_id"] == ["engagement_id", "id"]
+        assert b._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    def test_unknown_column_rejected(self):
+        b = SQLiteBackend(":memory:")
+        with pytest.raises(ValueError):
+            b.create_requirement(_requirement(not_a_column="x"))
+
+    def test_column_defaults_applied(self):
+        row = SQLiteBackend(":memory:").create_requirement(_requirement())
+        assert row["priority"] == "Must-Have"
+        assert row["sign_off_status"] == "draft"
+
+    def test_bulk_create_applies_column_defaults_to_mixed_rows(self):
+        rows = SQLiteBackend(":memory:").create_requirements([_requirement(confidence_score=0.5), _requirement()])
+        assert [r["confidence_score"] for r in rows] == [0.5, 0.8]
+        assert rows[1]["sign_off_status"] == "draft"
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            create_backend("mongodb")
+
+
+class TestSupabase:
+    def test_req_ids_past_max_rows_and_three_digits(self):
+        # PostgREST truncates selects at db-max-rows; allocation must not depend on seeing every row
+        client = FakeSupabase(max_rows=1000)
+        client.seed("requirements", [_requirement(req_id=f"REQ-{i:03d}") for i in range(1, 1201)])
+        backend = SupabaseBackend(client)
+        assert backend.next_req_id("eng-1") == "REQ-1201"
+        client.reset_counters()
+        rows = backend.create_requirements([_requirement(title=f"Row {i}") for i in range(2)])
+        assert [r["req_id"] for r in rows] == ["REQ-1201", "REQ-1202"]
+        assert client.round_trips <= 4
+
+    def test_bulk_create_leaves_absent_columns_to_defaults(self):
+        # Explicit nulls would override the Postgres column defaults
+        rows = SupabaseBackend(FakeSupabase()).create_requirements([
+            _requirement(confidence_score=0.5, sign_off_status="confirmed"), _requirement(),
+        ])
+        assert rows[0]["confidence_score"] == 0.5
+        assert "confidence_score" not in rows[1] and "sign_off_status" not in rows[1]
+
+
+class TestDatabaseFacade:
+    def test_helpers_delegate_to_selected_backend(self):
+        with patch.object(database, "_backend", SQLiteBackend(":memory:")):
+            created = database.create_requirement("eng-1", "Title", "Desc", tags=None, priority=None)
+            assert created["req_id"] == "REQ-001"
+            assert created["tags"] == []
+            database.save_gap_analysis("eng-1", "Desc", [{"id": "J45"}], tokens_used=10, req_id="REQ-001")
+            assert database.get_gap_results_by_req_id("REQ-001", "eng-1")[0]["matches"] == [{"id": "J45"}]
+            assert database.get_requirements_by_engagement("eng-1")[0]["title"] == "Title"
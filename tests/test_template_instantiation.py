@@ -0,0 +1,87 @@
+"""
+pytest tests for bulk instantiation of domain templates, with gap results
+computed once per template text.
+"""
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import main  # noqa: E402
+from main import app  # noqa: E402
+from shared_state import MemorySharedState  # noqa: E402
+from storage import SQLiteBackend  # noqa: E402
+
+URL = "/engagement/{}/requirements/from-templates"
+
+
+@pytest.fixture
+def backend():
+    b = SQLiteBackend(":memory:")
+    with patch.object(database, "_backend", b), patch("shared_state._state", MemorySharedState()):
+        yield b
+    b.close()
+
+
+def _provider():
+    provider = MagicMock()
+    provider.complete.return_value = {
+        "data": {"matches": [{"id": "J58", "confidence": "HIGH", "rationale": "GL"}]}, "tokens_used": 50,
+    }
+    return provider
+
+
+class TestFromTemplates:
+    def test_whole_domain_in_one_insert(self, backend):
+        with patch("main.create_requirements", wraps=database.create_requirements) as create:
+            resp = TestClient(app).post(URL.format("eng-1"), params={"domain": "Finance"})
+        assert resp.status_code == 201
+        body = resp.json()
+        assert create.call_count == 1
+        assert body["created"] == len(main._DOMAIN_TEMPLATES["finance"])
+        assert [r["req_id"] for r in body["requirements"]] == ["REQ-001", "REQ-002", "REQ-003"]
+        stored = backend.get_requirements_by_engagement("eng-1")
+        assert {r["source_type"] for r in stored} == {"Template"}
+        assert stored[1]["actors"] == main._DOMAIN_TEMPLATES["finance"][1]["actors"]
+
+    def test_selected_indices(self, backend):
+        resp = TestClient(app).post(URL.format("eng-1"), params={"domain": "finance", "indices": [2, 0, 2]})
+        titles = [r["title"] for r in resp.json()["requirements"]]
+        templates = main._DOMAIN_TEMPLATES["finance"]
+        assert titles == [templates[2]["title"], templates[0]["title"]]
+
+    def test_bad_domain_or_index(self, backend):
+        client = TestClient(app)
+        assert client.post(URL.format("eng-1"), params={"domain": "legal"}).status_code == 400
+        assert client.post(URL.format("eng-1"), params={"domain": "finance", "indices": [9]}).status_code == 400
+        assert backend.get_requirements_by_engagement("eng-1") == []
+
+    def test_results_computed_once_per_template_text(self, backend):
+        provider = _provider()
+        params = {"domain": "sales", "attach_results": True}
+        with patch("main.get_provider", return_value=provider), patch("keyword_rules.ENABLED", False):
+            first = TestClient(app).post(URL.format("eng-1"), params=params).json()
+            second = TestClient(app).post(URL.format("eng-2"), params=params).json()
+        assert provider.complete.call_count == len(main._DOMAIN_TEMPLATES["sales"])
+        assert first["results_attached"] == second["results_attached"] == 2
+        assert {r["status"] for r in second["requirements"]} == {"analysed"}
+        assert second["requirements"][0]["top_match_id"] == "J58"
+        stored = backend.get_results_by_engagement("eng-2")
+        assert {r["tokens_used"] for r in stored} == {0}
+        assert {r["status"] for r in backend.get_requirements_by_engagement("eng-2")} == {"analysed"}
+
+    def test_failed_analysis_keeps_the_requirement(self, backend):
+        provider = MagicMock()
+        provider.complete.side_effect = RuntimeError("overloaded")
+        with patch("main.get_provider", return_value=provider), patch("keyword_rules.ENABLED", False):
+            body = TestClient(app).post(
+                URL.format("eng-1"), params={"domain": "sales", "indices": [0], "attach_results": True}
+            ).json()
+        assert body["created"] == 1 and body["results_attached"] == 0
+        assert body["failed"][0]["req_id"] == "REQ-001"
+        assert body["requirements"][0]["status"] == "open"
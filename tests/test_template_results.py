@@ -0,0 +1,143 @@
+"""
+pytest tests for precomputed domain-template gap matches: the results file,
+its invalidation on catalogue/prompt changes, the CLI and how they are served.
+"""
+import sys
+import os
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cli  # noqa: E402
+import main  # noqa: E402
+import template_results  # noqa: E402
+from main import app  # noqa: E402
+from shared_state import MemorySharedState  # noqa: E402
+
+DISTINCT_DESCRIPTIONS = len({t["description"] for pack in main._DOMAIN_TEMPLATES.values() for t in pack})
+
+
+@pytest.fixture
+def results_path(tmp_path):
+    path = str(tmp_path / "template_results.json")
+    with (
+        patch("template_results.PATH", path),
+        patch("shared_state._state", MemorySharedState()),
+        patch("keyword_rules.ENABLED", False),
+    ):
+        template_results.reset()
+        yield path
+        template_results.reset()
+
+
+def _provider(scope_id="J58"):
+    provider = MagicMock()
+    provider.complete.return_value = {
+        "data": {"matches": [{"id": scope_id, "confidence": "HIGH", "rationale": "fit"}]}, "tokens_used": 40,
+    }
+    return provider
+
+
+class TestResultsFile:
+    def test_round_trip_and_staleness(self, results_path):
+        template_results.write({"k": [{"id": "J58"}]}, "cat-1", "prompt-1")
+        assert template_results.current("cat-1", "prompt-1") == {"k": [{"id": "J58"}]}
+        assert template_results.current("cat-2", "prompt-1") == {}
+        assert template_results.current("cat-1", "prompt-2") == {}
+        assert template_results.load("cat-2", "prompt-1") == {}
+
+    def test_load_rereads_a_rewritten_file(self, results_path):
+        template_results.write({"k": [{"id": "J58"}]}, "cat-1", "prompt-1")
+        assert template_results.load("cat-1", "prompt-1") == {"k": [{"id": "J58"}]}
+        # Another worker's precompute run: no reset() in this process
+        with open(results_path, "w") as f:
+            json.dump({"catalogue_version": "cat-1", "prompt_version": "prompt-1", "results": {"k": [{"id": "J77"}]}}, f)
+        stat = os.stat(results_path)
+        os.utime(results_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        assert template_results.load("cat-1", "prompt-1") == {"k": [{"id": "J77"}]}
+
+    def test_missing_or_corrupt_file(self, results_path):
+        assert template_results.current("cat-1", "prompt-1") == {}
+        with open(results_path, "w") as f:
+            f.write("{not json")
+        assert template_results.read() is None
+
+
+class TestPrecompute:
+    def test_computes_each_distinct_description_once(self, results_path):
+        provider = _provider()
+        stats = main.precompute_template_results(provider=provider)
+        assert stats["computed"] == DISTINCT_DESCRIPTIONS and not stats["failed"]
+        assert provider.complete.call_count == DISTINCT_DESCRIPTIONS
+        again = main.precompute_template_results(provider=provider)
+        assert again["reused"] == DISTINCT_DESCRIPTIONS and again["computed"] == 0
+        assert provider.complete.call_count == DISTINCT_DESCRIPTIONS
+
+    def test_prompt_or_catalogue_change_invalidates(self, results_path):
+        main.precompute_template_results(provider=_provider())
+        with patch.object(main._GAP_PROMPT, "version", "edited-prompt"):
+            assert template_results.load(main.CATALOGUE_VERSION, main._GAP_PROMPT.version) == {}
+            assert main.precompute_template_results(provider=_provider())["computed"] == DISTINCT_DESCRIPTIONS
+        template_results.reset()
+        with patch("main.CATALOGUE_VERSION", "2602-edited"):
+            assert main._known_template_matches(main._DOMAIN_TEMPLATES["hr"][0]["description"]) is None
+
+    def test_cli_reports_failures(self, results_path, capsys):
+        provider = MagicMock()
+        provider.complete.side_effect = RuntimeError("overloaded")
+        with patch("main.get_provider", return_value=provider):
+            assert cli.main_cli(["precompute-templates"]) == 1
+        assert f"{DISTINCT_DESCRIPTIONS} failed" in capsys.readouterr().out
+        assert template_results.read()["results"] == {}
+
+
+class TestServing:
+    def test_templates_include_precomputed_matches(self, results_path):
+        main.precompute_template_results(provider=_provider())
+        body = TestClient(app).get("/requirements/templates", params={"domain": "hr", "include_results": True}).json()
+        match = body["templates"][0]["gap_matches"][0]
+        assert match["id"] == "J58" and match["name"]
+
+    def test_templates_without_results_are_null(self, results_path):
+        body = TestClient(app).get("/requirements/templates", params={"domain": "hr", "include_results": True}).json()
+        assert body["templates"][0]["gap_matches"] is None
+        plain = TestClient(app).get("/requirements/templates", params={"domain": "hr"}).json()
+        assert "gap_matches" not in plain["templates"][0]
+
+    def test_etag_follows_template_results(self, results_path):
+        client = TestClient(app)
+        params = {"domain": "hr", "include_results": True}
+        etag = client.get("/requirements/templates", params=params).headers["etag"]
+        assert client.get("/requirements/templates", params=params, headers={"If-None-Match": etag}).status_code == 304
+
+        main._template_matches(main._DOMAIN_TEMPLATES["hr"][0]["description"], _provider())
+        resp = client.get("/requirements/templates", params=params, headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.json()["templates"][0]["gap_matches"][0]["id"] == "J58"
+
+        etag = resp.headers["etag"]
+        main.precompute_template_results(provider=_provider("J77"))
+        assert client.get("/requirements/templates", params=params, headers={"If-None-Match": etag}).status_code == 200
+
+    def test_instantiation_uses_precomputed_matches(self, results_path):
+        main.precompute_template_results(provider=_provider("J77"))
+        provider = _provider()
+        with (
+            patch("main.get_provider", return_value=provider),
+            patch("main.create_requirements", side_effect=lambda eng, items: [
+                {"req_id": f"REQ-{i:03d}", "title": t["title"], "description": t["description"], "status": "open"}
+                for i, t in enumerate(items, 1)
+            ]),
+            patch("main.save_gap_analyses") as save,
+            patch("main.update_requirements"),
+        ):
+            body = TestClient(app).post(
+                "/engagement/eng-1/requirements/from-templates", params={"domain": "hr", "attach_results": True}
+            ).json()
+        provider.complete.assert_not_called()
+        assert {r["top_match_id"] for r in body["requirements"]} == {"J77"}
+        assert {r["tokens_used"] for r in save.call_args.args[0]} == {0}
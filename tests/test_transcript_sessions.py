@@ -0,0 +1,142 @@
+"""
+pytest tests for live transcript sessions: cursor, overlap window, and
+merging later segments into requirements captured earlier.
+"""
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import providers  # noqa: E402
+import transcript_sessions  # noqa: E402
+from main import app  # noqa: E402
+from prompts import flatten  # noqa: E402
+from shared_state import MemorySharedState  # noqa: E402
+from transcript_sessions import TranscriptSession, merge_updates  # noqa: E402
+
+EARLY = "We approve every supplier invoice by email. " * 30
+LATER = "Also the approval needs a second signature above ten thousand euros. " * 8
+
+
+@pytest.fixture(autouse=True)
+def fresh_state():
+    with patch("shared_state._state", MemorySharedState()):
+        yield
+
+
+def _result(*items):
+    return {"content": "", "data": {"requirements": list(items)}, "tokens_used": 50}
+
+
+class TestSession:
+    def test_window_is_new_text_plus_overlap_from_a_sentence_start(self):
+        session = TranscriptSession("s", "eng-1", "CFO")
+        session.append(EARLY)
+        session.cursor = len(session.transcript)
+        session.append(LATER)
+        window = session.window()
+        assert window.endswith(LATER.strip())
+        assert window.startswith("We approve")
+        assert len(window) <= transcript_sessions.OVERLAP_CHARS + len(LATER)
+
+    def test_find_by_req_id_or_title(self):
+        session = TranscriptSession("s", "eng-1", "CFO", requirements=[
+            {"req_id": "REQ-001", "title": "Invoice approval", "description": "d", "tags": []},
+        ])
+        assert session.find({"req_id": "REQ-001", "title": "Other"})["req_id"] == "REQ-001"
+        assert session.find({"title": "invoice  APPROVAL!"})["req_id"] == "REQ-001"
+        assert session.find({"title": "Payroll"}) is None
+
+    def test_merge_replaces_text_and_unions_lists(self):
+        existing = {"description": "old", "tags": ["manual_step"], "actors": [{"role": "AP Clerk"}]}
+        updates = merge_updates(existing, {
+            "description": "new", "tags": ["manual_step", "pain_point"],
+            "actors": [{"role": "AP Clerk"}, {"role": "CFO"}],
+        })
+        assert updates == {
+            "description": "new",
+            "tags": ["manual_step", "pain_point"],
+            "actors": [{"role": "AP Clerk"}, {"role": "CFO"}],
+        }
+        assert merge_updates(existing, {"description": "old", "tags": ["manual_step"]}) == {}
+
+
+    def test_locks_are_shared_while_held_and_then_dropped(self):
+        lock = transcript_sessions.lock_for("s-1")
+        assert transcript_sessions.lock_for("s-1") is lock
+        del lock
+        # An expired session is never closed explicitly; its lock must not linger
+        assert "s-1" not in transcript_sessions._locks
+
+
+class TestEndpoints:
+    def _start(self, client):
+        return client.post("/requirements/transcript-sessions", json={"engagement_id": "eng-1", "stakeholder": "CFO"}).json()
+
+    def test_short_segment_waits_for_more_text(self):
+        client = TestClient(app)
+        session = self._start(client)
+        provider = MagicMock()
+        with patch("main.get_provider", return_value=provider):
+            resp = client.post(f"/requirements/transcript-sessions/{session['session_id']}/segments", json={"text": "Hello all."})
+        assert resp.json()["extracted"] is False
+        assert resp.json()["pending_chars"] == len("Hello all.")
+        provider.complete.assert_not_called()
+
+    def test_segments_extract_new_text_and_merge_into_captured(self):
+        client = TestClient(app)
+        session_id = self._start(client)["session_id"]
+        url = f"/requirements/transcript-sessions/{session_id}/segments"
+        provider = MagicMock()
+        provider.complete.side_effect = [
+            _result({"title": "Invoice approval", "description": "Invoices approved by email", "tags": ["manual_step"]}),
+            _result({"req_id": "REQ-001", "title": "Invoice approval",
+                     "description": "Invoices approved by email; two signatures above EUR 10k",
+                     "tags": ["manual_step", "pain_point"]}),
+        ]
+        created = {"req_id": "REQ-001", "title": "Invoice approval", "description": "Invoices approved by email",
+                   "tags": ["manual_step"]}
+        with (
+            patch("main.get_provider", return_value=provider),
+            patch("main.create_requirement", return_value=created) as create,
+            patch("main.get_requirement_by_id", return_value=created),
+            patch("main.update_requirement", side_effect=lambda rid, eid, upd: {**created, **upd}) as update,
+        ):
+            first = client.post(url, json={"text": EARLY}).json()
+            second = client.post(url, json={"text": LATER}).json()
+
+        assert first["created"][0]["req_id"] == "REQ-001"
+        assert create.call_count == 1
+        assert second["created"] == []
+        assert second["updated"] == [{"req_id": "REQ-001", "fields": ["description", "tags"]}]
+        assert update.call_args.args[2]["tags"] == ["manual_step", "pain_point"]
+        assert second["cursor"] == len(EARLY.strip()) + 1 + len(LATER.strip())
+        assert second["pending_chars"] == 0
+
+        system, user = provider.complete.call_args.args
+        assert "REQ-001 | Invoice approval" in flatten(user)
+        assert LATER.strip() in flatten(user)
+        assert flatten(user).count("We approve every supplier invoice") < EARLY.count("We approve")
+
+    def test_failed_extraction_keeps_text_for_the_next_segment(self):
+        client = TestClient(app)
+        session_id = self._start(client)["session_id"]
+        provider = MagicMock()
+        provider.complete.side_effect = providers.ProviderUnavailable("circuit open")
+        with patch("main.get_provider", return_value=provider):
+            resp = client.post(f"/requirements/transcript-sessions/{session_id}/segments", json={"text": EARLY})
+        assert resp.status_code == 503
+        state = client.get(f"/requirements/transcript-sessions/{session_id}").json()
+        assert state["cursor"] == 0 and state["pending_chars"] == len(EARLY.strip())
+
+    def test_unknown_and_closed_sessions_404(self):
+        client = TestClient(app)
+        session_id = self._start(client)["session_id"]
+        assert client.delete(f"/requirements/transcript-sessions/{session_id}").status_code == 204
+        assert client.get(f"/requirements/transcript-sessions/{session_id}").status_code == 404
+        resp = client.post("/requirements/transcript-sessions/nope/segments", json={"text": "x"})
+        assert resp.status_code == 404
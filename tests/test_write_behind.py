@@ -0,0 +1,160 @@
+"""
+pytest tests for the write-behind buffer: batching thresholds, update
+coalescing, spooling on failure, replay and the analyse-all integration.
+"""
+import sys
+import os
+import json
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics  # noqa: E402
+from main import app  # noqa: E402
+from write_behind import WriteBehindBuffer  # noqa: E402
+
+
+def _buffer(tmp_path, **kwargs):
+    inserts, updates = MagicMock(), MagicMock()
+    kwargs.setdefault("max_batch", 100)
+    kwargs.setdefault("max_delay_s", 60)
+    buf = WriteBehindBuffer(inserts, updates, spool_path=str(tmp_path / "wb.spool"), **kwargs)
+    return buf, inserts, updates
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestBatching:
+    def test_flushes_at_size_threshold(self, tmp_path):
+        buf, inserts, _ = _buffer(tmp_path, max_batch=3)
+        for i in range(3):
+            buf.add_gap_result({"req_id": f"REQ-{i:03d}"})
+        assert _wait_for(lambda: inserts.call_count == 1)
+        assert len(inserts.call_args.args[0]) == 3
+        buf.close()
+
+    def test_flushes_after_max_delay(self, tmp_path):
+        buf, inserts, _ = _buffer(tmp_path, max_delay_s=0.05)
+        buf.add_gap_result({"req_id": "REQ-001"})
+        assert _wait_for(lambda: inserts.call_count == 1)
+        buf.close()
+
+    def test_close_flushes_pending(self, tmp_path):
+        buf, inserts, updates = _buffer(tmp_path)
+        buf.add_gap_result({"req_id": "REQ-001"})
+        buf.add_requirement_update("REQ-001", "eng-1", {"status": "analysed"})
+        assert buf.close() == {"written": 2, "spooled": 0}
+        assert buf.pending() == 0
+
+    def test_updates_grouped_and_coalesced(self, tmp_path):
+        buf, _, updates = _buffer(tmp_path)
+        buf.add_requirement_update("REQ-001", "eng-1", {"status": "open"})
+        buf.add_requirement_update("REQ-001", "eng-1", {"status": "analysed"})
+        buf.add_requirement_update("REQ-002", "eng-1", {"status": "analysed"})
+        buf.add_requirement_update("REQ-001", "eng-2", {"status": "analysed"})
+        buf.flush()
+        calls = sorted((c.args[1], tuple(c.args[0]), c.args[2]["status"]) for c in updates.call_args_list)
+        assert calls == [("eng-1", ("REQ-001", "REQ-002"), "analysed"), ("eng-2", ("REQ-001",), "analysed")]
+
+    def test_queue_depth_metric(self, tmp_path):
+        metrics.reset()
+        buf, _, _ = _buffer(tmp_path)
+        buf.add_gap_result({"req_id": "REQ-001"})
+        assert metrics.gauge_value("rapid_write_behind_queue_depth", kind="gap_result") == 1
+        buf.flush()
+        assert metrics.gauge_value("rapid_write_behind_queue_depth", kind="gap_result") == 0
+        assert metrics.summary_snapshot("rapid_write_behind_flush_seconds")["count"] == 1
+
+
+class TestDurability:
+    def test_failed_flush_spools_and_replays(self, tmp_path):
+        buf, inserts, updates = _buffer(tmp_path)
+        inserts.side_effect = RuntimeError("supabase down")
+        buf.add_gap_result({"req_id": "REQ-001", "matches": []})
+        buf.add_requirement_update("REQ-001", "eng-1", {"status": "analysed"})
+        assert buf.flush() == {"written": 1, "spooled": 1}
+        assert os.path.exists(buf.spool_path)
+
+        inserts.side_effect = None
+        assert buf.replay_spool() == 1
+        assert inserts.call_args.args[0] == [{"req_id": "REQ-001", "matches": []}]
+        assert not os.path.exists(buf.spool_path)
+
+    def test_replay_skips_torn_line(self, tmp_path):
+        buf, inserts, _ = _buffer(tmp_path)
+        with open(buf.spool_path, "w") as f:
+            f.write('{"kind": "gap_result", "record": {"req_id": "REQ-001"}}\n{"kind": "gap_res')
+        assert buf.replay_spool() == 1
+        assert inserts.call_count == 1
+
+    def test_spool_file_is_per_process(self, tmp_path):
+        buf, _, _ = _buffer(tmp_path)
+        assert buf.spool_path == str(tmp_path / f"wb.spool.{os.getpid()}")
+
+    def test_replay_picks_up_dead_workers_and_skips_live_ones(self, tmp_path):
+        buf, inserts, _ = _buffer(tmp_path)
+        dead = subprocess.Popen([sys.executable, "-c", "pass"])
+        dead.wait()
+        live = os.getppid()
+        for pid, req_id in ((dead.pid, "REQ-001"), (live, "REQ-002")):
+            with open(f"{buf.spool_base}.{pid}", "w") as f:
+                f.write(json.dumps({"kind": "gap_result", "record": {"req_id": req_id}}) + "\n")
+        with open(buf.spool_base, "w") as f:
+            f.write(json.dumps({"kind": "gap_result", "record": {"req_id": "REQ-003"}}) + "\n")
+
+        assert buf.replay_spool() == 2
+        assert sorted(r["req_id"] for r in inserts.call_args.args[0]) == ["REQ-001", "REQ-003"]
+        assert sorted(os.listdir(tmp_path)) == sorted([f"wb.spool.{live}", "wb.spool.lock"])
+
+    def test_concurrent_replays_apply_each_write_once(self, tmp_path):
+        first, inserts, _ = _buffer(tmp_path)
+        second = WriteBehindBuffer(inserts, MagicMock(), spool_path=first.spool_base, max_batch=100, max_delay_s=60)
+        with open(first.spool_base, "w") as f:
+            for i in range(20):
+                f.write(json.dumps({"kind": "gap_result", "record": {"req_id": f"REQ-{i:03d}"}}) + "\n")
+        with ThreadPoolExecutor(2) as pool:
+            counts = list(pool.map(lambda b: b.replay_spool(), (first, second)))
+        assert sorted(counts) == [0, 20]
+        assert sum(len(c.args[0]) for c in inserts.call_args_list) == 20
+
+
+class TestAnalyseAllWriteBehind:
+    def test_writes_are_batched(self, tmp_path):
+        reqs = [
+            {"req_id": f"REQ-00{i}", "engagement_id": "eng-1", "description": "Three-way match", "status": "open"}
+            for i in range(1, 4)
+        ]
+        provider = MagicMock()
+        provider.complete.return_value = {
+            "content": "", "data": {"matches": [{"id": "J45", "confidence": "HIGH", "rationale": "AP"}]},
+            "tokens_used": 10,
+        }
+        buf, inserts, updates = _buffer(tmp_path)
+        with (
+            patch("main.WRITE_BEHIND", True),
+            patch("main._write_behind", buf),
+            patch("main.get_requirements_by_engagement", return_value=reqs),
+            patch("main.get_provider", return_value=provider),
+            patch("main.save_gap_analysis") as direct_save,
+            patch("main.update_requirement") as direct_update,
+        ):
+            resp = TestClient(app).post("/engagement/eng-1/analyse-all")
+        assert resp.json()["processed"] == 3
+        direct_save.assert_not_called()
+        direct_update.assert_not_called()
+        assert buf.pending() == 6
+        buf.close()
+        assert inserts.call_count == 1 and len(inserts.call_args.args[0]) == 3
+        assert updates.call_count == 1 and updates.call_args.args[0] == ["REQ-001", "REQ-002", "REQ-003"]
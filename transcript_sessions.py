@@ -0,0 +1,180 @@
+"""
+Live transcript sessions: requirements extracted while a workshop runs.
+
+A session accumulates transcript segments as they arrive. It keeps a cursor,
+the character offset up to which the transcript has been extracted, and the
+requirements created so far. An extraction pass sends the model only:
+
+    - the requirements already captured in this session (so it can refine
+      them instead of repeating them), and
+    - the window: the text after the cursor plus up to OVERLAP_CHARS before
+      it, started on a sentence boundary, so a requirement spoken across
+      two segments is still seen whole.
+
+Each extracted item either names a captured req_id (or repeats its title) and
+is merged into it, or is new and gets created. The cursor then moves to the
+end of the transcript. A failed pass leaves the cursor where it was, so the
+next segment retries that text. Segments shorter than MIN_NEW_CHARS in total
+wait for more text unless the caller asks to flush.
+
+Session state lives in shared_state for SESSION_TTL_S, so any worker can
+take the next segment. Segments for one session are expected one at a time
+(a single live feed); they are serialised within a worker only.
+"""
+import os
+import re
+import threading
+import uuid
+import weakref
+from typing import Dict, List, Optional
+
+import shared_state
+
+OVERLAP_CHARS = int(os.getenv("RAPID_TRANSCRIPT_OVERLAP_CHARS", "600"))
+MIN_NEW_CHARS = int(os.getenv("RAPID_TRANSCRIPT_MIN_NEW_CHARS", "400"))
+SESSION_TTL_S = float(os.getenv("RAPID_TRANSCRIPT_SESSION_TTL_S", str(6 * 3600)))
+
+_SENTENCE_END = re.compile(r"[.!?\n]\s+")
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def _title_key(title: str) -> str:
+    return _NON_WORD.sub(" ", (title or "").lower()).strip()
+
+
+class TranscriptSession:
+    def __init__(
+        self,
+        session_id: str,
+        engagement_id: str,
+        stakeholder: str,
+        transcript: str = "",
+        cursor: int = 0,
+        segments: int = 0,
+        requirements: Optional[List[dict]] = None,
+    ):
+        self.session_id = session_id
+        self.engagement_id = engagement_id
+        self.stakeholder = stakeholder
+        self.transcript = transcript
+        self.cursor = cursor
+        self.segments = segments
+        # {"req_id", "title", "description", "tags"} per captured requirement
+        self.requirements: List[dict] = requirements or []
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TranscriptSession":
+        return cls(**data)
+
+    @property
+    def pending_chars(self) -> int:
+        return len(self.transcript) - self.cursor
+
+    def append(self, text: str):
+        text = text.strip()
+        if not text:
+            return
+        self.transcript = f"{self.transcript}\n{text}" if self.transcript else text
+        self.segments += 1
+
+    def window(self) -> str:
+        """Text to extract from: everything after the cursor plus the overlap."""
+        start = max(0, self.cursor - OVERLAP_CHARS)
+        if start > 0:
+            boundary = _SENTENCE_END.search(self.transcript, start, self.cursor)
+            if boundary:
+                start = boundary.end()
+        return self.transcript[start:]
+
+    def captured_text(self) -> str:
+        return "\n".join(
+            f"{r['req_id']} | {r['title']} | {r['description']}" for r in self.requirements
+        )
+
+    def find(self, item: dict) -> Optional[dict]:
+        """The captured requirement an extracted item refers to, if any."""
+        by_id = {r["req_id"]: r for r in self.requirements}
+        if item.get("req_id") in by_id:
+            return by_id[item["req_id"]]
+        key = _title_key(item.get("title", ""))
+        return next((r for r in self.requirements if key and _title_key(r["title"]) == key), None)
+
+    def remember(self, req: dict):
+        entry = {k: req.get(k) for k in ("req_id", "title", "description", "tags")}
+        for i, existing in enumerate(self.requirements):
+            if existing["req_id"] == entry["req_id"]:
+                self.requirements[i] = entry
+                return
+        self.requirements.append(entry)
+
+
+def merge_updates(existing: dict, item: dict) -> Dict:
+    """Fields to patch on `existing` with what a later pass extracted.
+
+    The model restates a refined description, so text fields are replaced;
+    list fields are unioned so nothing captured earlier is lost.
+    """
+    updates: Dict = {}
+    for field in ("description", "business_process", "priority", "category"):
+        value = item.get(field)
+        if value and value != existing.get(field):
+            updates[field] = value
+    for field in ("tags", "shadow_tools"):
+        merged = list(dict.fromkeys((existing.get(field) or []) + (item.get(field) or [])))
+        if merged != (existing.get(field) or []):
+            updates[field] = merged
+    actors = list(existing.get("actors") or [])
+    roles = {a.get("role") for a in actors}
+    for actor in item.get("actors") or []:
+        if actor.get("role") not in roles:
+            actors.append(actor)
+            roles.add(actor.get("role"))
+    if len(actors) != len(existing.get("actors") or []):
+        updates["actors"] = actors
+    if item.get("kpi_impact") and not existing.get("kpi_impact"):
+        updates["kpi_impact"] = item["kpi_impact"]
+    return updates
+
+
+# ── Store ────────────────────────────────────────────────────────────────────
+
+# A session's lock lives only while a request holds it, so sessions that
+# simply expire leave nothing behind
+_locks: "weakref.WeakValueDictionary[str, threading.Lock]" = weakref.WeakValueDictionary()
+_locks_lock = threading.Lock()
+
+
+def lock_for(session_id: str) -> threading.Lock:
+    with _locks_lock:
+        lock = _locks.get(session_id)
+        if lock is None:
+            lock = _locks[session_id] = threading.Lock()
+        return lock
+
+
+def _key(session_id: str) -> str:
+    return f"transcript_session:{session_id}"
+
+
+def create(engagement_id: str, stakeholder: str) -> TranscriptSession:
+    session = TranscriptSession(uuid.uuid4().hex, engagement_id, stakeholder)
+    save(session)
+    return session
+
+
+def load(session_id: str) -> Optional[TranscriptSession]:
+    data = shared_state.get_shared_state().cache_get(_key(session_id))
+    return TranscriptSession.from_dict(data) if data else None
+
+
+def save(session: TranscriptSession):
+    shared_state.get_shared_state().cache_set(_key(session.session_id), session.to_dict(), SESSION_TTL_S)
+
+
+def close(session_id: str):
+    with _locks_lock:
+        _locks.pop(session_id, None)
+    shared_state.get_shared_state().cache_delete(_key(session_id))
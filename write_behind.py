@@ -0,0 +1,280 @@
+"""
+Write-behind buffer for the analysis write path.
+
+Gap-result inserts and requirement status updates are queued in memory and
+written in batches by a background thread: one multi-row insert for the
+queued gap results and one update per distinct (engagement, updates) group
+for the requirements. Updates queued for the same requirement are coalesced
+so only the latest values are written.
+
+A batch is flushed when `max_batch` items are pending, when the oldest item
+has waited `max_delay_s`, or on close(). Anything that fails to write is
+appended to a local NDJSON spool file (fsync'd) and re-queued by
+replay_spool() on the next start, so an outage loses nothing that was
+acknowledged to a client.
+
+Each process spools to its own file, RAPID_WRITE_BEHIND_SPOOL suffixed with
+its pid, so gunicorn workers never append to the same file. replay_spool()
+takes an exclusive lock on `<spool>.lock` and then picks up the files left
+by processes that are no longer running. Two workers starting together
+therefore never replay the same writes, and a live worker's file is left
+alone.
+
+Enabled in main.py with RAPID_WRITE_BEHIND=1.
+"""
+import glob
+import json
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev server only
+    fcntl = None
+
+MAX_BATCH = int(os.getenv("RAPID_WRITE_BEHIND_MAX_BATCH", "50"))
+MAX_DELAY_S = float(os.getenv("RAPID_WRITE_BEHIND_MAX_DELAY_S", "0.5"))
+SPOOL_PATH = os.getenv("RAPID_WRITE_BEHIND_SPOOL", "write_behind.spool")
+
+metrics.describe("rapid_write_behind_queue_depth", "gauge", "Writes waiting in the write-behind buffer")
+metrics.describe("rapid_write_behind_flush_seconds", "summary", "Write-behind flush latency")
+metrics.describe("rapid_write_behind_flushed_total", "counter", "Writes persisted by write-behind flushes")
+metrics.describe("rapid_write_behind_spooled_total", "counter", "Writes spooled to disk after a failed flush")
+metrics.describe("rapid_write_behind_flush_errors_total", "counter", "Write-behind flushes that hit a storage error")
+
+
+class WriteBehindBuffer:
+    """Batches writes for `insert_gap_results(records)` and
+    `update_requirements(req_ids, engagement_id, updates)`."""
+
+    def __init__(
+        self,
+        insert_gap_results: Callable[[list], object],
+        update_requirements: Callable[[list, str, dict], object],
+        max_batch: int = MAX_BATCH,
+        max_delay_s: float = MAX_DELAY_S,
+        spool_path: Optional[str] = SPOOL_PATH,
+    ):
+        self._insert_gap_results = insert_gap_results
+        self._update_requirements = update_requirements
+        self.max_batch = max_batch
+        self.max_delay_s = max_delay_s
+        self.spool_base = spool_path
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._gap_results: List[dict] = []
+        # (engagement_id, req_id) → merged updates; later writes win
+        self._updates: Dict[Tuple[str, str], dict] = {}
+        self._oldest: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    # ── producers ──
+    def add_gap_result(self, record: dict):
+        with self._cond:
+            self._gap_results.append(record)
+            self._enqueued()
+
+    def add_requirement_update(self, req_id: str, engagement_id: str, updates: dict):
+        with self._cond:
+            self._updates.setdefault((engagement_id, req_id), {}).update(updates)
+            self._enqueued()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._gap_results) + len(self._updates)
+
+    def _enqueued(self):
+        # Caller holds self._cond
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        self._set_depth()
+        if self._thread is None and not self._closed:
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+        if len(self._gap_results) + len(self._updates) >= self.max_batch:
+            self._cond.notify()
+
+    def _set_depth(self):
+        metrics.gauge_set("rapid_write_behind_queue_depth", len(self._gap_results), kind="gap_result")
+        metrics.gauge_set("rapid_write_behind_queue_depth", len(self._updates), kind="requirement_update")
+
+    # ── flushing ──
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    size = len(self._gap_results) + len(self._updates)
+                    if size >= self.max_batch:
+                        break
+                    if self._oldest is not None:
+                        remaining = self.max_delay_s - (time.monotonic() - self._oldest)
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                if self._closed:
+                    return
+            self.flush()
+
+    def _take(self) -> Tuple[List[dict], Dict[Tuple[str, str], dict]]:
+        with self._cond:
+            gap_results, updates = self._gap_results, self._updates
+            self._gap_results, self._updates, self._oldest = [], {}, None
+            self._set_depth()
+            return gap_results, updates
+
+    def _chunks(self, items: list):
+        # A backlog that built up during a slow flush still goes out in bounded statements
+        size = max(1, self.max_batch)
+        for i in range(0, len(items), size):
+            yield items[i:i + size]
+
+    def flush(self) -> dict:
+        """Write everything pending now; returns counts written and spooled."""
+        with self._flush_lock:
+            gap_results, updates = self._take()
+            if not gap_results and not updates:
+                return {"written": 0, "spooled": 0}
+            start = time.perf_counter()
+            written = spooled = 0
+
+            for chunk in self._chunks(gap_results):
+                try:
+                    self._insert_gap_results(chunk)
+                    written += len(chunk)
+                    metrics.inc("rapid_write_behind_flushed_total", len(chunk), kind="gap_result")
+                except Exception as e:
+                    print(f"Write-behind insert of {len(chunk)} gap result(s) failed, spooling: {e}")
+                    metrics.inc("rapid_write_behind_flush_errors_total")
+                    spooled += self._spool([{"kind": "gap_result", "record": r} for r in chunk])
+
+            # Requirements sharing identical updates go out as one IN (...) update
+            groups: Dict[Tuple[str, str], List[str]] = {}
+            for (engagement_id, req_id), values in updates.items():
+                groups.setdefault((engagement_id, json.dumps(values, sort_keys=True)), []).append(req_id)
+            for (engagement_id, values_json), group in groups.items():
+                values = json.loads(values_json)
+                for req_ids in self._chunks(group):
+                    try:
+                        self._update_requirements(req_ids, engagement_id, values)
+                        written += len(req_ids)
+                        metrics.inc("rapid_write_behind_flushed_total", len(req_ids), kind="requirement_update")
+                    except Exception as e:
+                        print(f"Write-behind update of {len(req_ids)} requirement(s) failed, spooling: {e}")
+                        metrics.inc("rapid_write_behind_flush_errors_total")
+                        spooled += self._spool([
+                            {"kind": "requirement_update", "engagement_id": engagement_id, "req_id": r, "updates": values}
+                            for r in req_ids
+                        ])
+
+            metrics.observe("rapid_write_behind_flush_seconds", time.perf_counter() - start)
+            return {"written": written, "spooled": spooled}
+
+    # ── durability ──
+    @property
+    def spool_path(self) -> Optional[str]:
+        """This process's spool file; read per call so a forked worker gets its own."""
+        return f"{self.spool_base}.{os.getpid()}" if self.spool_base else None
+
+    def _leftover_spools(self) -> List[str]:
+        """Spool and interrupted-replay files whose writer is no longer running."""
+        pattern = re.compile(re.escape(self.spool_base) + r"(?:\.(\d+))?(?:\.replay)?$")
+        leftovers = []
+        for path in sorted(glob.glob(glob.escape(self.spool_base) + "*")):
+            m = pattern.fullmatch(path)
+            if not m:
+                continue
+            pid = int(m.group(1)) if m.group(1) else None
+            if pid is not None and pid != os.getpid() and _pid_alive(pid):
+                continue
+            leftovers.append(path)
+        return leftovers
+
+    def _spool(self, entries: List[dict]) -> int:
+        if not self.spool_path:
+            print(f"Write-behind has no spool file; dropping {len(entries)} write(s)")
+            return 0
+        with open(self.spool_path, "a") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        metrics.inc("rapid_write_behind_spooled_total", len(entries))
+        return len(entries)
+
+    def replay_spool(self) -> int:
+        """Re-apply writes left in spool files by failed flushes of this or
+        earlier processes.
+
+        Delivery is at-least-once: a crash between the flush and removing the
+        replay file replays those writes again on the next start.
+        """
+        if not self.spool_base:
+            return 0
+        with open(self.spool_base + ".lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                return self._replay_locked()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _replay_locked(self) -> int:
+        replaying = self.spool_path + ".replay"
+        for path in self._leftover_spools():
+            if path == replaying:
+                # A previous replay by this pid was interrupted; keep its entries
+                continue
+            with open(path) as src, open(replaying, "a") as dst:
+                dst.write(src.read())
+            os.remove(path)
+        if not os.path.exists(replaying):
+            return 0
+        count = 0
+        with open(replaying) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Blank or torn final line from a crash mid-write
+                    continue
+                if entry.get("kind") == "gap_result":
+                    self.add_gap_result(entry["record"])
+                elif entry.get("kind") == "requirement_update":
+                    self.add_requirement_update(entry["req_id"], entry["engagement_id"], entry["updates"])
+                else:
+                    continue
+                count += 1
+        # Anything that still fails is spooled afresh by flush()
+        self.flush()
+        os.remove(replaying)
+        return count
+
+    def close(self) -> dict:
+        """Stop the background thread and flush what is left (idempotent)."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=10)
+        return self.flush()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists but belongs to another user
+        return True
+    return True